@@ -8,10 +8,20 @@ import os
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
 
+if "--benchmark" in sys.argv:
+    # La salida del benchmark es JSON por stdout: sin el banner de pygame
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
 from src.core.graphics_engine import GraphicsEngine
 
 def main():
     """Función principal de la aplicación"""
+    if "--benchmark" in sys.argv:
+        # Modo headless: python main.py --benchmark [--frames N --out bench.json]
+        from src.core.benchmark import main as benchmark_main
+        benchmark_main([arg for arg in sys.argv[1:] if arg != "--benchmark"])
+        return
+
     try:
         # Crear y ejecutar el motor gráfico
         engine = GraphicsEngine()
@@ -23,6 +33,8 @@ def main():
         print("• Click derecho: Menú contextual") 
         print("• Click izquierdo + arrastrar: Controlar cámara")
         print("• WASD/Flechas: Movimiento de cámara")
+        print("• F3: Mostrar/ocultar perfilador")
+        print("• F4: Guardar traza del perfilador (Chrome trace)")
         print("• ESC: Salir de la aplicación")
         print("=" * 50)
         
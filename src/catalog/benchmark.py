@@ -0,0 +1,137 @@
+"""
+Benchmark del catálogo con un CSV sintético:
+
+    python -m src.catalog.benchmark --products 100000 --out catalog_bench.json
+
+Mide la carga en frío (CSV -> base nueva, lo que paga el primer arranque o un CSV
+modificado), la carga en memoria, la apertura de una base al día y algunas consultas
+de la lista de productos. Escribe un JSON y sale con código 1 si la carga en frío
+pasa de CATALOG_LOAD_BUDGET_MS.
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import numpy as np
+from src.catalog.store import COLUMNS, ProductCatalog, prepare_catalog
+from src.utils.config import CATALOG_BENCH_PRODUCTS, CATALOG_LOAD_BUDGET_MS
+
+CATEGORIES = ("Frutas", "Lácteos", "Panadería", "Carnes", "Bebidas", "Limpieza", "Despensa", "Congelados")
+
+
+def write_synthetic_csv(path, products, seed=0):
+    """CSV con 'products' filas al azar (reproducible), en el formato de products.csv."""
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for i in range(products):
+            has_mesh = rng.random() < 0.1
+            writer.writerow((
+                f"SKU-{i:07d}", f"Producto {rng.randrange(products):07d}", rng.choice(CATEGORIES),
+                f"{rng.uniform(0.2, 60.0):.2f}",
+                "assets/models/apple01.obj" if has_mesh else "", "",
+                f"{rng.uniform(0.05, 0.4):.3f}", f"{rng.uniform(0.05, 0.4):.3f}", f"{rng.uniform(0.05, 0.4):.3f}",
+            ))
+
+
+def _timed(fn, repeats):
+    """(milisegundos de cada repetición, último resultado)."""
+    times, result = [], None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000.0)
+    return times, result
+
+
+def _summary(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {"median": round(float(np.median(values)), 2), "min": round(float(values.min()), 2),
+            "max": round(float(values.max()), 2)}
+
+
+def run_benchmark(products=CATALOG_BENCH_PRODUCTS, repeats=3, folder=None):
+    """Ejecuta el benchmark en 'folder' (por defecto un directorio temporal) y devuelve el informe."""
+    with tempfile.TemporaryDirectory(dir=folder) as tmp:
+        csv_path = os.path.join(tmp, "products.csv")
+        db_path = os.path.join(tmp, "catalog.sqlite3")
+        write_synthetic_csv(csv_path, products)
+
+        def cold():
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            return prepare_catalog(db_path, csv_path)
+
+        def in_memory():
+            catalog = ProductCatalog(":memory:", csv_path)
+            catalog.close()
+
+        cold_ms, loaded = _timed(cold, repeats)
+        memory_ms, _ = _timed(in_memory, repeats)
+        warm_ms, _ = _timed(lambda: ProductCatalog(db_path, csv_path).close(), repeats)
+
+        catalog = ProductCatalog(db_path, csv_path)
+
+        category = CATEGORIES[0]
+        deep = max(0, catalog.count() - 50)
+        queries = {
+            "count": lambda: catalog.count(),
+            "first_page_by_name": lambda: catalog.query(order_by="name", limit=50),
+            "deep_page_by_name": lambda: catalog.query(order_by="name", limit=50, offset=deep),
+            "category_by_price": lambda: catalog.query(category=category, order_by="price", limit=50),
+            "placeable": lambda: catalog.placeable(limit=8),
+        }
+        query_ms = {name: _summary(_timed(fn, repeats * 10)[0]) for name, fn in queries.items()}
+        catalog.close()
+        db_mb = os.path.getsize(db_path) / 2**20
+
+    cold_summary = _summary(cold_ms)
+    return {
+        "products": loaded,
+        "repeats": repeats,
+        "cold_build_ms": cold_summary,
+        "memory_load_ms": _summary(memory_ms),
+        "warm_open_ms": _summary(warm_ms),
+        "query_ms": query_ms,
+        "db_mb": round(db_mb, 2),
+        "budget_ms": CATALOG_LOAD_BUDGET_MS,
+        "within_budget": cold_summary["median"] < CATALOG_LOAD_BUDGET_MS,
+        "sqlite": sqlite3.sqlite_version,
+        "python": platform.python_version(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de carga y consultas del catálogo (salida JSON)")
+    parser.add_argument("--products", type=int, default=CATALOG_BENCH_PRODUCTS, help="filas del CSV sintético")
+    parser.add_argument("--repeats", type=int, default=3, help="repeticiones de cada carga")
+    parser.add_argument("--out", help="fichero JSON (por defecto stdout)")
+    args = parser.parse_args(argv)
+
+    # Los logs del catálogo van a stderr: stdout queda solo para el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmark(args.products, args.repeats)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✅ Benchmark guardado en {args.out}", file=sys.stderr)
+    else:
+        print(text)
+    if not report["within_budget"]:
+        print(f"❌ Carga en frío {report['cold_build_ms']['median']:.0f} ms > {CATALOG_LOAD_BUDGET_MS} ms",
+              file=sys.stderr)
+        sys.exit(1)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import csv
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from src.utils.config import CATALOG_CSV_PATH, CATALOG_DB_PATH, CATALOG_DB_VERSION
+
+_CATALOGS = {}   # ruta de la base -> ProductCatalog abierto
+_FAILED = {}     # ruta de la base -> (firma del CSV, error) de la última regeneración fallida
+
+COLUMNS = ("sku", "name", "category", "price", "mesh", "texture", "width", "depth", "height")
+NUMERIC_COLUMNS = ("price", "width", "depth", "height")
+
+_SCHEMA = '''
+    CREATE TABLE products (
+        sku      TEXT PRIMARY KEY,
+        name     TEXT NOT NULL,
+        category TEXT NOT NULL,
+        price    REAL NOT NULL CHECK (typeof(price) = 'real'),
+        mesh     TEXT NOT NULL DEFAULT '',
+        texture  TEXT NOT NULL DEFAULT '',
+        width    REAL NOT NULL CHECK (typeof(width) = 'real'),   -- huella en la balda (m)
+        depth    REAL NOT NULL CHECK (typeof(depth) = 'real'),
+        height   REAL NOT NULL CHECK (typeof(height) = 'real')
+    ) WITHOUT ROWID
+'''
+# Se crean después de la carga masiva: indexar al final es mucho más rápido que fila a fila
+_INDEXES = (
+    "CREATE INDEX idx_products_category_price ON products (category, price)",
+    "CREATE INDEX idx_products_price ON products (price)",
+    "CREATE INDEX idx_products_name ON products (name)",
+)
+
+# Una sola reconstrucción a la vez (hilo de carga y, si se adelanta, el hilo principal)
+_BUILD_LOCK = threading.Lock()
+BUILD_CACHE_KB = 64 * 1024
+
+
+def get_catalog(db_path=CATALOG_DB_PATH, csv_path=CATALOG_CSV_PATH):
+    """Catálogo compartido (se abre y, si el CSV cambió, se reconstruye la primera vez)."""
+    catalog = _CATALOGS.get(db_path)
+    if catalog is None:
+        catalog = _CATALOGS[db_path] = ProductCatalog(db_path, csv_path)
+    return catalog
+
+
+def close_catalog(db_path=CATALOG_DB_PATH):
+    catalog = _CATALOGS.pop(db_path, None)
+    if catalog is not None:
+        catalog.close()
+
+
+def _source_signature(csv_path):
+    if not csv_path or not os.path.exists(csv_path):
+        return None
+    st = os.stat(csv_path)
+    return f"v{CATALOG_DB_VERSION}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _db_source(db_path):
+    """Firma del CSV con el que se generó la base (None si no existe o no es válida)."""
+    if not os.path.exists(db_path):
+        return None
+    try:
+        conn = sqlite3.connect(db_path)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def iter_csv_rows(path):
+    """
+    Filas del CSV en el orden de COLUMNS, con los campos numéricos ya en float, una a
+    una (la carga masiva las inserta según se leen, sin lista intermedia).
+    Un valor no numérico ('1,50' con coma decimal, vacío...) es un ValueError con su línea.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        missing = [c for c in COLUMNS if c not in header]
+        if missing:
+            raise ValueError(f"CSV de catálogo '{path}' sin columnas: {', '.join(missing)}")
+        sku, name, category, price, mesh, texture, width, depth, height = (header.index(c) for c in COLUMNS)
+        for row in reader:
+            try:
+                yield (row[sku], row[name], row[category], float(row[price]), row[mesh], row[texture],
+                       float(row[width]), float(row[depth]), float(row[height]))
+            except (ValueError, IndexError) as e:
+                raise ValueError(f"{path}:{reader.line_num}: fila de catálogo no válida ({e})") from None
+
+
+def _fill(conn, rows, source=None):
+    """
+    Tablas, filas e índices en una sola transacción. 'rows' puede ser un iterador: si
+    falla a medias (fila no válida) no queda nada. Devuelve el nº de productos.
+    """
+    t0 = time.perf_counter()
+    conn.execute("BEGIN")
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("DROP TABLE IF EXISTS products")
+        conn.execute(_SCHEMA)
+        n = conn.executemany(f"INSERT INTO products VALUES ({', '.join('?' * len(COLUMNS))})", rows).rowcount
+        t1 = time.perf_counter()
+        for statement in _INDEXES:
+            conn.execute(statement)
+        conn.execute("INSERT OR REPLACE INTO meta VALUES ('source', ?)", (source,))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    t2 = time.perf_counter()
+    print(f"[Catálogo] {n} productos cargados en {(t2 - t0) * 1000:.0f} ms "
+          f"(filas {(t1 - t0) * 1000:.0f} ms, índices {(t2 - t1) * 1000:.0f} ms)")
+    return n
+
+
+def build_catalog_db(db_path, rows, source=None):
+    """
+    Genera la base en un fichero temporal (sin journal ni fsync: si algo falla se borra)
+    y lo mueve sobre 'db_path' solo al terminar bien. Devuelve el nº de productos.
+    """
+    folder = os.path.dirname(db_path) or "."
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".catalog-", suffix=".tmp", dir=folder)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            # Caché de páginas holgada: con la de serie (2 MB) un catálogo de ~100k filas
+            # desaloja páginas del árbol durante los INSERT y al ordenar los índices
+            conn.execute(f"PRAGMA cache_size = -{BUILD_CACHE_KB}")
+            n = _fill(conn, rows, source)
+        finally:
+            conn.close()
+        os.replace(tmp, db_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return n
+
+
+def prepare_catalog(db_path=CATALOG_DB_PATH, csv_path=CATALOG_CSV_PATH):
+    """
+    Regenera la base si el CSV cambió; no toca conexiones compartidas, así que se puede
+    lanzar en el pool del AssetLoader. Devuelve el nº de productos cargados o None si ya
+    estaba al día. Si el mismo CSV ya falló, se repite el error sin volver a leerlo.
+    """
+    with _BUILD_LOCK:
+        source = _source_signature(csv_path)
+        if source is None or _db_source(db_path) == source:
+            return None
+        failed = _FAILED.get(db_path)
+        if failed is not None and failed[0] == source:
+            raise failed[1]
+        try:
+            n = build_catalog_db(db_path, iter_csv_rows(csv_path), source)
+        except (ValueError, OSError, sqlite3.Error) as e:
+            _FAILED[db_path] = (source, e)
+            raise
+        _FAILED.pop(db_path, None)
+        return n
+
+
+class ProductCatalog:
+    """
+    Catálogo de productos (SKU, nombre, categoría, precio, malla, textura y huella) en SQLite.
+    - La fuente es un CSV versionado; la base vive en la caché y se regenera si cambian
+      el CSV (tamaño/mtime) o CATALOG_DB_VERSION. Abrir una base al día no lee el CSV.
+    - La regeneración (prepare_catalog) va a un fichero temporal que sustituye a la base
+      solo si termina bien; SceneManager la lanza en el pool de carga al arrancar. Si
+      falla y hay una base anterior válida, se avisa y se abre esa.
+    - Coste con ~100k filas (python -m src.catalog.benchmark): regenerar ~0.6 s en frío
+      (2/3 lectura del CSV e INSERT, 1/3 índices); abrir una base al día, <1 ms.
+    - Los campos numéricos se validan al leer el CSV y el esquema exige REAL (CHECK).
+    - Las consultas devuelven dicts {columna: valor}; las de listado van paginadas.
+    db_path=':memory:' da un catálogo efímero (tests, herramientas).
+    """
+
+    def __init__(self, db_path=CATALOG_DB_PATH, csv_path=CATALOG_CSV_PATH):
+        self.db_path = db_path
+        self.csv_path = csv_path
+        if db_path != ":memory:":
+            try:
+                prepare_catalog(db_path, csv_path)   # casi siempre ya al día (lo hizo el pool)
+            except (ValueError, OSError, sqlite3.Error) as e:
+                if _db_source(db_path) is None:
+                    raise
+                print(f"⚠️ [Catálogo] {e}: se usa la base anterior")
+        # Autocommit: las transacciones se abren a mano (una sola en la carga masiva)
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        if db_path == ":memory:":
+            self.bulk_load(iter_csv_rows(csv_path) if _source_signature(csv_path) else ())
+
+    # ---------- Carga ----------
+    def bulk_load(self, rows):
+        """
+        Reemplaza el contenido por 'rows' (tuplas en el orden de COLUMNS, números en float;
+        vale un iterador).
+        En disco se genera aparte y se sustituye la base; en memoria, en una transacción.
+        Devuelve el nº de productos cargados.
+        """
+        if self.db_path == ":memory:":
+            return _fill(self.conn, rows)
+        self.conn.close()
+        try:
+            return build_catalog_db(self.db_path, rows)
+        finally:
+            self.conn = sqlite3.connect(self.db_path, isolation_level=None)
+            self.conn.row_factory = sqlite3.Row
+
+    def load_csv(self, path):
+        """Carga masiva desde un CSV con cabecera (las columnas pueden venir en cualquier orden)."""
+        return self.bulk_load(iter_csv_rows(path))
+
+    # ---------- Consultas ----------
+    @staticmethod
+    def _where(category=None, min_price=None, max_price=None):
+        clauses, params = [], []
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if min_price is not None:
+            clauses.append("price >= ?")
+            params.append(min_price)
+        if max_price is not None:
+            clauses.append("price <= ?")
+            params.append(max_price)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def count(self, category=None, min_price=None, max_price=None):
+        where, params = self._where(category, min_price, max_price)
+        return self.conn.execute(f"SELECT COUNT(*) FROM products{where}", params).fetchone()[0]
+
+    def categories(self):
+        """Categorías distintas, ordenadas (recorre el índice, no la tabla)."""
+        return [row[0] for row in self.conn.execute("SELECT DISTINCT category FROM products ORDER BY category")]
+
+    def get(self, sku):
+        row = self.conn.execute("SELECT * FROM products WHERE sku = ?", (sku,)).fetchone()
+        return dict(row) if row else None
+
+    def query(self, category=None, min_price=None, max_price=None, order_by="name", limit=50, offset=0):
+        """
+        Productos filtrados por categoría y/o rango de precio, paginados (LIMIT/OFFSET).
+        El OFFSET se salta en la subconsulta, que solo lee el índice (los índices de una
+        tabla WITHOUT ROWID llevan el SKU); la tabla se lee solo para las filas de la página.
+        """
+        if order_by not in COLUMNS:
+            raise ValueError(f"order_by desconocido: {order_by}")
+        where, params = self._where(category, min_price, max_price)
+        order = f"ORDER BY {order_by}, sku"
+        sql = (f"SELECT * FROM products WHERE sku IN "
+               f"(SELECT sku FROM products{where} {order} LIMIT ? OFFSET ?) {order}")
+        return [dict(row) for row in self.conn.execute(sql, params + [limit, offset])]
+
+    def placeable(self, limit=None):
+        """Productos con malla (los que se pueden colocar en la escena), por SKU."""
+        rows = self.conn.execute("SELECT * FROM products WHERE mesh != '' ORDER BY sku LIMIT ?",
+                                 (-1 if limit is None else limit,))
+        return [dict(row) for row in rows]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,160 @@
+"""
+Benchmark de frames sin ventana:
+
+    python -m src.core.benchmark --frames 600 --out bench.json
+    python main.py --benchmark --frames 600
+
+Construye la escena en modo headless, recorre un camino de cámara fijo sin límite de
+FPS y escribe un JSON (percentiles de tiempo de CPU por frame, tiempo de GPU, draw
+calls...) para comparar entre commits en máquinas de CI sin display.
+"""
+import os
+# stdout es solo para el JSON: sin el banner de pygame al importarlo
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import argparse
+import contextlib
+import json
+import platform
+import sys
+import time
+import glm
+import numpy as np
+import pygame as pg
+from src.core.graphics_engine import GraphicsEngine
+from src.utils.config import BENCHMARK_FRAMES, BENCHMARK_WARMUP_FRAMES
+
+# Camino de cámara: (posición, yaw, pitch). Entrada, pasillo mirando a cada
+# estantería y vista alta desde el fondo (vuelta cerrada: el último enlaza con el primero)
+CAMERA_PATH = [
+    ((0.0, 1.0, 5.0), -90.0, 0.0),
+    ((0.0, 1.4, 0.5), -150.0, -10.0),
+    ((-1.5, 1.2, -2.0), -180.0, -5.0),
+    ((0.0, 1.4, 0.5), -30.0, -10.0),
+    ((1.5, 1.2, -2.0), 0.0, -5.0),
+    ((0.0, 3.0, 4.5), -90.0, -25.0),
+]
+PERCENTILES = (50, 90, 95, 99)
+
+
+def camera_pose(t, path=CAMERA_PATH):
+    """Pose interpolada (posición, yaw, pitch) en t ∈ [0, 1) a lo largo del camino cerrado."""
+    n = len(path)
+    f = (t % 1.0) * n
+    i = int(f)
+    a, b, k = path[i], path[(i + 1) % n], f - i
+    k = k * k * (3.0 - 2.0 * k)   # smoothstep: sin tirones en los puntos de paso
+    position = glm.mix(glm.vec3(*a[0]), glm.vec3(*b[0]), k)
+    return position, a[1] + (b[1] - a[1]) * k, a[2] + (b[2] - a[2]) * k
+
+
+def _set_camera(camera, pose):
+    camera.position, camera.yaw, camera.pitch = pose
+    camera.update_camera_vectors()
+    camera.update_view_matrix()
+
+
+def _summary(values):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return None
+    out = {"mean": float(values.mean()), "min": float(values.min()), "max": float(values.max())}
+    out.update({f"p{p}": float(np.percentile(values, p)) for p in PERCENTILES})
+    return {k: round(v, 4) for k, v in out.items()}
+
+
+def run_benchmark(frames=BENCHMARK_FRAMES, warmup=BENCHMARK_WARMUP_FRAMES, win_size=(1200, 800),
+                  screenshot=None):
+    """
+    Ejecuta el benchmark y devuelve el informe (dict serializable a JSON).
+    - Carga: la escena se construye por el AssetLoader (en segundo plano, como en la app)
+      y finish_loading() espera a que termine; ese tiempo es 'scene_load_s'.
+    - CPU: update() + render() de cada frame (envío de comandos, sin esperar a la GPU).
+    - GPU: query de tiempo por frame, leída un frame después para no sincronizar.
+    """
+    t0 = time.perf_counter()
+    engine = GraphicsEngine(headless=True, win_size=win_size)
+    scene = engine.scene_manager
+    scene.finish_loading()
+    load_s = time.perf_counter() - t0
+
+    ctx = engine.ctx
+    prof = engine.profiler
+    prof.hitch_ms = None   # aquí interesan los percentiles, no un aviso por frame lento
+    queries = [ctx.query(time=True), ctx.query(time=True)]
+    cpu_ms, gpu_ms, draws, texture_binds, culled, occluded = [], [], [], [], [], []
+    total = warmup + frames
+    for frame in range(total):
+        _set_camera(engine.camera, camera_pose(frame / total))
+        query = queries[frame % 2]
+        if frame == warmup:
+            prof.stages.clear()   # el desglose por etapas tampoco incluye el calentamiento
+        start = time.perf_counter()
+        prof.begin_frame()
+        with query:
+            with prof.scope("scene_update"):
+                scene.update()
+            engine.render()
+        prof.end_frame()
+        elapsed = time.perf_counter() - start
+        if frame < warmup:
+            continue
+        cpu_ms.append(elapsed * 1000.0)
+        stats = scene.render_stats
+        draws.append(stats.get("draws", 0))
+        texture_binds.append(stats.get("texture_binds", 0))
+        culled.append(stats.get("culled", 0))
+        occluded.append(stats.get("occluded", 0))
+        if frame > warmup:
+            gpu_ms.append(queries[(frame - 1) % 2].elapsed / 1e6)
+    ctx.finish()
+    gpu_ms.append(queries[(total - 1) % 2].elapsed / 1e6)
+
+    if screenshot:
+        pg.image.save(engine.read_frame(), screenshot)
+
+    report = {
+        "frames": frames,
+        "warmup_frames": warmup,
+        "resolution": list(engine.WIN_SIZE),
+        "scene_load_s": round(load_s, 3),
+        "cpu_frame_ms": _summary(cpu_ms),
+        "gpu_frame_ms": _summary(gpu_ms),
+        "fps_cpu_mean": round(1000.0 / max(np.mean(cpu_ms), 1e-6), 1),
+        "stages_ms": prof.summary(),
+        "draw_calls": _summary(draws),
+        "texture_binds": _summary(texture_binds),
+        "culled": _summary(culled),
+        "occluded": _summary(occluded),
+        "texture_vram_mb": round(scene.textures.vram_bytes() / 2**20, 2),
+        "gl": {"vendor": ctx.info["GL_VENDOR"], "renderer": ctx.info["GL_RENDERER"],
+               "version": ctx.info["GL_VERSION"]},
+        "python": platform.python_version(),
+    }
+    engine.cleanup()   # las queries (sin release() en moderngl 5.8) caen con el contexto
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark headless de la tienda 3D (salida JSON)")
+    parser.add_argument("--frames", type=int, default=BENCHMARK_FRAMES, help="frames medidos")
+    parser.add_argument("--warmup", type=int, default=BENCHMARK_WARMUP_FRAMES, help="frames sin medir")
+    parser.add_argument("--size", type=int, nargs=2, default=(1200, 800), metavar=("W", "H"))
+    parser.add_argument("--out", help="fichero JSON (por defecto stdout)")
+    parser.add_argument("--screenshot", help="guarda el último frame (png)")
+    args = parser.parse_args(argv)
+
+    # Los logs del motor van a stderr: stdout queda solo para el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmark(args.frames, args.warmup, args.size, args.screenshot)
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✅ Benchmark guardado en {args.out}", file=sys.stderr)
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 import glm
 import math
 
+# Punto de enlace del uniform block 'Camera' (m_proj + m_view) compartido por todos los shaders
+CAMERA_UBO_BINDING = 0
+
 class Camera:
     def __init__(self, app):
         self.app = app
@@ -33,6 +36,11 @@ class Camera:
         # Matrices
         self.m_view = self.get_view_matrix()
         self.m_proj = self.get_projection_matrix()
+
+        # Uniform buffer (std140: m_proj, m_view) se sube solo cuando 'version' cambia
+        self.version = 0
+        self._ubo = None
+        self._ubo_version = -1
         
         self.update_camera_vectors()
 
@@ -113,8 +121,35 @@ class Camera:
 
     def update_view_matrix(self):
         self.m_view = self.get_view_matrix()
+        self.version += 1
 
     def update_projection_matrix(self):
         """Actualiza la matriz de proyección cuando cambia el tamaño de ventana"""
         self.aspect_ratio = self.app.WIN_SIZE[0] / self.app.WIN_SIZE[1]
-        self.m_proj = self.get_projection_matrix()
\ No newline at end of file
+        self.m_proj = self.get_projection_matrix()
+        self.version += 1
+
+    def projected_pixels(self, size, distance):
+        """Tamaño aproximado en píxeles (alto de ventana) de algo de 'size' unidades a 'distance'."""
+        height = self.app.WIN_SIZE[1]
+        if not self.perspective:
+            return size / 4.0 * height   # ortho(-2, 2)
+        distance = max(distance, 0.1)    # plano near
+        return size / distance * height / (2.0 * math.tan(glm.radians(self.fov) * 0.5))
+
+    def bind_uniform_block(self):
+        """
+        Sube m_proj/m_view al UBO de cámara (solo si cambiaron desde la última subida)
+        y lo enlaza en CAMERA_UBO_BINDING. Se llama una vez por frame.
+        """
+        if self._ubo is None:
+            self._ubo = self.app.ctx.buffer(reserve=128, dynamic=True)
+        if self._ubo_version != self.version:
+            self._ubo.write(self.m_proj.to_bytes() + self.m_view.to_bytes())
+            self._ubo_version = self.version
+        self._ubo.bind_to_uniform_block(CAMERA_UBO_BINDING)
+
+    def release(self):
+        if self._ubo is not None:
+            self._ubo.release()
+            self._ubo = None
\ No newline at end of file
@@ -1,3 +1,4 @@
+import os
 import pygame as pg
 import numpy as np
 import moderngl as mgl
@@ -5,26 +6,86 @@ import sys
 from .camera import Camera
 from src.gui.ui_manager import UIManager
 from src.scene.scene_manager import SceneManager
+from src.objects.base_object import register_shader_variant, acquire_program
+from src.core.texture_manager import get_texture_manager, release_texture_manager
+from src.core.texture_array import release_product_texture_array
+from src.core.profiler import Profiler, ProfilerOverlay
+from src.catalog.store import close_catalog
+from src.utils.config import HEADLESS_GL_BACKEND
+
+register_shader_variant(
+    'gui_overlay',
+    vertex_shader='''
+        #version 330
+        in vec2 in_vert;
+        in vec2 in_uv;
+        out vec2 v_uv;
+        void main() {
+            v_uv = in_uv;
+            gl_Position = vec4(in_vert, 0.0, 1.0);
+        }
+    ''',
+    fragment_shader='''
+        #version 330
+        uniform sampler2D tex;
+        in vec2 v_uv;
+        out vec4 fragColor;
+        void main() {
+            fragColor = texture(tex, v_uv);
+        }
+    '''
+)
+
+
+def create_headless_context(backend=HEADLESS_GL_BACKEND):
+    """
+    Contexto OpenGL 3.3 sin ventana. Sin backend explícito se prueba el de la
+    plataforma y, si no hay display (CI, servidores), EGL.
+    """
+    if backend:
+        return mgl.create_standalone_context(require=330, backend=backend)
+    try:
+        return mgl.create_standalone_context(require=330)
+    except Exception as e:
+        print(f"[GL] contexto standalone por defecto no disponible ({e}); probando EGL")
+        return mgl.create_standalone_context(require=330, backend='egl')
+
 
 class GraphicsEngine:
-    def __init__(self):
+    def __init__(self, headless=False, win_size=(1200, 800)):
+        """
+        headless=True: contexto standalone + framebuffer propio, sin ventana de pygame
+        ni GUI (benchmarks, CI). El resto del motor (escena, cámara, texturas) es el mismo.
+        """
+        self.headless = headless
+        if headless:
+            # pygame solo se usa para decodificar imágenes: sin ventana real
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
         pg.init()
-        self.WIN_SIZE = (1200, 800)
+        self.WIN_SIZE = tuple(win_size)
 
         # Configuración OpenGL
         self._setup_opengl()
         
         # Componentes principales
+        self.profiler = Profiler(self.ctx)
         self.camera = Camera(self)
         self.scene_manager = SceneManager(self)
-        self.ui_manager = UIManager(self.WIN_SIZE)
-        
-        # Configurar callbacks de UI
-        self._setup_ui_callbacks()
+        self.ui_manager = None if headless else UIManager(self.WIN_SIZE)
         
         # Estados de control
         self.left_mouse_pressed = False
         self.clock = pg.time.Clock()
+        if headless:
+            return
+
+        # Configurar callbacks de UI
+        self._setup_ui_callbacks()
+        self.scene_manager.on_pick = self._on_pick
+
+        # Panel del perfilador (F3); comparte el programa del overlay de la GUI
+        self.profiler_overlay = ProfilerOverlay(self.ctx, self.profiler, self.quad_program, self.WIN_SIZE,
+                                                stats=lambda: self.scene_manager.render_stats)
         
         # Configuración inicial
         pg.mouse.set_visible(True)
@@ -33,6 +94,16 @@ class GraphicsEngine:
 
     def _setup_opengl(self):
         """Configura el contexto OpenGL"""
+        if self.headless:
+            self.ctx = create_headless_context()
+            self.fbo = self.ctx.framebuffer(
+                color_attachments=[self.ctx.renderbuffer(self.WIN_SIZE)],
+                depth_attachment=self.ctx.depth_renderbuffer(self.WIN_SIZE),
+            )
+            self.fbo.use()
+            self.ctx.enable(mgl.DEPTH_TEST)
+            return
+
         pg.display.gl_set_attribute(pg.GL_CONTEXT_MAJOR_VERSION, 3)
         pg.display.gl_set_attribute(pg.GL_CONTEXT_MINOR_VERSION, 3)
         pg.display.gl_set_attribute(pg.GL_CONTEXT_PROFILE_MASK, pg.GL_CONTEXT_PROFILE_CORE)
@@ -49,36 +120,22 @@ class GraphicsEngine:
         """Configura el renderizado de GUI"""
         self.gui_surface = pg.Surface(self.WIN_SIZE, pg.SRCALPHA)
         self.gui_texture = self.ctx.texture(self.WIN_SIZE, 4)
+        self.gui_has_content = False
+        if hasattr(self, 'ui_manager'):
+            self.ui_manager.invalidate_overlay()
         
-        # Quad para renderizado
+        # Quad para renderizado. La textura guarda las filas de arriba a abajo (sin flip en CPU):
+        # el borde superior de pantalla muestrea v=0
         self.quad = self.ctx.buffer(np.array([
-            -1.0,  1.0, 0.0, 1.0,
-            -1.0, -1.0, 0.0, 0.0,
-             1.0,  1.0, 1.0, 1.0,
-             1.0, -1.0, 1.0, 0.0,
+            -1.0,  1.0, 0.0, 0.0,
+            -1.0, -1.0, 0.0, 1.0,
+             1.0,  1.0, 1.0, 0.0,
+             1.0, -1.0, 1.0, 1.0,
         ], dtype='f4').tobytes())
 
-        self.quad_program = self.ctx.program(
-            vertex_shader='''
-                #version 330
-                in vec2 in_vert;
-                in vec2 in_uv;
-                out vec2 v_uv;
-                void main() {
-                    v_uv = in_uv;
-                    gl_Position = vec4(in_vert, 0.0, 1.0);
-                }
-            ''',
-            fragment_shader='''
-                #version 330
-                uniform sampler2D tex;
-                in vec2 v_uv;
-                out vec4 fragColor;
-                void main() {
-                    fragColor = texture(tex, v_uv);
-                }
-            '''
-        )
+        # Programa compartido del registro (se compila una sola vez aunque se rehaga la GUI)
+        if getattr(self, 'quad_program', None) is None:
+            self.quad_program = acquire_program(self.ctx, 'gui_overlay')
 
         self.quad_vao = self.ctx.vertex_array(
             self.quad_program,
@@ -175,8 +232,11 @@ class GraphicsEngine:
 
     def _on_apply_config(self):
         """Callback para aplicar configuración"""
+        values = self.ui_manager.menu_gui.get_config_values()
+        quality = values.get("texture_quality")
+        if quality:
+            get_texture_manager(self.ctx).set_quality(quality)
         print("✓ Configuración aplicada")
-        # Aquí aplicarías los cambios de configuración
 
     def get_events(self):
         """Obtiene eventos de pygame"""
@@ -197,6 +257,11 @@ class GraphicsEngine:
                 if event.key == pg.K_m:
                     visible = self.ui_manager.toggle_main_menu()
                     print(f"Menú principal: {'VISIBLE' if visible else 'OCULTO'}")
+                elif event.key == pg.K_F3:
+                    visible = self.profiler_overlay.toggle()
+                    print(f"Perfilador: {'VISIBLE' if visible else 'OCULTO'}")
+                elif event.key == pg.K_F4:
+                    self.profiler.dump_chrome_trace()
                 elif event.key == pg.K_ESCAPE:
                     self.cleanup()
                     pg.quit()
@@ -212,8 +277,8 @@ class GraphicsEngine:
                         print("✓ Control de cámara activado")
                 elif event.button == 3:  # Click derecho
                     if not self.ui_manager.is_hovering_ui():
-                        self.ui_manager.menu_gui.create_context_menu(event.pos)
-                        print(f"✓ Menú contextual en: {event.pos}")
+                        # El menú se abre al llegar el picking (un frame después) con el objeto clicado
+                        self.scene_manager.request_pick(event.pos, "context")
 
             elif event.type == pg.MOUSEBUTTONUP:
                 if event.button == 1:
@@ -225,6 +290,17 @@ class GraphicsEngine:
             elif event.type == pg.MOUSEMOTION:
                 if self.left_mouse_pressed and not self.ui_manager.is_hovering_ui():
                     self.handle_mouse_movement(event)
+                elif not self.left_mouse_pressed:
+                    if self.ui_manager.is_hovering_ui():
+                        self.scene_manager.hovered = None
+                    else:
+                        self.scene_manager.request_pick(event.pos, "hover")
+
+    def _on_pick(self, tag, result, pos):
+        """Resultado del picking por ID buffer (llega un frame después de pedirlo)."""
+        if tag == "context":
+            self.ui_manager.menu_gui.create_context_menu(pos, target=result)
+            print(f"✓ Menú contextual en: {pos} ({result.label if result else 'sin objeto'})")
 
     def handle_mouse_movement(self, event):
         """Procesa el movimiento del ratón para la cámara"""
@@ -256,16 +332,23 @@ class GraphicsEngine:
             self.camera.move_down()
 
     def render_gui(self):
-        """Renderiza la GUI sobre OpenGL"""
-        # Limpiar surface de GUI
-        self.gui_surface.fill((0, 0, 0, 0))
-        
-        # ✅ CORRECCIÓN: Usar el UIManager de pygame_gui para dibujar
-        self.ui_manager.ui_manager.draw_ui(self.gui_surface)
-        
-        # Convertir surface a textura OpenGL (True = invertir verticalmente)
-        texture_data = pg.image.tostring(self.gui_surface, 'RGBA', True)
-        self.gui_texture.write(texture_data)
+        """
+        Renderiza la GUI sobre OpenGL.
+        Solo se redibujan y suben a GPU las regiones que cambiaron (dirty rects del UIManager);
+        si no cambió nada no hay copia ni subida, y sin elementos visibles no hay ni draw.
+        """
+        for rect in self.ui_manager.get_dirty_rects():
+            # Redibujar la GUI recortada a la región y subir solo esa sub-región
+            self.gui_surface.set_clip(rect)
+            self.gui_surface.fill((0, 0, 0, 0))
+            self.ui_manager.ui_manager.draw_ui(self.gui_surface)
+            self.gui_surface.set_clip(None)
+            region = pg.image.tobytes(self.gui_surface.subsurface(rect), 'RGBA')
+            self.gui_texture.write(region, viewport=(rect.x, rect.y, rect.w, rect.h))
+            self.gui_has_content = bool(self.ui_manager.ui_manager.get_sprite_group().visible)
+
+        if not self.gui_has_content:
+            return
         
         # Renderizar textura GUI sobre la escena 3D
         self.ctx.disable(mgl.DEPTH_TEST)
@@ -276,31 +359,63 @@ class GraphicsEngine:
         self.ctx.enable(mgl.DEPTH_TEST)
 
     def render(self):
-        """Renderiza la escena completa"""
+        """Renderiza la escena completa (sin presentarla: eso es present())"""
+        prof = self.profiler
         # Limpiar buffers
         self.ctx.clear(color=(0.5, 0.7, 1.0), depth=1.0)
         
         # Actualizar y renderizar escena 3D
         if self.scene_manager:
-            self.scene_manager.render()
+            with prof.scope("scene_render"):
+                self.scene_manager.render()
         
+        if self.headless:
+            return
+
         # Renderizar GUI encima
-        self.render_gui()
-        
-        # Intercambiar buffers
-        pg.display.flip()
+        with prof.scope("render_gui"):
+            self.render_gui()
+            self.profiler_overlay.render()
+
+    def present(self):
+        """Intercambia buffers. Va fuera del gpu_scope de render: vsync y compositor no son GPU."""
+        if self.headless:
+            return
+        with self.profiler.scope("swap"):
+            pg.display.flip()
+
+    def read_frame(self):
+        """Último frame como Surface de pygame (modo headless: capturas de benchmark/CI)."""
+        data = self.fbo.read(components=3)
+        return pg.transform.flip(pg.image.frombytes(data, self.WIN_SIZE, "RGB"), False, True)
 
     def cleanup(self):
         """Limpia recursos al cerrar"""
         print("✓ Limpiando recursos...")
-        pg.mouse.set_visible(True)
-        pg.event.set_grab(False)
+        if not self.headless:
+            pg.mouse.set_visible(True)
+            pg.event.set_grab(False)
         
         if hasattr(self, 'scene_manager'):
             self.scene_manager.cleanup()
+
+        if hasattr(self, 'camera'):
+            self.camera.release()
+
+        release_texture_manager(self.ctx)
+        release_product_texture_array(self.ctx)
+        close_catalog()
         
-        if hasattr(self, 'ui_manager'):
+        if getattr(self, 'ui_manager', None) is not None:
             self.ui_manager.cleanup()
+
+        if getattr(self, 'profiler_overlay', None) is not None:
+            self.profiler_overlay.release()
+
+        if self.headless:
+            for attachment in (*self.fbo.color_attachments, self.fbo.depth_attachment):
+                attachment.release()
+            self.fbo.release()
         
         print("✓ Recursos liberados correctamente")
 
@@ -310,24 +425,39 @@ class GraphicsEngine:
         print("🚀 Aplicación iniciada - Versión corregida")
         print("🎯 Los botones deberían funcionar ahora correctamente")
 
+        prof = self.profiler
         while True:
             # ✅ CORRECCIÓN: Calcular time_delta primero
+            # La espera del limitador a 60 FPS queda fuera del frame perfilado
             time_delta = self.clock.tick(60) / 1000.0
-            events = self.get_events()
-            
-            # ✅ CORRECCIÓN: Orden correcto de procesamiento
-            # 1. Procesar eventos con pygame_gui PRIMERO
-            for event in events:
-                self.ui_manager.ui_manager.process_events(event)
+            prof.begin_frame()
+            with prof.scope("events"):
+                events = self.get_events()
+                
+                # ✅ CORRECCIÓN: Orden correcto de procesamiento
+                # 1. Procesar eventos con pygame_gui PRIMERO
+                for event in events:
+                    self.ui_manager.ui_manager.process_events(event)
             
             # 2. Actualizar UI con time_delta
-            self.ui_manager.ui_manager.update(time_delta)
+            with prof.scope("ui_update"):
+                self.ui_manager.update(time_delta)
             
             # 3. Manejar eventos personalizados (pasar time_delta)
-            self.handle_events(events, time_delta)
+            with prof.scope("handle_events"):
+                self.handle_events(events, time_delta)
             
             # 4. Input de teclado continuo
-            self.handle_keyboard_input()
+            with prof.scope("keyboard"):
+                self.handle_keyboard_input()
+            
+            # 5. Subir a GPU lo que el cargador en segundo plano ya tiene listo
+            with prof.scope("scene_update"):
+                self.scene_manager.update()
             
-            # 5. Renderizar
-            self.render()
\ No newline at end of file
+            # 6. Renderizar (el tiempo de GPU se lee un par de frames después)
+            with prof.gpu_scope("render"):
+                self.render()
+            # 7. Presentar (swap/vsync fuera de la medida de GPU)
+            self.present()
+            prof.end_frame()
\ No newline at end of file
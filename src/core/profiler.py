@@ -0,0 +1,262 @@
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+import pygame as pg
+import moderngl as mgl
+from src.utils.config import PROFILER_HISTORY, PROFILER_HITCH_MS, PROFILER_TRACE_DIR
+
+# Cubetas del histograma de tiempo de frame (ms): 120/60/30/20 FPS y peor
+HISTOGRAM_EDGES_MS = (8.3, 16.7, 33.3, 50.0)
+
+
+class Profiler:
+    """
+    Perfilador de frames:
+    - scope(nombre): temporizador de CPU (anidable) alrededor de una etapa del frame.
+    - gpu_scope(nombre): query de tiempo GL; el resultado se lee GPU_LATENCY frames
+      después para no bloquear (los timer queries de GL no se pueden anidar).
+    - Historial rodante de PROFILER_HISTORY frames por etapa, histograma de tiempos de
+      frame y volcado a JSON de Chrome trace (chrome://tracing, Perfetto).
+    - Los frames por encima de PROFILER_HITCH_MS se avisan por consola con su desglose.
+    """
+    GPU_LATENCY = 2
+
+    def __init__(self, ctx=None, history=PROFILER_HISTORY, hitch_ms=PROFILER_HITCH_MS):
+        self.ctx = ctx
+        self.history = history
+        self.hitch_ms = hitch_ms
+        self.frame = 0
+        self.frame_ms = deque(maxlen=history)
+        self.stages = {}                          # nombre -> deque de ms (CPU, 'gpu:...' GPU)
+        self.frames = deque(maxlen=history)       # eventos por frame para el Chrome trace
+        self._events = []                         # (nombre, cat, inicio_ns, dur_ns, profundidad)
+        self._depth = 0
+        self._frame_start = None
+        self._epoch = time.perf_counter_ns()
+        self._free_queries = []
+        self._gpu_pending = deque()               # (frame, nombre, query, inicio_ns)
+
+    # ---------- Frames ----------
+    def begin_frame(self):
+        self._frame_start = time.perf_counter_ns()
+        self._events = []
+
+    def end_frame(self):
+        if self._frame_start is None:
+            return
+        end = time.perf_counter_ns()
+        total_ms = (end - self._frame_start) / 1e6
+        self.frame_ms.append(total_ms)
+        self._events.append(("frame", "frame", self._frame_start, end - self._frame_start, 0))
+        self.frames.append(self._events)
+        self._collect_gpu()
+        if self.hitch_ms and total_ms > self.hitch_ms and self.frame > self.GPU_LATENCY:
+            self._report_hitch(total_ms)
+        self._frame_start = None
+        self.frame += 1
+
+    def _record(self, name, ms):
+        samples = self.stages.get(name)
+        if samples is None:
+            samples = self.stages[name] = deque(maxlen=self.history)
+        samples.append(ms)
+
+    @contextmanager
+    def scope(self, name):
+        """Cronometra el bloque en CPU (se puede anidar)."""
+        start = time.perf_counter_ns()
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            dur = time.perf_counter_ns() - start
+            self._events.append((name, "cpu", start, dur, self._depth))
+            self._record(name, dur / 1e6)
+
+    @contextmanager
+    def gpu_scope(self, name):
+        """Tiempo de GPU del bloque (query de GL). Sin contexto se comporta como un bloque vacío."""
+        if self.ctx is None:
+            yield
+            return
+        query = self._free_queries.pop() if self._free_queries else self.ctx.query(time=True)
+        start = time.perf_counter_ns()
+        with query:
+            yield
+        self._gpu_pending.append((self.frame, name, query, start))
+
+    def _collect_gpu(self):
+        # Solo queries de hace GPU_LATENCY frames: a esas alturas la GPU ya terminó
+        while self._gpu_pending and self._gpu_pending[0][0] <= self.frame - self.GPU_LATENCY:
+            frame, name, query, start = self._gpu_pending.popleft()
+            dur = query.elapsed
+            self._free_queries.append(query)
+            if dur >= 0xFFFFFFFF:
+                continue   # algunos drivers devuelven -1 (u32) si la query no llegó a resolverse
+            self._record(f"gpu:{name}", dur / 1e6)
+            # El evento GPU se ancla al inicio del bloque en CPU (aproximado) del frame original
+            index = len(self.frames) - 1 - (self.frame - frame)
+            if index >= 0:
+                self.frames[index].append((f"gpu:{name}", "gpu", start, dur, 0))
+
+    # ---------- Consultas ----------
+    def summary(self):
+        """{etapa: {'last', 'mean', 'max'} en ms} sobre el historial."""
+        out = {}
+        for name, samples in self.stages.items():
+            if samples:
+                out[name] = {"last": round(samples[-1], 3), "mean": round(float(np.mean(samples)), 3),
+                             "max": round(max(samples), 3)}
+        return out
+
+    def histogram(self, edges=HISTOGRAM_EDGES_MS):
+        """Nº de frames del historial en cada cubeta: [<e0, e0-e1, ..., >=eN]."""
+        if not self.frame_ms:
+            return [0] * (len(edges) + 1)
+        return np.bincount(np.searchsorted(edges, np.asarray(self.frame_ms), side='right'),
+                           minlength=len(edges) + 1).tolist()
+
+    def frame_percentile(self, p):
+        return float(np.percentile(self.frame_ms, p)) if self.frame_ms else 0.0
+
+    def _report_hitch(self, total_ms):
+        parts = sorted(((dur, name) for name, cat, _, dur, depth in self._events
+                        if cat == "cpu" and depth == 0), reverse=True)[:4]
+        detail = ", ".join(f"{name} {dur / 1e6:.1f}" for dur, name in parts)
+        print(f"⚠️ [Profiler] frame {self.frame}: {total_ms:.1f} ms ({detail})")
+
+    # ---------- Chrome trace ----------
+    def dump_chrome_trace(self, path=None):
+        """Escribe los últimos frames en formato Chrome trace (JSON). Devuelve la ruta."""
+        if path is None:
+            os.makedirs(PROFILER_TRACE_DIR, exist_ok=True)
+            path = os.path.join(PROFILER_TRACE_DIR, time.strftime("trace-%Y%m%d-%H%M%S.json"))
+        events = []
+        for frame_events in self.frames:
+            for name, cat, start, dur, _ in frame_events:
+                events.append({
+                    "name": name, "cat": cat, "ph": "X",
+                    "ts": (start - self._epoch) / 1000.0, "dur": dur / 1000.0,
+                    "pid": 1, "tid": 2 if cat == "gpu" else 1,
+                })
+        events += [{"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": label}}
+                   for tid, label in ((1, "CPU"), (2, "GPU"))]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"✅ [Profiler] traza de {len(self.frames)} frames guardada en {path}")
+        return path
+
+
+class ProfilerOverlay:
+    """
+    Panel de texto con los tiempos del Profiler, en su propia textura y quad (esquina
+    superior izquierda) para no ensuciar la textura de la GUI. Se redibuja unas pocas
+    veces por segundo; dibujarlo por frame es un único draw.
+    'stats' (opcional) devuelve los contadores del último frame (render_stats de la escena).
+    """
+    SIZE = (400, 340)
+    REFRESH_S = 0.25
+    COLUMNS = (8, 150, 230, 310)   # x de cada columna de la tabla de etapas
+    BAR_WIDTH = 180
+
+    def __init__(self, ctx, profiler, program, win_size, margin=10, stats=None):
+        self.ctx = ctx
+        self.profiler = profiler
+        self.stats = stats
+        self.program = program
+        self.visible = False
+        self._last_refresh = 0.0
+        self._font = None
+        self.surface = pg.Surface(self.SIZE, pg.SRCALPHA)
+        self.texture = ctx.texture(self.SIZE, 4)
+        self.texture.filter = (mgl.NEAREST, mgl.NEAREST)
+        w, h = win_size
+        x0, y0 = -1.0 + 2.0 * margin / w, 1.0 - 2.0 * margin / h
+        x1, y1 = x0 + 2.0 * self.SIZE[0] / w, y0 - 2.0 * self.SIZE[1] / h
+        # Misma convención que el quad de la GUI: v=0 es el borde superior
+        self.quad = ctx.buffer(np.array([
+            x0, y0, 0.0, 0.0,
+            x0, y1, 0.0, 1.0,
+            x1, y0, 1.0, 0.0,
+            x1, y1, 1.0, 1.0,
+        ], dtype='f4').tobytes())
+        self.vao = ctx.vertex_array(program, [(self.quad, '2f 2f', 'in_vert', 'in_uv')])
+
+    def toggle(self):
+        self.visible = not self.visible
+        self._last_refresh = 0.0
+        return self.visible
+
+    def _rows(self):
+        """Filas del panel: texto suelto, celdas de tabla (tupla) o barra del histograma (dict)."""
+        prof = self.profiler
+        fps = 1000.0 / max(np.mean(prof.frame_ms), 1e-6) if prof.frame_ms else 0.0
+        rows = [
+            f"FPS {fps:.1f}   frame {prof.frame_ms[-1] if prof.frame_ms else 0:.1f} ms",
+            f"p50 {prof.frame_percentile(50):.1f}   p95 {prof.frame_percentile(95):.1f}   "
+            f"máx {max(prof.frame_ms, default=0):.1f} ms",
+        ]
+        if self.stats is not None:
+            counters = self.stats()
+            rows.append(f"dibujados {counters.get('drawn', 0)}   fuera {counters.get('culled', 0)}   "
+                        f"ocluidos {counters.get('occluded', 0)}/{counters.get('occlusion_tests', 0)}")
+        rows += [
+            "",
+            ("etapa (ms)", "último", "media", "máx"),
+        ]
+        for name, s in prof.summary().items():
+            rows.append((name, f"{s['last']:.2f}", f"{s['mean']:.2f}", f"{s['max']:.2f}"))
+        rows.append("")
+        counts = prof.histogram()
+        total = max(sum(counts), 1)
+        labels = [f"< {e:g}" for e in HISTOGRAM_EDGES_MS] + [f">= {HISTOGRAM_EDGES_MS[-1]:g}"]
+        for label, count in zip(labels, counts):
+            rows.append({"label": f"{label} ms", "fraction": count / total})
+        return rows
+
+    def _redraw(self):
+        if self._font is None:
+            pg.font.init()
+            self._font = pg.font.SysFont("monospace", 13)
+        color = (230, 255, 230)
+        self.surface.fill((0, 0, 0, 170))
+        y = 6
+        for row in self._rows():
+            if isinstance(row, tuple):
+                # Columnas en x fija: no depende de que la fuente sea monoespaciada
+                for x, cell in zip(self.COLUMNS, row):
+                    self.surface.blit(self._font.render(cell, True, color), (x, y))
+            elif isinstance(row, dict):
+                self.surface.blit(self._font.render(row["label"], True, color), (8, y))
+                width = round(self.BAR_WIDTH * row["fraction"])
+                if width:
+                    self.surface.fill((120, 220, 120, 230), pg.Rect(self.COLUMNS[1], y + 3, width, 9))
+                pct = self._font.render(f"{100 * row['fraction']:.0f}%", True, color)
+                self.surface.blit(pct, (self.COLUMNS[1] + self.BAR_WIDTH + 8, y))
+            elif row:
+                self.surface.blit(self._font.render(row, True, color), (8, y))
+            y += 15
+        self.texture.write(pg.image.tobytes(self.surface, 'RGBA'))
+
+    def render(self):
+        if not self.visible:
+            return
+        now = time.perf_counter()
+        if now - self._last_refresh >= self.REFRESH_S:
+            self._redraw()
+            self._last_refresh = now
+        self.ctx.disable(mgl.DEPTH_TEST)
+        self.ctx.enable(mgl.BLEND)
+        self.texture.use(0)
+        self.program['tex'] = 0
+        self.vao.render(mgl.TRIANGLE_STRIP)
+        self.ctx.enable(mgl.DEPTH_TEST)
+
+    def release(self):
+        self.vao.release()
+        self.quad.release()
+        self.texture.release()
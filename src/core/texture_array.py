@@ -0,0 +1,101 @@
+import moderngl as mgl
+import numpy as np
+import pygame as pg
+from src.core.texture_manager import decode_texture
+from src.utils.config import PRODUCT_TEXTURE_LAYER_SIDE, PRODUCT_TEXTURE_ARRAY_LAYERS
+
+_TEXTURE_ARRAYS = {}   # ctx -> TextureArray de productos
+
+
+def get_product_texture_array(ctx):
+    """Texture array compartido por los materiales de producto del contexto."""
+    array = _TEXTURE_ARRAYS.get(ctx)
+    if array is None:
+        array = _TEXTURE_ARRAYS[ctx] = TextureArray(ctx, "product_texture_array")
+    return array
+
+
+def release_product_texture_array(ctx):
+    array = _TEXTURE_ARRAYS.pop(ctx, None)
+    if array is not None:
+        array.release()
+
+
+def decode_layer(path, side=PRODUCT_TEXTURE_LAYER_SIDE):
+    """
+    RGBA de 'path' a exactamente side x side (todas las capas miden lo mismo).
+    Sale de la caché de mips cuando existe; no toca GL (apta para hilos de carga).
+    """
+    _, size, data = decode_texture(path, side)
+    if size == (side, side):
+        return bytes(data)
+    surf = pg.image.frombytes(bytes(data), size, "RGBA")
+    surf = pg.transform.smoothscale(surf, (side, side))
+    return pg.image.tobytes(surf, "RGBA")
+
+
+class TextureArray:
+    """
+    Varias texturas del mismo tamaño en las capas de un sampler2DArray: los lotes
+    instanciados eligen la capa por instancia, así productos con distinta textura
+    comparten bind y draw call. Crece duplicando capas (copia en GPU->CPU->GPU).
+    """
+
+    def __init__(self, ctx, path, side=PRODUCT_TEXTURE_LAYER_SIDE, capacity=PRODUCT_TEXTURE_ARRAY_LAYERS):
+        self.ctx = ctx
+        self.path = path          # clave de material (como ManagedTexture.path)
+        self.side = side
+        self.layers = {}          # path de textura -> capa
+        self.texture = None
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = self.texture
+        self.capacity = capacity
+        self.texture = self.ctx.texture_array((self.side, self.side, capacity), 4)
+        self.texture.filter = (mgl.LINEAR_MIPMAP_LINEAR, mgl.LINEAR)
+        self.texture.repeat_x = True
+        self.texture.repeat_y = True
+        if old is not None:
+            used = len(self.layers)
+            data = np.frombuffer(old.read(), dtype=np.uint8)[:self.side * self.side * 4 * used]
+            self.texture.write(data.tobytes(), viewport=(0, 0, 0, self.side, self.side, used))
+            self.texture.build_mipmaps()
+            old.release()
+
+    def has_layer(self, path):
+        return path in self.layers
+
+    def add(self, path, data):
+        """Sube 'data' (RGBA side x side, decode_layer) como capa nueva; devuelve su índice."""
+        layer = self.layers.get(path)
+        if layer is not None:
+            return layer
+        layer = len(self.layers)
+        if layer >= self.capacity:
+            self._allocate(self.capacity * 2)
+        self.texture.write(data, viewport=(0, 0, layer, self.side, self.side, 1))
+        self.texture.build_mipmaps()
+        self.layers[path] = layer
+        print(f"[TextureArray] capa {layer} <- '{path}' ({self.side}x{self.side})")
+        return layer
+
+    def layer_for(self, path):
+        """Capa de 'path'; si aún no está se decodifica y sube ahora."""
+        layer = self.layers.get(path)
+        if layer is None:
+            layer = self.add(path, decode_layer(path, self.side))
+        return layer
+
+    # Misma interfaz que ManagedTexture para BaseObject.bind_material / streaming
+    def use(self, location=0):
+        self.texture.use(location=location)
+
+    def request(self, texels):
+        pass   # resolución fija por capa
+
+    def release(self):
+        if self.texture is not None:
+            self.texture.release()
+            self.texture = None
+        self.layers.clear()
@@ -0,0 +1,287 @@
+import os
+import moderngl as mgl
+import pygame as pg
+from src.scene.asset_loader import AssetLoader
+from src.utils import config
+from src.utils.config import (
+    TEXTURE_VRAM_BUDGET_MB, TEXTURE_INITIAL_SIDE, TEXTURE_QUALITY_CAPS, TEXTURE_QUALITY,
+)
+from src.utils.texture_cache import load_mip_chain, mip_level, mip_size as _level_size
+
+_TEXTURE_MANAGERS = {}   # ctx -> TextureManager
+_PLACEHOLDER_SIDE = 64
+
+
+def get_texture_manager(ctx):
+    """TextureManager del contexto (se crea la primera vez)."""
+    manager = _TEXTURE_MANAGERS.get(ctx)
+    if manager is None:
+        manager = _TEXTURE_MANAGERS[ctx] = TextureManager(ctx)
+    return manager
+
+
+def release_texture_manager(ctx):
+    manager = _TEXTURE_MANAGERS.pop(ctx, None)
+    if manager is not None:
+        manager.release()
+
+
+def _level_for_side(full_size, max_side):
+    """Primer nivel de mip (0 = original) cuyo lado mayor no pasa de 'max_side'."""
+    level = 0
+    if max_side:
+        while max(_level_size(full_size, level)) > max_side and max(_level_size(full_size, level)) > 1:
+            level += 1
+    return level
+
+
+def _placeholder(path):
+    """Damero gris para texturas que faltan: la escena se ve (y avisa) en vez de abortar."""
+    print(f"⚠️ [Texturas] no existe '{path}': se usa textura de reemplazo")
+    side = _PLACEHOLDER_SIDE
+    surf = pg.Surface((side, side), pg.SRCALPHA, 32)
+    surf.fill((200, 200, 200, 255))
+    cell = side // 8
+    for y in range(0, side, cell):
+        for x in range((y // cell) % 2 * cell, side, 2 * cell):
+            surf.fill((160, 160, 160, 255), pg.Rect(x, y, cell, cell))
+    return (side, side), (side, side), pg.image.tobytes(surf, "RGBA", True)
+
+
+def decode_texture(path, max_side=TEXTURE_INITIAL_SIDE):
+    """
+    Decodifica una imagen a RGBA (filas de abajo a arriba, como espera OpenGL), reducida
+    al primer nivel de mip cuyo lado no pasa de 'max_side' (None = resolución original).
+    Con TEXTURE_DISK_CACHE el nivel sale de la cadena de mips cacheada en disco
+    (mapeada en memoria: ni decodificación ni reescalado tras la primera ejecución).
+    No toca el contexto GL: se puede llamar desde hilos de carga.
+    Devuelve (tamaño_original, tamaño, datos).
+    """
+    if not os.path.exists(path):
+        return _placeholder(path)
+    if config.TEXTURE_DISK_CACHE:
+        chain = load_mip_chain(path)
+        full = chain['full_size']
+        level = _level_for_side(full, max_side)
+        return full, _level_size(full, level), mip_level(chain, level)
+    # Sin convert_alpha(): necesita el display y no es seguro fuera del hilo principal;
+    # tobytes('RGBA') ya convierte (alfa 255 si la imagen no trae canal alfa)
+    surf = pg.image.load(path)
+    full = surf.get_size()
+    size = _level_size(full, _level_for_side(full, max_side))
+    if size != full:
+        if surf.get_bitsize() not in (24, 32):
+            rgba = pg.Surface(full, pg.SRCALPHA, 32)
+            rgba.blit(surf, (0, 0))
+            surf = rgba
+        surf = pg.transform.smoothscale(surf, size)
+    return full, size, pg.image.tobytes(surf, "RGBA", True)
+
+
+class ManagedTexture:
+    """
+    Handle estable de una textura en streaming: los objetos guardan el handle y
+    llaman use(); la textura GPU de detrás cambia de resolución según la demanda.
+    """
+
+    def __init__(self, manager, path, full_size):
+        self.manager = manager
+        self.path = path
+        self.full_size = full_size
+        self.texture = None     # moderngl.Texture residente
+        self.size = (0, 0)
+        self.demand = 0         # texels (lado) pedidos en el frame actual
+        self.last_used = -1     # frame del último use()
+        self.pending = False    # hay una subida de mejor nivel en curso
+        self.shrinking = None   # tamaño al que está bajando (nivel menor en el pool)
+
+    @property
+    def side(self):
+        return max(self.size)
+
+    @property
+    def planned_side(self):
+        return max(self.shrinking or self.size)
+
+    @property
+    def vram_bytes(self):
+        # RGBA8 + cadena de mipmaps (~4/3); si está bajando de nivel cuenta ya el tamaño final
+        w, h = self.shrinking or self.size
+        return w * h * 4 * 4 // 3
+
+    def use(self, location=0):
+        self.last_used = self.manager.frame
+        self.texture.use(location=location)
+
+    def request(self, texels):
+        """Pide al menos 'texels' de lado para el próximo frame (el mayor pedido gana)."""
+        if texels > self.demand:
+            self.demand = texels
+
+
+class TextureManager:
+    """
+    Caché de texturas con presupuesto de VRAM:
+    - Cada textura entra con un nivel bajo (TEXTURE_INITIAL_SIDE) y sube de nivel cuando
+      algún objeto visible pide más detalle (tamaño proyectado en pantalla).
+    - Los niveles altos se decodifican en segundo plano y se suben con presupuesto por frame.
+    - Si se pasa del presupuesto, las menos usadas recientemente (LRU) bajan de nivel:
+      el mip menor sale de la CPU (cadena mapeada de la caché de disco, en el pool) y se
+      sube unos frames después. Nunca se lee de la GPU (sincronizaría el pipeline).
+    - La calidad ('Baja'/'Media'/'Alta') fija el lado máximo residente.
+    """
+    UPLOAD_BUDGET_S = 0.002
+    STALE_FRAMES = 120   # sin usarse en este nº de frames -> candidata a bajar de nivel
+
+    def __init__(self, ctx, budget_mb=TEXTURE_VRAM_BUDGET_MB, quality=TEXTURE_QUALITY):
+        self.ctx = ctx
+        self.textures = {}   # path -> ManagedTexture
+        self.frame = 0
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.loader = AssetLoader(max_workers=2)
+        self.quality = quality
+        self.max_side = TEXTURE_QUALITY_CAPS.get(quality)
+
+    # ---------- Registro ----------
+    def is_loaded(self, path):
+        return path in self.textures
+
+    def get(self, path):
+        """Handle de 'path'; si no estaba cargada se decodifica ya (nivel inicial)."""
+        handle = self.textures.get(path)
+        if handle is None:
+            handle = self.register(path, decode_texture(path, self._clamp_side(TEXTURE_INITIAL_SIDE)))
+        return handle
+
+    def register(self, path, decoded):
+        """Sube una textura ya decodificada (decode_texture) y devuelve su handle."""
+        full, size, data = decoded
+        handle = self.textures.get(path)
+        if handle is None:
+            handle = self.textures[path] = ManagedTexture(self, path, full)
+        if max(size) > handle.side:
+            self._upload(handle, size, data)
+        return handle
+
+    def _upload(self, handle, size, data):
+        tex = self.ctx.texture(size, 4, data)
+        tex.build_mipmaps()
+        tex.filter = (mgl.LINEAR_MIPMAP_LINEAR, mgl.LINEAR)
+        tex.repeat_x = True
+        tex.repeat_y = True
+        if handle.texture is not None:
+            handle.texture.release()
+        handle.texture = tex
+        handle.size = size
+
+    # ---------- Calidad / presupuesto ----------
+    def _clamp_side(self, side):
+        return side if self.max_side is None else min(side, self.max_side)
+
+    def set_quality(self, quality):
+        """Cambia el tope de resolución; las texturas que lo superan pasan a bajar de nivel."""
+        if quality not in TEXTURE_QUALITY_CAPS:
+            print(f"❌ [Texturas] calidad desconocida: '{quality}'")
+            return
+        self.quality = quality
+        self.max_side = TEXTURE_QUALITY_CAPS[quality]
+        for handle in self.textures.values():
+            if self.max_side is not None and handle.planned_side > self.max_side:
+                self._downgrade(handle, self.max_side)
+        print(f"[Texturas] calidad '{quality}' (lado máx. {self.max_side or 'original'}), "
+              f"VRAM {self.vram_bytes() / 2**20:.1f} MB")
+
+    def set_budget(self, budget_mb):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self._enforce_budget()
+
+    def vram_bytes(self):
+        return sum(h.vram_bytes for h in self.textures.values())
+
+    def _downgrade(self, handle, side):
+        """
+        Baja al primer mip de lado <= 'side': se lee de la CPU en el pool (con la caché de
+        disco, una vista del .npy mapeado) y la textura se sustituye al llegar. Mientras,
+        la VRAM se contabiliza ya con el tamaño final.
+        """
+        size = _level_size(handle.full_size, _level_for_side(handle.full_size, side))
+        if max(size) >= handle.planned_side:
+            return
+        handle.shrinking = size
+
+        def ready(decoded):
+            if handle.shrinking != size:
+                return   # otra bajada (más fuerte) la sustituyó
+            handle.shrinking = None
+            if self.textures.get(handle.path) is handle and max(decoded[1]) < handle.side:
+                self._upload(handle, decoded[1], decoded[2])
+
+        self.loader.submit(decode_texture, handle.path, max(size), on_ready=ready, label=f"mip- {handle.path}")
+
+    def _enforce_budget(self):
+        """LRU: baja a la mitad las menos usadas hasta entrar en presupuesto (mínimo: nivel inicial)."""
+        total = self.vram_bytes()
+        if total <= self.budget_bytes:
+            return
+        floor = self._clamp_side(TEXTURE_INITIAL_SIDE)
+        while total > self.budget_bytes:
+            candidates = [h for h in self.textures.values() if h.planned_side > floor and not h.pending]
+            if not candidates:
+                break
+            victim = min(candidates, key=lambda h: (h.last_used, -h.vram_bytes))
+            before = victim.vram_bytes
+            self._downgrade(victim, max(floor, victim.planned_side // 2))
+            total += victim.vram_bytes - before
+
+    # ---------- Streaming ----------
+    def _target_side(self, handle):
+        """Lado del mip (del original) que cubre la demanda, con el tope de calidad."""
+        full = handle.full_size
+        level = _level_for_side(full, max(1, int(handle.demand)))
+        if level and max(_level_size(full, level)) < handle.demand:
+            level -= 1
+        return self._clamp_side(max(_level_size(full, level)))
+
+    def update(self):
+        """
+        Una vez por frame en el hilo GL (tras el render, que acumula las demandas):
+        sube niveles ya decodificados, lanza las decodificaciones necesarias y aplica el presupuesto.
+        """
+        self.loader.pump(self.UPLOAD_BUDGET_S)
+        stale = self.frame - self.STALE_FRAMES
+        reclaimable = sum(h.vram_bytes for h in self.textures.values() if h.last_used < stale)
+        total = self.vram_bytes()
+        for handle in self.textures.values():
+            if handle.demand and not handle.pending and handle.shrinking is None:
+                side = self._target_side(handle)
+                if side > handle.side:
+                    full = handle.full_size
+                    size = _level_size(full, _level_for_side(full, side))
+                    extra = size[0] * size[1] * 16 // 3 - handle.vram_bytes
+                    # Solo si cabe (contando lo que se puede reclamar de texturas sin uso)
+                    if total + extra <= self.budget_bytes + reclaimable:
+                        total += extra
+                        self._schedule(handle, side)
+            handle.demand = 0
+        self._enforce_budget()
+        self.frame += 1
+
+    def _schedule(self, handle, side):
+        handle.pending = True
+
+        def ready(decoded):
+            handle.pending = False
+            side = max(decoded[1])
+            # Si mientras tanto bajó de nivel (presupuesto) o de calidad, se descarta
+            if self.textures.get(handle.path) is handle and handle.shrinking is None and side == self._clamp_side(side):
+                self.register(handle.path, decoded)
+
+        self.loader.submit(decode_texture, handle.path, side, on_ready=ready, label=f"mip {handle.path}")
+
+    def release(self):
+        self.loader.shutdown()
+        for handle in self.textures.values():
+            if handle.texture is not None:
+                handle.texture.release()
+                handle.texture = None
+        self.textures.clear()
@@ -1,6 +1,10 @@
+import sqlite3
 import pygame as pg
 import pygame_gui
-from pygame_gui.elements import UIButton, UILabel, UIWindow, UIPanel, UITextBox
+from pygame_gui.elements import UIButton, UILabel, UIWindow, UIPanel, UITextBox, UIDropDownMenu
+from src.catalog.store import get_catalog
+from src.gui.product_list import VirtualProductList
+from src.utils.config import TEXTURE_QUALITY, TEXTURE_QUALITY_CAPS
 
 class MenuGUI:
     """Clase principal que gestiona todos los menús de la aplicación"""
@@ -12,15 +16,19 @@ class MenuGUI:
         # Menús
         self.main_menu = None
         self.context_menu = None
+        self.context_target = None   # PickResult del último click derecho
         self.product_menu = None
         self.cart_menu = None
         self.config_menu = None
         
         # Botones
         self.product_buttons = []
+        self.product_list = None   # VirtualProductList del menú de productos
         
         # Estado
         self.current_menu = None
+        self.config_values = {"texture_quality": TEXTURE_QUALITY}
+        self.dd_texture_quality = None
         
     def create_main_menu(self):
         """Crea el menú principal de la aplicación"""
@@ -119,21 +127,35 @@ class MenuGUI:
             object_id='#btn_close'
         )
 
-    def create_context_menu(self, pos):
-        """Crea el menú contextual en posición específica"""
+    def create_context_menu(self, pos, target=None):
+        """
+        Crea el menú contextual en posición específica.
+        'target' (PickResult o None) es el objeto/producto bajo el cursor al hacer click.
+        """
         if self.context_menu:
             self.context_menu.kill()
             
         x, y = pos
+        top = 30 if target is not None else 0
         self.context_menu = UIWindow(
-            rect=pg.Rect(x, y, 180, 150),
+            rect=pg.Rect(x, y, 180, 150 + top),
             manager=self.ui_manager,
             window_display_title='Menú Rápido',
             object_id='#context_menu'
         )
+        self.context_target = target
+
+        if target is not None:
+            UILabel(
+                relative_rect=pg.Rect(5, 5, 170, 25),
+                text=target.label,
+                manager=self.ui_manager,
+                container=self.context_menu,
+                object_id='#context_target'
+            )
 
         self.btn_reset_cam = UIButton(
-            relative_rect=pg.Rect(5, 5, 170, 30),
+            relative_rect=pg.Rect(5, 5 + top, 170, 30),
             text='🔄 Reset Camera',
             manager=self.ui_manager,
             container=self.context_menu,
@@ -141,7 +163,7 @@ class MenuGUI:
         )
 
         self.btn_fullscreen = UIButton(
-            relative_rect=pg.Rect(5, 40, 170, 30),
+            relative_rect=pg.Rect(5, 40 + top, 170, 30),
             text='📺 Toggle Fullscreen',
             manager=self.ui_manager,
             container=self.context_menu,
@@ -149,7 +171,7 @@ class MenuGUI:
         )
 
         self.btn_exit_app = UIButton(
-            relative_rect=pg.Rect(5, 75, 170, 30),
+            relative_rect=pg.Rect(5, 75 + top, 170, 30),
             text='🚪 Exit',
             manager=self.ui_manager,
             container=self.context_menu,
@@ -158,11 +180,18 @@ class MenuGUI:
         
         return self.context_menu
 
-    def create_products_menu(self):
-        """Crea el menú de productos"""
-        if self.product_menu:
-            self.product_menu.kill()
-            
+    def create_products_menu(self, load=True):
+        """
+        Crea el menú de productos una sola vez; al reabrirlo solo se refresca la lista
+        (nº de productos y filas visibles) y se muestra. Si se cerró con la X se recrea.
+        load=False construye los widgets sin abrir el catálogo (arranque: puede estar
+        regenerándose en el pool de carga).
+        """
+        if self.product_menu is not None and self.product_menu.alive():
+            self.product_menu.show()   # muestra todos sus hijos: refresh() vuelve a ocultar las filas vacías
+            self._refresh_product_list()
+            return self.product_menu
+
         self.product_menu = UIWindow(
             rect=pg.Rect(350, 50, 400, 500),
             manager=self.ui_manager,
@@ -179,27 +208,14 @@ class MenuGUI:
             object_id='#products_title'
         )
 
-        # Lista de productos (ejemplo)
-        products = [
-            "Manzanas",
-            "Leche", 
-            "Galletas",
-            "Hamburguesas",
-            "Pollo"
-        ]
-        
-        y_pos = 50
-        self.product_buttons = []
-        for i, product in enumerate(products):
-            btn = UIButton(
-                relative_rect=pg.Rect(10, y_pos, 380, 35),
-                text=product,
-                manager=self.ui_manager,
-                container=self.product_menu,
-                object_id=f'#product_{i}'
-            )
-            self.product_buttons.append(btn)
-            y_pos += 45
+        # Lista virtualizada sobre el catálogo: 7 filas recicladas, datos por páginas
+        y_pos = 50 + 7 * VirtualProductList.ROW_HEIGHT
+        self.product_list = VirtualProductList(
+            self.ui_manager, self.product_menu, pg.Rect(10, 50, 380, y_pos - 50)
+        )
+        self.product_buttons = self.product_list.buttons
+        if load:
+            self._refresh_product_list()
 
         # Botón cerrar - IMPORTANTE: Guardar como atributo
         self.btn_close_products = UIButton(
@@ -212,6 +228,14 @@ class MenuGUI:
         
         return self.product_menu
 
+    def _refresh_product_list(self):
+        if self.product_list.source is None:
+            try:
+                self.product_list.source = get_catalog()
+            except (ValueError, OSError, sqlite3.Error) as e:
+                print(f"❌ [Catálogo] no disponible: {e}")
+        self.product_list.refresh()
+
     def create_cart_menu(self):
         """Crea el menú del carrito de compras"""
         if self.cart_menu:
@@ -298,8 +322,18 @@ class MenuGUI:
                 text=option_name,
                 manager=self.ui_manager,
                 container=self.config_menu,
-                object_id=f'#label_{option_name.lower()}'
+                object_id=f'#label_{option_name.lower().replace(" ", "_").replace("-", "_")}'
             )
+            if option_name == "Calidad de Texturas":
+                # Controla el tope de resolución del TextureManager (se aplica con 'Aplicar Cambios')
+                self.dd_texture_quality = UIDropDownMenu(
+                    options_list=list(TEXTURE_QUALITY_CAPS),
+                    starting_option=self.config_values["texture_quality"],
+                    relative_rect=pg.Rect(200, y_pos, 190, 25),
+                    manager=self.ui_manager,
+                    container=self.config_menu,
+                    object_id='#dd_texture_quality'
+                )
             y_pos += 30
 
         # Botones de configuración - IMPORTANTE: Guardar como atributos
@@ -321,6 +355,25 @@ class MenuGUI:
         
         return self.config_menu
 
+    def update(self):
+        """Por frame: la lista de productos sigue a su barra de scroll."""
+        if self.product_list is not None and self.product_menu is not None and self.product_menu.visible:
+            self.product_list.update()
+
+    def handle_event(self, event):
+        """Eventos propios de los menús (rueda sobre la lista de productos)."""
+        if self.product_list is not None and self.product_menu is not None and self.product_menu.alive():
+            return self.product_list.handle_event(event)
+        return False
+
+    def get_config_values(self):
+        """Valores elegidos en el menú de configuración (los últimos si ya se cerró)."""
+        if self.dd_texture_quality is not None and self.dd_texture_quality.alive():
+            selected = self.dd_texture_quality.selected_option
+            # pygame_gui >= 0.6.10 devuelve (texto, id)
+            self.config_values["texture_quality"] = selected[0] if isinstance(selected, tuple) else selected
+        return dict(self.config_values)
+
     def show_menu(self, menu_type):
         """Muestra un menú específico"""
         self.hide_all_menus()
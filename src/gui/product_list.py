@@ -0,0 +1,142 @@
+from collections import OrderedDict
+import pygame as pg
+from pygame_gui.elements import UIButton, UIVerticalScrollBar
+from src.utils.config import PRODUCT_LIST_PAGE_SIZE, PRODUCT_LIST_CACHE_PAGES
+
+
+class VirtualProductList:
+    """
+    Lista virtualizada de productos dentro de un contenedor de pygame_gui:
+    - Solo existen los botones de las filas que caben (pool fijo); al hacer scroll se
+      reasigna su texto, no se crean ni destruyen widgets.
+    - Los datos llegan por páginas de 'source.query(order_by, limit, offset)' y se
+      guardan en una caché LRU de PRODUCT_LIST_CACHE_PAGES páginas. Sin 'source' (aún
+      no asignado o no disponible) la lista queda vacía.
+    - La rueda del ratón mueve filas enteras: con catálogos grandes la de la barra de
+      pygame_gui (proporcional al % visible) apenas avanzaría.
+    """
+    ROW_HEIGHT = 45
+    BUTTON_HEIGHT = 35
+    SCROLLBAR_WIDTH = 20
+    WHEEL_ROWS = 3
+
+    def __init__(self, manager, container, rect, source=None, order_by="name",
+                 page_size=PRODUCT_LIST_PAGE_SIZE, cache_pages=PRODUCT_LIST_CACHE_PAGES):
+        self.source = source
+        self.order_by = order_by
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        self.rect = pg.Rect(rect)
+        self.container = container
+        self.total = 0
+        self.first = 0
+        self._pages = OrderedDict()   # nº de página -> [producto, ...]
+        self._bound = []              # producto mostrado en cada botón del pool
+
+        rows = max(1, self.rect.height // self.ROW_HEIGHT)
+        width = self.rect.width - self.SCROLLBAR_WIDTH - 5
+        self.buttons = [
+            UIButton(
+                relative_rect=pg.Rect(self.rect.x, self.rect.y + i * self.ROW_HEIGHT, width, self.BUTTON_HEIGHT),
+                text='',
+                manager=manager,
+                container=container,
+                object_id=f'#product_{i}'
+            )
+            for i in range(rows)
+        ]
+        self.scrollbar = UIVerticalScrollBar(
+            relative_rect=pg.Rect(self.rect.right - self.SCROLLBAR_WIDTH, self.rect.y,
+                                  self.SCROLLBAR_WIDTH, rows * self.ROW_HEIGHT - (self.ROW_HEIGHT - self.BUTTON_HEIGHT)),
+            visible_percentage=1.0,
+            manager=manager,
+            container=container,
+            object_id='#products_scrollbar'
+        )
+        self._synced_start = self.scrollbar.start_percentage
+
+    # ---------- Datos ----------
+    def refresh(self, reload=False):
+        """Relee el nº de productos (y, con reload, descarta las páginas cacheadas)."""
+        if reload:
+            self._pages.clear()
+        self.total = self.source.count() if self.source is not None else 0
+        self.scrollbar.set_visible_percentage(min(1.0, len(self.buttons) / max(self.total, 1)))
+        self._scroll_to(self.first)
+
+    def _page(self, index):
+        page = self._pages.get(index)
+        if page is None:
+            page = self.source.query(order_by=self.order_by, limit=self.page_size, offset=index * self.page_size)
+            self._pages[index] = page
+            if len(self._pages) > self.cache_pages:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(index)
+        return page
+
+    def product_at(self, row):
+        page = self._page(row // self.page_size)
+        offset = row % self.page_size
+        return page[offset] if offset < len(page) else None
+
+    def product_for(self, button):
+        """Producto que muestra ahora mismo un botón del pool (None si no es de la lista)."""
+        for btn, product in zip(self.buttons, self._bound):
+            if btn is button:
+                return product
+        return None
+
+    # ---------- Scroll ----------
+    def _max_first(self):
+        return max(0, self.total - len(self.buttons))
+
+    def _slider_range(self):
+        """Fracción de start_percentage que recorre el deslizador (su altura mínima es de 5 px)."""
+        bar = self.scrollbar
+        if bar.sliding_button is None or not bar.scrollable_height:
+            return 1.0
+        return max(1e-6, 1.0 - bar.sliding_button.rect.height / bar.scrollable_height)
+
+    def _scroll_to(self, first):
+        self.first = min(max(0, int(first)), self._max_first())
+        if self._max_first():
+            self.scrollbar.set_scroll_from_start_percentage(self.first / self._max_first() * self._slider_range())
+        else:
+            self.scrollbar.reset_scroll_position()
+        self._synced_start = self.scrollbar.start_percentage
+        self._bind()
+
+    def _bind(self):
+        self._bound = []
+        for i, btn in enumerate(self.buttons):
+            row = self.first + i
+            product = self.product_at(row) if row < self.total else None
+            self._bound.append(product)
+            if product is None:
+                btn.hide()
+                continue
+            text = f"{product['name']}  ·  {product['price']:.2f} €"
+            if btn.text != text:
+                btn.set_text(text)
+            btn.show()
+
+    def update(self):
+        """Sigue a la barra de scroll (arrastre, flechas): solo se reasignan textos si cambia la fila."""
+        start = self.scrollbar.start_percentage
+        if start == self._synced_start:
+            return
+        self._synced_start = start
+        first = round(min(1.0, start / self._slider_range()) * self._max_first())
+        if first != self.first:
+            self.first = first
+            self._bind()
+
+    def handle_event(self, event):
+        if event.type != pg.MOUSEWHEEL or not self.container.visible:
+            return False
+        area = self.rect.move(self.container.get_container().get_rect().topleft)
+        if not area.collidepoint(pg.mouse.get_pos()):
+            return False
+        self._scroll_to(self.first - event.y * self.WHEEL_ROWS)
+        return True
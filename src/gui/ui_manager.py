@@ -20,8 +20,15 @@ class UIManager:
         self.on_checkout = None
         self.on_apply_config = None
         
+        # Seguimiento de regiones sucias del overlay (ver get_dirty_rects)
+        self._ui_snapshot = None
+        self._ui_order = None
+        self._ui_pending = set()
+
         # Crear menú principal al inicio
         self.menu_gui.create_main_menu()
+        # El de productos se construye ya (oculto): abrirlo luego es solo show() + refresco
+        self.menu_gui.create_products_menu(load=False).hide()
 
         self.setup_debug()
 
@@ -35,6 +42,8 @@ class UIManager:
         if event.type == pg.MOUSEBUTTONDOWN:
             print(f"🖱️ Mouse click en: {event.pos}")
 
+        self.menu_gui.handle_event(event)
+
         if event.type == pygame_gui.UI_BUTTON_PRESSED:
             ui_element = event.ui_element
             
@@ -113,12 +122,12 @@ class UIManager:
                 if self.on_close_menu:
                     self.on_close_menu()
             
-            # Botones de productos individuales
-            elif hasattr(self.menu_gui, 'product_buttons'):
-                for i, btn in enumerate(self.menu_gui.product_buttons):
-                    if ui_element == btn:
-                        print(f"📦 Producto {i+1} añadido al carrito")
-                        # Aquí podrías llamar a un callback para añadir al carrito
+            # Filas de la lista de productos (botones reciclados: el producto depende del scroll)
+            elif ui_element in self.menu_gui.product_buttons:
+                product = self.menu_gui.product_list.product_for(ui_element)
+                if product is not None:
+                    print(f"📦 Producto {product['sku']} ({product['name']}) añadido al carrito")
+                    # Aquí podrías llamar a un callback para añadir al carrito
 
     def _close_context_menu(self):
         """Cierra el menú contextual"""
@@ -134,6 +143,77 @@ class UIManager:
         """Dibuja la UI en una surface"""
         self.ui_manager.draw_ui(surface)
 
+    def update(self, time_delta):
+        """
+        Actualiza pygame_gui. Antes anota los elementos con redibujo pendiente en su
+        drawable_shape: pygame_gui repinta esas surfaces in situ (misma surface, otro
+        contenido), algo que la comparación de get_dirty_rects no puede ver.
+        """
+        for spr in self.ui_manager.get_sprite_group().sprites():
+            shape = getattr(spr, 'drawable_shape', None)
+            if shape is None:
+                continue
+            state = getattr(shape, 'active_state', None)
+            if (getattr(shape, 'states_to_redraw_queue', None) or getattr(shape, 'need_to_clean_up', False)
+                    or (state is not None and (state.has_fresh_surface or state.transition is not None))):
+                self._ui_pending.add(spr)
+        self.ui_manager.update(time_delta)
+        self.menu_gui.update()
+
+    def invalidate_overlay(self):
+        """Fuerza a que la próxima llamada a get_dirty_rects devuelva la ventana completa."""
+        self._ui_snapshot = None
+
+    def get_dirty_rects(self, max_rects=8):
+        """
+        Rectángulos de pantalla que cambiaron desde la última llamada.
+        pygame_gui no lleva dirty rects, así que se compara la lista de sprites visibles
+        (surface, rect, área de recorte, blend) con la del frame anterior: cada sprite que
+        aparece, desaparece, cambia de surface o se mueve ensucia su rect viejo y el nuevo.
+        Devuelve [] si no cambió nada.
+        """
+        full = [pg.Rect((0, 0), self.win_size)]
+        snapshot, order = {}, []
+        for spr in self.ui_manager.get_sprite_group().sprites():
+            if not spr.visible or spr.image is None:
+                continue
+            image, rect, area, blend = spr.blit_data
+            snapshot[spr] = (image, tuple(rect), tuple(area) if area else None, blend)
+            order.append(spr)
+
+        prev, prev_order = self._ui_snapshot, self._ui_order
+        self._ui_snapshot, self._ui_order = snapshot, order
+        if prev is None:
+            self._ui_pending.clear()
+            return full
+        if [s for s in prev_order if s in snapshot] != [s for s in order if s in prev]:
+            return full   # cambio de capas (ventana al frente): redibujo completo
+
+        dirty = []
+        for spr in set(prev) | set(snapshot):
+            old, new = prev.get(spr), snapshot.get(spr)
+            if old is not None and new is not None and old[0] is new[0] and old[1:] == new[1:]:
+                continue
+            for state in (old, new):
+                if state is not None:
+                    dirty.append(pg.Rect(state[1]))
+
+        # Repintados in situ anotados en update()
+        pending, self._ui_pending = self._ui_pending, set()
+        dirty.extend(pg.Rect(snapshot[spr][1]) for spr in pending if spr in snapshot)
+
+        # Campos de texto con foco pueden redibujarse sobre la misma surface (cursor)
+        for element in self.ui_manager.get_focus_set() or ():
+            if isinstance(element, (pygame_gui.elements.UITextEntryLine, pygame_gui.elements.UITextBox)):
+                dirty.append(pg.Rect(element.rect))
+
+        screen = full[0]
+        dirty = [r.clip(screen) for r in dirty]
+        dirty = [r for r in dirty if r.w > 0 and r.h > 0]
+        if len(dirty) > max_rects:
+            dirty = [dirty[0].unionall(dirty[1:])]
+        return dirty
+
     def toggle_main_menu(self):
         """Alterna la visibilidad del menú principal"""
         return self.menu_gui.toggle_main_menu()
@@ -1,13 +1,88 @@
 import moderngl as mgl
 import glm
+import numpy as np
 import pygame as pg
+from src.utils.geometry import aabb_world_from_local
+from src.core.camera import CAMERA_UBO_BINDING
+from src.core.texture_manager import get_texture_manager
 
 # --- CACHÉS COMPARTIDAS ---
-_TEXTURE_CACHE = {}      # path -> moderngl.Texture (compartida entre instancias)
-_PROGRAM_CACHE = {}      # Por si luego queremos cachear shaders
+_PROGRAM_CACHE = {}      # (ctx, variante) -> [moderngl.Program, refcount]
+_SHADER_SOURCES = {}     # variante -> (vertex_shader, fragment_shader)
+
+
+# --- REGISTRO DE PROGRAMAS ---
+def register_shader_variant(variant, vertex_shader, fragment_shader):
+    """Registra el código fuente de una variante de shader ('textured', 'color', ...)."""
+    _SHADER_SOURCES[variant] = (vertex_shader, fragment_shader)
+
+
+def acquire_program(ctx, variant):
+    """
+    Devuelve el programa compilado de 'variant' para este contexto.
+    Se compila una sola vez; cada llamada suma una referencia.
+    """
+    key = (ctx, variant)
+    entry = _PROGRAM_CACHE.get(key)
+    if entry is None:
+        if variant not in _SHADER_SOURCES:
+            raise KeyError(f"Variante de shader no registrada: '{variant}'")
+        vs, fs = _SHADER_SOURCES[variant]
+        program = ctx.program(vertex_shader=vs, fragment_shader=fs)
+        program.extra = {'registry_key': key, 'uniforms': {}}
+        if 'Camera' in program:
+            program['Camera'].binding = CAMERA_UBO_BINDING
+        entry = _PROGRAM_CACHE[key] = [program, 0]
+        print(f"[Shaders] compilado programa '{variant}'")
+    entry[1] += 1
+    return entry[0]
+
+
+def set_uniform(program, name, value):
+    """
+    Escribe un uniform solo si difiere de lo último escrito en ese programa
+    (los programas son compartidos: todas las escrituras deben pasar por aquí).
+    Acepta valores escalares/tuplas o matrices glm. Devuelve True si hubo llamada GL.
+    """
+    if program.extra is None:
+        program.extra = {}
+    cache = program.extra.setdefault('uniforms', {})
+    data = value.to_bytes() if hasattr(value, 'to_bytes') else value
+    if cache.get(name) == data:
+        return False
+    if isinstance(data, bytes):
+        program[name].write(data)
+    else:
+        program[name].value = data
+    cache[name] = data
+    return True
+
+
+def release_program(program):
+    """
+    Resta una referencia al programa; se libera en GPU cuando llega a cero.
+    Los programas que no salen del registro se liberan directamente.
+    """
+    key = (program.extra or {}).get('registry_key')
+    entry = _PROGRAM_CACHE.get(key)
+    if entry is None:
+        program.release()
+        return
+    entry[1] -= 1
+    if entry[1] <= 0:
+        del _PROGRAM_CACHE[key]
+        program.release()
 
 
 class BaseObject:
+    # Se incrementa cada vez que cambia la transformación (o el AABB) del objeto;
+    # los consumidores (culling, instancing) comparan versiones en vez de recalcular.
+    transform_version = 0
+    # Geometría inmóvil: SceneManager la funde en StaticBatch por material
+    static = False
+    # Candidato a oclusión: se prueba su AABB contra la profundidad (OcclusionCuller)
+    occludee = False
+
     def __init__(self, app, shader_program=None, texture_path=None, uv_scale=(1.0, 1.0)):
         self.app = app
         self.ctx = app.ctx
@@ -20,89 +95,176 @@ class BaseObject:
 
         self.shader_program = shader_program or self.get_shader_program()
         self.vbo = self.get_vbo()      # Subclase define layout (3f) o (3f,2f)
+        self.ibo = self.get_ibo()      # None -> geometría sin indexar
         self.vao = self.get_vao()      # Se arma según use_texture
         self.m_model = self.get_model_matrix()
         self.on_init()
 
     def _load_texture(self, path: str):
         """
-        Carga una textura una sola vez y la comparte entre todas las instancias.
-        Devuelve moderngl.Texture.
+        Textura compartida entre todas las instancias, vía el TextureManager del contexto.
+        Devuelve un ManagedTexture (mismo use() que moderngl.Texture; la resolución
+        residente se ajusta en streaming según request_texture_detail).
+        """
+        return get_texture_manager(self.ctx).get(path)
+
+    def get_model_matrix(self):
+        return glm.mat4()
+
+    def aabb_local(self):
+        """AABB local (min, max) de la geometría subida; None si no se conoce."""
+        return getattr(self, '_aabb', None)
+
+    def world_aabb(self):
+        """
+        AABB en mundo (min, max) con la matriz modelo actual; None si no hay AABB local.
+        Se cachea por 'transform_version'.
         """
-        tex = _TEXTURE_CACHE.get(path)
-        if tex is not None:
-            return tex
+        cached = getattr(self, '_world_aabb_cache', None)
+        if cached is not None and cached[0] == self.transform_version:
+            return cached[1]
+        box = self._compute_world_aabb()
+        self._world_aabb_cache = (self.transform_version, box)
+        return box
 
-        # pygame surface -> RGBA
-        surf = pg.image.load(path).convert_alpha()
-        w, h = surf.get_size()
-        # OpenGL espera datos top-to-bottom: el True hace el flip vertical
-        data = pg.image.tobytes(surf, "RGBA", True)
+    def _compute_world_aabb(self):
+        local = self.aabb_local()
+        if not local:
+            return None
+        return aabb_world_from_local(local[0], local[1], self.get_model_matrix())
 
-        tex = self.ctx.texture((w, h), 4, data)
-        tex.build_mipmaps()
-        tex.filter = (mgl.LINEAR_MIPMAP_LINEAR, mgl.LINEAR)
-        tex.repeat_x = True
-        tex.repeat_y = True
+    def projected_pixels(self, camera):
+        """Tamaño aproximado en pantalla (px) de la esfera que envuelve el AABB en mundo."""
+        box = self.world_aabb()
+        if not box:
+            return 0.0
+        (x0, y0, z0), (x1, y1, z1) = box
+        center = glm.vec3((x0 + x1) * 0.5, (y0 + y1) * 0.5, (z0 + z1) * 0.5)
+        diameter = glm.length(glm.vec3(x1 - x0, y1 - y0, z1 - z0))
+        distance = glm.length(center - camera.position) - diameter * 0.5
+        return camera.projected_pixels(diameter, distance)
 
-        _TEXTURE_CACHE[path] = tex
-        return tex
+    def request_texture_detail(self, camera):
+        """Pide a la textura el detalle que corresponde al tamaño del objeto en pantalla."""
+        if self.texture is None:
+            return
+        # Con uv_scale > 1 la textura se repite: hacen falta más texels por píxel
+        self.texture.request(self.projected_pixels(camera) * max(self.uv_scale))
 
-    def get_model_matrix(self):
-        return glm.mat4()
+    def select_lod(self, camera):
+        """Elige el nivel de detalle de la geometría (solo mallas con LODs)."""
+        pass
 
     def on_init(self):
-        self.shader_program['m_proj'].write(self.app.camera.m_proj)
-        self.shader_program['m_view'].write(self.app.camera.m_view)
-        self.shader_program['m_model'].write(self.m_model)
+        set_uniform(self.shader_program, 'm_model', self.m_model)
         if not self.use_texture and 'color' in self.shader_program:
             # Default color si la subclase no lo fija
-            self.shader_program['color'].value = (0.8, 0.8, 0.8)
+            set_uniform(self.shader_program, 'color', (0.8, 0.8, 0.8))
 
     def update_matrices(self):
-        self.shader_program['m_proj'].write(self.app.camera.m_proj)
-        self.shader_program['m_view'].write(self.app.camera.m_view)
-        self.shader_program['m_model'].write(self.m_model)
+        # m_proj/m_view llegan por el UBO de cámara; aquí solo lo propio del objeto
+        set_uniform(self.shader_program, 'm_model', self.m_model)
 
     def render(self):
         """
-        Bind de textura (si hay), set del m_model y draw del VAO.
-        Asegura que el uniform u_texture_0 apunta a la unidad 0.
+        Dibujo suelto (sin RenderQueue): preparación, bind de textura, uniforms propios
+        y draw del VAO. Asegura que el uniform tex0 apunta a la unidad 0.
         """
+        self.prepare()
+        self.bind_material()
+        self.draw()
+
+    def prepare(self):
+        """Trabajo previo al draw que no depende del estado GL compartido (p. ej. buffers por instancia)."""
+        pass
+
+    def draw_state(self):
+        """(programa, textura, VAO) que necesita el draw: RenderQueue ordena y agrupa por esta tupla."""
+        texture = self.texture if getattr(self, "use_texture", False) else None
+        return self.shader_program, texture, self.vao
 
-        # Color por defecto cuando no hay textura 
+    def bind_material(self):
+        """Fija color/textura en el programa antes del draw."""
+        self.bind_object()
+        self.bind_texture()
+
+    def bind_object(self):
+        """Uniforms propios del objeto (color por defecto cuando no hay textura)."""
         if not getattr(self, "use_texture", False) and self.shader_program and "color" in self.shader_program:
-            self.shader_program["color"].value = getattr(self, "color", (0, 0, 0))
+            set_uniform(self.shader_program, "color", getattr(self, "color", (0, 0, 0)))
 
-        # Bind de textura y uniform sampler
+    def bind_texture(self):
+        """Bind de textura y uniform sampler (estado compartido por todo un grupo de la RenderQueue)."""
         if getattr(self, "use_texture", False) and self.texture is not None:
             if "tex0" in self.shader_program:
-                try:
-                    self.shader_program["tex0"].value = 0
-                except Exception:
-                    self.shader_program["tex0"] = 0
+                set_uniform(self.shader_program, "tex0", 0)
             self.texture.use(location=0)
 
-        # Draw
-        if hasattr(self, "vao") and self.vao is not None:
-            self.vao.render()
+    def draw(self, vao=None):
+        """
+        Emite el draw call del VAO (las subclases instanciadas lo sobrescriben).
+        'vao' permite dibujar la misma geometría con otro programa (p. ej. el de picking).
+        """
+        vao = vao or getattr(self, "vao", None)
+        if vao is not None:
+            vao.render()
+
+    # ---------- Picking ----------
+    pick_variant = 'pick'
+
+    def pick_vao(self, program):
+        """VAO de la geometría con el programa de IDs de picking (se crea la primera vez)."""
+        vao = getattr(self, "_pick_vao", None)
+        if vao is None:
+            vao = self._pick_vao = self.ctx.vertex_array(
+                program, [(self.vbo, '3f 2x4', 'in_position')],
+                index_buffer=self.ibo, index_element_size=4
+            )
+        return vao
+
+    def pick_label(self, instance=0):
+        """Texto corto del objeto (menú contextual, logs)."""
+        return getattr(self, "label", None) or type(self).__name__
 
+    def instance_aabb(self, instance=0):
+        """AABB en mundo de una instancia (objetos no instanciados: el del objeto)."""
+        return self.world_aabb()
+
+    # ---------- Raycast (CPU) ----------
+    def ray_geometry(self):
+        """
+        (clave, posiciones (N, 3), triángulos (M, 3)) locales para el raycast en CPU.
+        Objetos con la misma clave comparten estructura de aceleración; None: es propia.
+        """
+        vertices, indices = self.static_geometry()
+        tri_idx = (np.arange(len(vertices)) if indices is None else indices).reshape(-1, 3)
+        return None, vertices[:, :3].astype(np.float64), tri_idx
+
+    def instance_matrices(self):
+        """Matrices modelo (K, 4, 4), una por copia, en la convención punto_fila @ M."""
+        return np.frombuffer(self.get_model_matrix().to_bytes(), dtype='f4').reshape(1, 4, 4)
 
     def destroy(self):
         self.vbo.release()
-        self.shader_program.release()
+        if self.ibo is not None:
+            self.ibo.release()
+        release_program(self.shader_program)
         self.vao.release()
+        if getattr(self, "_pick_vao", None) is not None:
+            self._pick_vao.release()
 
     def get_vao(self):
         if self.use_texture:
             vao = self.ctx.vertex_array(
                 self.shader_program,                         
-                [(self.vbo, '3f 2f', 'in_position', 'in_uv')]
+                [(self.vbo, '3f 2f', 'in_position', 'in_uv')],
+                index_buffer=self.ibo, index_element_size=4
             )
         else:
             vao = self.ctx.vertex_array(
                 self.shader_program,                         
-                [(self.vbo, '3f', 'in_position')]
+                [(self.vbo, '3f 2x4', 'in_position')],  # el VBO siempre es pos+uv
+                index_buffer=self.ibo, index_element_size=4
             )
         return vao
 
@@ -111,52 +273,82 @@ class BaseObject:
 
     def get_vbo(self):
         vertex_data = self.get_vertex_data()
+        # AABB local a partir de las posiciones del stream pos+uv
+        pos = np.frombuffer(vertex_data, dtype='f4').reshape(-1, 5)[:, :3]
+        if len(pos):
+            self._aabb = (tuple(map(float, pos.min(axis=0))), tuple(map(float, pos.max(axis=0))))
         return self.ctx.buffer(vertex_data)
 
+    def get_ibo(self):
+        """Index buffer (u4) opcional; por defecto la geometría va sin indexar."""
+        return None
+
+    def material_key(self):
+        """Objetos con la misma clave se pueden dibujar con el mismo estado (programa, textura/color)."""
+        if self.use_texture and self.texture is not None:
+            return (self.shader_variant(), self.texture.path)
+        return (self.shader_variant(), tuple(getattr(self, "color", (0, 0, 0))))
+
+    def static_geometry(self):
+        """(vértices (K, 5) f4 pos+uv locales, índices u4 o None) para hornear en un StaticBatch."""
+        return np.frombuffer(self.get_vertex_data(), dtype='f4').reshape(-1, 5), None
+
+    def shader_variant(self):
+        """Variante del registro de programas que usa este objeto."""
+        return 'textured' if self.use_texture else 'color'
+
     def get_shader_program(self):
-        if self.use_texture:
-            return self.ctx.program(
-                vertex_shader='''
-                    #version 330
-                    layout (location = 0) in vec3 in_position;
-                    layout (location = 1) in vec2 in_uv;
-                    uniform mat4 m_proj;
-                    uniform mat4 m_view;
-                    uniform mat4 m_model;
-                    out vec2 v_uv;
-                    void main() {
-                        v_uv = in_uv;
-                        gl_Position = m_proj * m_view * m_model * vec4(in_position, 1.0);
-                    }
-                ''',
-                fragment_shader='''
-                    #version 330
-                    uniform sampler2D tex0;
-                    in vec2 v_uv;
-                    out vec4 fragColor;
-                    void main() {
-                        fragColor = texture(tex0, v_uv);
-                    }
-                '''
-            )
-        else:
-            return self.ctx.program(
-                vertex_shader='''
-                    #version 330
-                    layout (location = 0) in vec3 in_position;
-                    uniform mat4 m_proj;
-                    uniform mat4 m_view;
-                    uniform mat4 m_model;
-                    void main() {
-                        gl_Position = m_proj * m_view * m_model * vec4(in_position, 1.0);
-                    }
-                ''',
-                fragment_shader='''
-                    #version 330
-                    uniform vec3 color;
-                    out vec4 fragColor;
-                    void main() {
-                        fragColor = vec4(color, 1.0);
-                    }
-                '''
-            )
+        return acquire_program(self.ctx, self.shader_variant())
+
+
+register_shader_variant(
+    'textured',
+    vertex_shader='''
+        #version 330
+        layout (location = 0) in vec3 in_position;
+        layout (location = 1) in vec2 in_uv;
+        layout (std140) uniform Camera {
+            mat4 m_proj;
+            mat4 m_view;
+        };
+        uniform mat4 m_model;
+        out vec2 v_uv;
+        void main() {
+            v_uv = in_uv;
+            gl_Position = m_proj * m_view * m_model * vec4(in_position, 1.0);
+        }
+    ''',
+    fragment_shader='''
+        #version 330
+        uniform sampler2D tex0;
+        in vec2 v_uv;
+        out vec4 fragColor;
+        void main() {
+            fragColor = texture(tex0, v_uv);
+        }
+    '''
+)
+
+register_shader_variant(
+    'color',
+    vertex_shader='''
+        #version 330
+        layout (location = 0) in vec3 in_position;
+        layout (std140) uniform Camera {
+            mat4 m_proj;
+            mat4 m_view;
+        };
+        uniform mat4 m_model;
+        void main() {
+            gl_Position = m_proj * m_view * m_model * vec4(in_position, 1.0);
+        }
+    ''',
+    fragment_shader='''
+        #version 330
+        uniform vec3 color;
+        out vec4 fragColor;
+        void main() {
+            fragColor = vec4(color, 1.0);
+        }
+    '''
+)
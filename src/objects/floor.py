@@ -2,6 +2,8 @@ from .base_object import BaseObject
 import numpy as np
 
 class Floor(BaseObject):
+    color = (0.3, 0.3, 0.3)   # solo sin textura
+
     def __init__(self, app, texture_path=None, uv_scale=(4.0, 4.0)):
         super().__init__(app, texture_path=texture_path, uv_scale=uv_scale)
 
@@ -17,8 +19,3 @@ class Floor(BaseObject):
             (-5, 0, 5, 0.0, t),
         ]
         return np.array(vertices, dtype='f4').tobytes()
-
-    def render(self):
-        if not self.use_texture and 'color' in self.shader_program:
-            self.shader_program['color'].value = (0.3, 0.3, 0.3)
-        super().render()
@@ -1,16 +1,102 @@
-from .base_object import BaseObject
+from .base_object import BaseObject, release_program
+from src.utils.geometry import compose_model_matrix, transform_points, triangle_normals
+from src.utils.obj_loader import load_obj
+from src.utils.mesh_lod import select_lod
+import os
 import numpy as np
 import glm
 
-_GEOM_CACHE = {}  # path -> (vertex_bytes, aabb_min, aabb_max)
-_TRI_CACHE = {}  # path -> {'positions': list[(x,y,z)], 'tri_idx': list[(i0,i1,i2)]}
+_GEOM_CACHE = {}  # path -> (vertex_bytes, index_bytes, aabb_min, aabb_max)
+_TRI_CACHE = {}  # path -> {'positions': ndarray (N,3), 'tri_idx': ndarray (M,3)}
+_LOD_CACHE = {}  # path -> [(vertex_bytes, index_bytes, celdas), ...] LOD1..n
+_GPU_MESH_CACHE = {}  # (ctx, path) -> {'vbo', 'ibo', 'vaos': {variante: VAO}, 'lods': [(first, count)],
+                      #                 'lod_cells': [celdas LOD1..n], 'refs': int}
+
+
+def load_geometry(path, invert_v=False):
+    """
+    Parsea el OBJ (o lo lee de la caché en disco) sin tocar GL ni las cachés de módulo:
+    se puede llamar desde hilos de carga. El resultado se registra con store_geometry().
+    """
+    try:
+        return load_obj(path, invert_v=invert_v)
+    except Exception as e:
+        raise RuntimeError(f"Error leyendo OBJ '{path}': {e}")
+
+
+def store_geometry(path, mesh):
+    """Registra en las cachés CPU la malla devuelta por load_geometry(); ModelOBJ la reutiliza."""
+    mn = tuple(float(c) for c in mesh['aabb_min'])
+    mx = tuple(float(c) for c in mesh['aabb_max'])
+    _TRI_CACHE[path] = {'positions': mesh['positions'], 'tri_idx': mesh['tri_idx']}
+    _LOD_CACHE[path] = [(v.tobytes(), i.tobytes(), cells) for v, i, cells in mesh.get('lods', [])]
+    _GEOM_CACHE[path] = (mesh['vertices'].tobytes(), mesh['indices'].tobytes(), mn, mx)
+    origin = "disk cache" if mesh['from_cache'] else "parsed"
+    print(f"[ModelOBJ] loaded({origin}) '{path}': {len(mesh['vertices'])} verts "
+          f"/ {len(mesh['indices'])} índices, AABB {mn}..{mx}, "
+          f"LODs {[len(i) // 3 for _, i, _ in mesh.get('lods', [])]} tris")
+    return _GEOM_CACHE[path]
+
+
+def is_geometry_loaded(path):
+    return path in _GEOM_CACHE
+
+
+def acquire_mesh(ctx, path, load_vertex_data):
+    """
+    Devuelve la malla GPU compartida de 'path' (VBO + IBO + VAOs por variante de shader).
+    Todos los LODs van en el mismo VBO/IBO (índices ya desplazados): 'lods' guarda el
+    rango (first, count) de índices de cada nivel, así cambiar de LOD no cambia de VAO.
+    Solo se sube a GPU la primera vez; cada llamada suma una referencia.
+    """
+    key = (ctx, path)
+    entry = _GPU_MESH_CACHE.get(key)
+    if entry is None:
+        vb = load_vertex_data()
+        ib = _GEOM_CACHE[path][1]
+        vb_parts, ib_parts, lods, lod_cells = [vb], [ib], [(0, len(ib) // 4)], []
+        base_vertex, first = len(vb) // 20, len(ib) // 4
+        for lod_vb, lod_ib, cells in _LOD_CACHE.get(path, []):
+            idx = np.frombuffer(lod_ib, dtype='u4') + np.uint32(base_vertex)
+            vb_parts.append(lod_vb)
+            ib_parts.append(idx.tobytes())
+            lods.append((first, len(idx)))
+            lod_cells.append(cells)
+            base_vertex += len(lod_vb) // 20
+            first += len(idx)
+        vbo = ctx.buffer(b''.join(vb_parts))
+        ibo = ctx.buffer(b''.join(ib_parts))
+        entry = _GPU_MESH_CACHE[key] = {'vbo': vbo, 'ibo': ibo, 'vaos': {}, 'lods': lods,
+                                         'lod_cells': lod_cells, 'refs': 0}
+    entry['refs'] += 1
+    return entry
+
+
+def release_mesh(ctx, path):
+    """Resta una referencia; con la última se liberan VAOs y VBO."""
+    key = (ctx, path)
+    entry = _GPU_MESH_CACHE.get(key)
+    if entry is None:
+        return
+    entry['refs'] -= 1
+    if entry['refs'] <= 0:
+        del _GPU_MESH_CACHE[key]
+        for vao in entry['vaos'].values():
+            vao.release()
+        entry['vbo'].release()
+        entry['ibo'].release()
 
 class ModelOBJ(BaseObject):
     """
     Loader robusto de OBJ:
-    - Parser simple de 'v', 'vt', 'f' (triangulación por fan).
-    - VBO intercalado (pos:3f, uv:2f) compatible con el shader texturizado.
-    - Rotación/escala/posición dinámicas (m_model se recalcula cada frame).
+    - Parser vectorizado de 'v', 'vt', 'f' (triangulación por fan) con caché binaria en disco.
+    - VBO intercalado (pos:3f, uv:2f) de vértices únicos + IBO (u4) compatible con el shader texturizado.
+    - Rotación/escala/posición dinámicas: m_model se cachea y solo se recalcula cuando
+      cambia la transformación; 'transform_version' permite a culling/instancing detectarlo.
+    - VBO/VAO compartidos entre instancias del mismo OBJ (caché GPU con refcount):
+      los clones solo llevan su transformación.
+    - LODs simplificados (generados al importar, en la misma caché): el nivel se elige
+      cada frame por el tamaño proyectado en pantalla.
     """
     def __init__(self, app, obj_path, texture_path=None,
                  position=(0.0, 0.0, 0.0),
@@ -24,143 +110,155 @@ class ModelOBJ(BaseObject):
         self._invert_v = invert_v
         self._aabb     = None
         self._texture_path = texture_path
+        self._mesh = None
+        self._m_model_cache = None   # se recalcula solo si la transformación cambia
+        self.transform_version = 0
+        self.lod = 0                 # nivel de detalle activo (select_lod)
         super().__init__(app, texture_path=texture_path, uv_scale=(1.0, 1.0))
 
     # ---------- Transform ----------
     def get_model_matrix(self):
-        M = glm.mat4()
-        M = glm.translate(M, self._position)
-        M = glm.rotate(M, glm.radians(self._rotation.z), glm.vec3(0, 0, 1))
-        M = glm.rotate(M, glm.radians(self._rotation.y), glm.vec3(0, 1, 0))
-        M = glm.rotate(M, glm.radians(self._rotation.x), glm.vec3(1, 0, 0))
-        M = glm.scale(M, self._scale)
-        return M
-
-    def set_position(self, xyz): self._position = glm.vec3(*xyz)
-    def set_scale(self, xyz):    self._scale    = glm.vec3(*xyz)
-    def set_rotation(self, deg): self._rotation = glm.vec3(*deg)
+        """Matriz modelo cacheada (no modificarla: se comparte hasta el próximo cambio)."""
+        if self._m_model_cache is None:
+            self._m_model_cache = compose_model_matrix(self._position, self._rotation, self._scale)
+        return self._m_model_cache
+
+    def _transform_changed(self):
+        self._m_model_cache = None
+        self.transform_version += 1
+
+    def set_position(self, xyz):
+        self._position = glm.vec3(*xyz)
+        self._transform_changed()
+
+    def set_scale(self, xyz):
+        self._scale = glm.vec3(*xyz)
+        self._transform_changed()
+
+    def set_rotation(self, deg):
+        self._rotation = glm.vec3(*deg)
+        self._transform_changed()
 
     # ---------- Geometría ----------
 
+    def get_vbo(self):
+        self._mesh = acquire_mesh(self.ctx, self.obj_path, self.get_vertex_data)
+        if self._aabb is None:
+            # Malla ya residente en GPU: basta con recuperar AABB/triángulos de la caché CPU
+            self._restore_cached_geometry()
+        return self._mesh['vbo']
+
+    def get_ibo(self):
+        return self._mesh['ibo']
+
+    def get_vao(self):
+        variant = self.shader_variant()
+        vao = self._mesh['vaos'].get(variant)
+        if vao is None:
+            vao = self._mesh['vaos'][variant] = super().get_vao()
+        return vao
+
+    def static_geometry(self):
+        vb, ib, _, _ = _GEOM_CACHE[self.obj_path]
+        return np.frombuffer(vb, dtype='f4').reshape(-1, 5), np.frombuffer(ib, dtype='u4')
+
+    def select_lod(self, camera):
+        self.lod = select_lod(self.projected_pixels(camera), self._mesh['lod_cells'], self.lod)
+
+    def draw(self, vao=None):
+        first, count = self._mesh['lods'][self.lod]
+        (vao or self.vao).render(vertices=count, first=first)
+
+    def pick_vao(self, program):
+        # Compartido por todos los ModelOBJ de la malla (se libera con ella)
+        vao = self._mesh['vaos'].get('pick')
+        if vao is None:
+            vao = self._mesh['vaos']['pick'] = self.ctx.vertex_array(
+                program, [(self.vbo, '3f 2x4', 'in_position')],
+                index_buffer=self.ibo, index_element_size=4
+            )
+        return vao
+
+    def pick_label(self, instance=0):
+        return os.path.splitext(os.path.basename(self.obj_path))[0]
+
+    def ray_geometry(self):
+        # Triángulos originales del OBJ (sin LODs), compartidos por todos los que usan la malla
+        extra = _TRI_CACHE.get(self.obj_path)
+        if extra is None:
+            return super().ray_geometry()
+        return self.obj_path, extra['positions'], extra['tri_idx']
+
+    def destroy(self):
+        release_program(self.shader_program)
+        release_mesh(self.ctx, self.obj_path)
+
+    def _restore_cached_geometry(self):
+        vb, _, mn, mx = _GEOM_CACHE[self.obj_path]
+        self._aabb = (mn, mx)
+        # Recuperar posiciones/triángulos si ya existen en caché auxiliar
+        extra = _TRI_CACHE.get(self.obj_path)
+        if extra:
+            self._raw_positions = extra.get('positions')
+            self._triangles_idx = extra.get('tri_idx')
+        return vb
+
     def get_vertex_data(self):
         # -- Intentar leer de caché de geometría --
         if self.obj_path in _GEOM_CACHE:
-            vb, mn, mx = _GEOM_CACHE[self.obj_path]
-            self._aabb = (mn, mx)
-            # Recuperar posiciones/triángulos si ya existen en caché auxiliar
-            extra = _TRI_CACHE.get(self.obj_path)
-            if extra:
-                self._raw_positions = extra.get('positions')
-                self._triangles_idx = extra.get('tri_idx')
+            vb = self._restore_cached_geometry()
+            mn, mx = self._aabb
             print(f"[ModelOBJ] cache '{self.obj_path}': {len(vb)//20} verts, AABB {mn}..{mx}")
             return vb
 
-        positions, texcoords = [], []
-        stream = []
-        tri_idx = []  # lista de (i0,i1,i2) en índices de positions
-
-        try:
-            with open(self.obj_path, 'r', encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    if not line or line.startswith('#'):
-                        continue
-                    if line.startswith('v '):
-                        _, x, y, z = line.strip().split()[:4]
-                        positions.append((float(x), float(y), float(z)))
-                    elif line.startswith('vt '):
-                        parts = line.strip().split()
-                        if len(parts) >= 3:
-                            _, u, v = parts[:3]
-                            u, v = float(u), float(v)
-                            if self._invert_v:
-                                v = 1.0 - v
-                            texcoords.append((u, v))
-                    elif line.startswith('f '):
-                        items = line.strip().split()[1:]
-                        idx = []
-                        for it in items:
-                            a = it.split('/')
-                            vi = int(a[0])
-                            ti = int(a[1]) if len(a) > 1 and a[1] != '' else 0
-                            if vi < 0: vi = len(positions) + vi + 1
-                            if ti < 0: ti = len(texcoords) + ti + 1
-                            idx.append((vi - 1, ti - 1))
-                        # Triangulación tipo fan
-                        for i in range(1, len(idx) - 1):
-                            fan = (0, i, i + 1)
-                            # Guardar triángulo de índices (en positions)
-                            tri_idx.append((idx[fan[0]][0], idx[fan[1]][0], idx[fan[2]][0]))
-                            # Volcar al stream intercalado pos+uv
-                            for k in fan:
-                                vi, ti = idx[k]
-                                x, y, z = positions[vi]
-                                if 0 <= ti < len(texcoords):
-                                    u, v = texcoords[ti]
-                                else:
-                                    u, v = 0.0, 0.0
-                                stream.extend([x, y, z, u, v])
-        except Exception as e:
-            raise RuntimeError(f"Error leyendo OBJ '{self.obj_path}': {e}")
-
-        if not stream:
-            raise RuntimeError(f"OBJ '{self.obj_path}' sin datos de geometría.")
-
-        xs = [p[0] for p in positions] or [0.0]
-        ys = [p[1] for p in positions] or [0.0]
-        zs = [p[2] for p in positions] or [0.0]
-        mn = (min(xs), min(ys), min(zs))
-        mx = (max(xs), max(ys), max(zs))
-        self._aabb = (mn, mx)
-
-        # Guardar datos locales para detectar baldas
-        self._raw_positions = positions
-        self._triangles_idx = tri_idx
-        _TRI_CACHE[self.obj_path] = {'positions': positions, 'tri_idx': tri_idx}
-
-        vb = np.array(stream, dtype='f4').tobytes()
-        _GEOM_CACHE[self.obj_path] = (vb, mn, mx)
-        print(f"[ModelOBJ] loaded(fallback) '{self.obj_path}': {len(stream)//5} verts, AABB {mn}..{mx}")
-        return vb
+        # Carga síncrona (el AssetLoader la adelanta en segundo plano con load_geometry)
+        store_geometry(self.obj_path, load_geometry(self.obj_path, self._invert_v))
+        # Guardar datos locales (AABB, posiciones/triángulos para detectar baldas)
+        return self._restore_cached_geometry()
 
     
     # ---------- Utilidades ----------
 
+    def get_world_triangle_arrays(self):
+        """
+        Versión vectorizada: devuelve (tris, normals) en espacio mundo como arrays
+        float64 de forma (N, 3, 3) y (N, 3). Un único producto matricial para todos
+        los vértices; normales unitarias por producto cruzado.
+        """
+        positions = getattr(self, '_raw_positions', None)
+        tri_idx = getattr(self, '_triangles_idx', None)
+        if positions is None or tri_idx is None or not len(tri_idx):
+            return np.zeros((0, 3, 3)), np.zeros((0, 3))
+        world = transform_points(self.get_model_matrix(), positions)
+        tris = world[tri_idx]
+        return tris, triangle_normals(tris)
+
+    def get_world_position_array(self):
+        """Vértices en mundo como array (N, 3) float64 (con m_model actual)."""
+        positions = getattr(self, '_raw_positions', None)
+        if positions is None or not len(positions):
+            return np.zeros((0, 3))
+        return transform_points(self.get_model_matrix(), positions)
+
     def get_world_triangles(self):
         """
         Devuelve lista de triángulos en mundo: [(p0, p1, p2), ...]
         donde p* son glm.vec3. Requiere _raw_positions y _triangles_idx.
         """
-        if not hasattr(self, '_raw_positions') or self._raw_positions is None:
-            return []
-        if not hasattr(self, '_triangles_idx') or self._triangles_idx is None:
-            return []
-        M = self.get_model_matrix()
-        wp = [glm.vec3(M * glm.vec4(x, y, z, 1.0)) for (x, y, z) in self._raw_positions]
-        tris = []
-        for i0, i1, i2 in self._triangles_idx:
-            tris.append((wp[i0], wp[i1], wp[i2]))
-        return tris
+        tris, _ = self.get_world_triangle_arrays()
+        return [tuple(glm.vec3(*p) for p in tri) for tri in tris]
 
     def get_world_triangles_and_normals(self):
         """
         Devuelve lista de tuplas: [((p0,p1,p2), n), ...] en espacio mundo,
         con n = normal unitaria del tri (orientación por producto cruzado).
         """
-        tris = self.get_world_triangles()
-        out = []
-        for (p0, p1, p2) in tris:
-            e1 = p1 - p0
-            e2 = p2 - p0
-            n = glm.normalize(glm.cross(e1, e2)) if glm.length(glm.cross(e1, e2)) > 1e-9 else glm.vec3(0, 1, 0)
-            out.append(((p0, p1, p2), n))
-        return out
+        tris, normals = self.get_world_triangle_arrays()
+        return [(tuple(glm.vec3(*p) for p in tri), glm.vec3(*n)) for tri, n in zip(tris, normals)]
     
     def get_world_positions(self):
         """Devuelve lista de glm.vec3 de los vértices en mundo (con m_model actual)."""
-        if not hasattr(self, '_raw_positions') or self._raw_positions is None:
-            return []
-        M = self.get_model_matrix()
-        return [glm.vec3(M * glm.vec4(x, y, z, 1.0)) for (x, y, z) in self._raw_positions]
+        return [glm.vec3(*p) for p in self.get_world_position_array()]
 
     def min_y_local(self):
         """min_y del AABB local del modelo (sin escala)."""
@@ -184,6 +282,7 @@ class ModelOBJ(BaseObject):
         if not self._aabb: return
         min_y = self._aabb[0][1]
         self._position.y += -min_y * self._scale.y
+        self._transform_changed()
 
     def auto_scale_by_longest_side(self, target_size):
         if not self._aabb: return
@@ -193,9 +292,10 @@ class ModelOBJ(BaseObject):
         longest = max(sx, sy, sz) if max(sx, sy, sz) > 0 else 1.0
         factor = target_size / longest
         self._scale *= factor
+        self._transform_changed()
         print(f"[ModelOBJ] autoscale: longest={longest:.3f} -> factor={factor:.3f}")
 
-    # recalcular m_model antes de subir a los shaders
+    # m_model cacheado: solo se recompone si cambió la transformación
     def update_matrices(self):
         self.m_model = self.get_model_matrix()
         super().update_matrices()
@@ -209,7 +309,7 @@ class ModelOBJ(BaseObject):
         return sx, sy, sz
 
     def clone(self):
-        """ Crea otra instancia que comparte geometría/texture (usa la caché del loader). """
+        """ Crea otra instancia que comparte VBO/VAO/textura (cachés GPU compartidas). """
         return type(self)(
             self.app, self.obj_path, self._texture_path if self._texture_path else None,
             position=(self._position.x, self._position.y, self._position.z),
@@ -0,0 +1,285 @@
+from .base_object import BaseObject, register_shader_variant, release_program, set_uniform
+from .model_obj import acquire_mesh, release_mesh
+from src.core.texture_array import get_product_texture_array
+from src.utils.geometry import compose_model_matrix
+from src.utils.mesh_lod import select_lod
+import os
+import numpy as np
+import glm
+
+
+class ProductBatch(BaseObject):
+    """
+    Dibuja todas las copias de un prototipo ModelOBJ con un único draw instanciado.
+    - Comparte el VBO (caché GPU de mallas) del prototipo.
+    - Las texturas viven en el texture array de productos: cada instancia aporta su
+      matriz modelo y su capa ('16f 1f/i'), así copias con distinta textura (variantes
+      de un mismo modelo) comparten bind y draw call.
+    - El buffer de instancias crece por duplicación y se resube solo si hay cambios.
+    - LOD común a todo el lote, elegido por la copia más cercana a la cámara.
+    - Observa 'transform_version' del prototipo: si cambia su escala/rotación se
+      recomponen las matrices de todas las instancias.
+    """
+    _INITIAL_CAPACITY = 64
+    occludee = True   # muchas copias dentro de una estantería: suele quedar tapado
+    _INSTANCE_STRIDE = 17 * 4   # mat4 + capa
+
+    def __init__(self, app, prototype, label=None, textured=True):
+        self.prototype = prototype
+        self.label = label or "batch"
+        self.positions = []                            # glm.vec3 por instancia
+        self._matrices = np.zeros((0, 16), dtype='f4')  # mat4 column-major por instancia
+        self._layers = np.zeros(0, dtype='f4')          # capa del texture array por instancia
+        self._capacity = self._INITIAL_CAPACITY
+        self._instances_dirty = False
+        self._proto_version = prototype.transform_version
+        self._instances_version = 0
+        self.lod = 0
+        self._pick_vao = None
+        self.instance_buffer = app.ctx.buffer(reserve=self._capacity * self._INSTANCE_STRIDE, dynamic=True)
+        array_path = get_product_texture_array(app.ctx).path if textured else None
+        super().__init__(app, texture_path=array_path, uv_scale=prototype.uv_scale)
+
+    def _load_texture(self, path):
+        # Un único texture array para todos los productos (no pasa por el streaming)
+        return get_product_texture_array(self.ctx)
+
+    # ---------- Instancias ----------
+    def add_instance(self, position, texture_path=None):
+        """Añade una copia del prototipo en 'position' (x, y, z). Devuelve su índice."""
+        return self.add_instances([position], texture_path)[0]
+
+    def add_instances(self, positions, texture_path=None):
+        """
+        Añade varias copias de golpe (una sola concatenación del array), todas con la
+        textura 'texture_path' (capa del texture array; se sube si aún no estaba).
+        Un lote texturizado exige 'texture_path': sin ella la copia saldría con la capa
+        de otro producto. Los productos sin textura van en un lote con textured=False.
+        """
+        if not positions:
+            return []
+        if self.use_texture and not texture_path:
+            raise ValueError(f"ProductBatch '{self.label}' es texturizado: falta texture_path")
+        first = len(self.positions)
+        layer = self.texture.layer_for(texture_path) if self.use_texture else 0
+        self._matrices = np.vstack((self._matrices, self._instance_matrices(positions)))
+        self._layers = np.concatenate((self._layers, np.full(len(positions), layer, dtype='f4')))
+        self.positions.extend(glm.vec3(*pos) for pos in positions)
+        self._instances_changed()
+        return list(range(first, len(self.positions)))
+
+    def _instance_matrices(self, positions):
+        p = self.prototype
+        return np.stack([np.frombuffer(compose_model_matrix(pos, p._rotation, p._scale).to_bytes(), dtype='f4')
+                         for pos in positions])
+
+    def _instances_changed(self):
+        self._instances_dirty = True
+        self._instances_version += 1
+
+    @property
+    def transform_version(self):
+        # Ambos contadores solo crecen: la suma cambia si cambia cualquiera de los dos
+        return self._instances_version + self.prototype.transform_version
+
+    def _sync_with_prototype(self):
+        """Recompone las matrices si el prototipo cambió de escala/rotación."""
+        if self.prototype.transform_version == self._proto_version:
+            return
+        self._proto_version = self.prototype.transform_version
+        if self.positions:
+            self._matrices = self._instance_matrices([tuple(p) for p in self.positions])
+            self._instances_dirty = True
+
+    def instance_count(self):
+        return len(self.positions)
+
+    def _compute_world_aabb(self):
+        """Unión de los AABB en mundo de todas las instancias (8 esquinas x N matrices)."""
+        self._sync_with_prototype()
+        local = self.prototype.aabb_local()
+        if not local or not self.instance_count():
+            return None
+        (x0, y0, z0), (x1, y1, z1) = local
+        corners = np.array([[x, y, z, 1.0] for x in (x0, x1) for y in (y0, y1) for z in (z0, z1)])
+        # _matrices guarda cada mat4 en columnas: punto_fila @ M_columnas = (M @ p)^T
+        world = corners @ self._matrices.reshape(-1, 4, 4)
+        pts = world[:, :, :3].reshape(-1, 3)
+        return tuple(map(float, pts.min(axis=0))), tuple(map(float, pts.max(axis=0)))
+
+    def projected_pixels(self, camera):
+        """Tamaño en pantalla de UNA copia, a la distancia de la más cercana (AABB del lote)."""
+        box = self.world_aabb()
+        local = self.prototype.aabb_local()
+        if not box or not local:
+            return 0.0
+        extent = (glm.vec3(*local[1]) - glm.vec3(*local[0])) * self.prototype._scale
+        nearest = glm.clamp(camera.position, glm.vec3(*box[0]), glm.vec3(*box[1]))
+        return camera.projected_pixels(glm.length(extent), glm.length(nearest - camera.position))
+
+    def select_lod(self, camera):
+        # Un LOD por lote (el de la copia más cercana): las copias comparten draw call
+        self.lod = select_lod(self.projected_pixels(camera), self._mesh['lod_cells'], self.lod)
+
+    def _upload_instances(self):
+        n = self.instance_count()
+        if n > self._capacity:
+            while self._capacity < n:
+                self._capacity *= 2
+            # Buffer más grande -> hay que rehacer los VAO que lo referencian
+            self.vao.release()
+            if self._pick_vao is not None:
+                self._pick_vao.release()
+                self._pick_vao = None
+            self.instance_buffer.release()
+            self.instance_buffer = self.ctx.buffer(reserve=self._capacity * self._INSTANCE_STRIDE, dynamic=True)
+            self.vao = self.get_vao()
+        if n:
+            self.instance_buffer.write(np.hstack((self._matrices, self._layers[:, None])).tobytes())
+        self._instances_dirty = False
+
+    # ---------- BaseObject ----------
+    def get_vbo(self):
+        # Geometría compartida con el prototipo (una referencia más en la caché GPU)
+        proto = self.prototype
+        self._mesh = acquire_mesh(self.ctx, proto.obj_path, proto.get_vertex_data)
+        return self._mesh['vbo']
+
+    def get_ibo(self):
+        return self._mesh['ibo']
+
+    def get_vao(self):
+        if self.use_texture:
+            return self.ctx.vertex_array(
+                self.shader_program,
+                [(self.vbo, '3f 2f', 'in_position', 'in_uv'),
+                 (self.instance_buffer, '16f 1f/i', 'in_model', 'in_layer')],
+                index_buffer=self.ibo, index_element_size=4
+            )
+        return self.ctx.vertex_array(
+            self.shader_program,
+            [(self.vbo, '3f 2x4', 'in_position'),
+             (self.instance_buffer, '16f 4x/i', 'in_model')],
+            index_buffer=self.ibo, index_element_size=4
+        )
+
+    def on_init(self):
+        if not self.use_texture and 'color' in self.shader_program:
+            set_uniform(self.shader_program, 'color', (0.8, 0.8, 0.8))
+
+    def update_matrices(self):
+        # m_model va por instancia y la cámara por UBO: nada que escribir por draw
+        pass
+
+    def prepare(self):
+        # Antes de encolar: si el buffer de instancias crece, el VAO cambia
+        self._sync_with_prototype()
+        if self._instances_dirty:
+            self._upload_instances()
+
+    def draw(self, vao=None):
+        n = self.instance_count()
+        vao = vao or self.vao
+        if n and vao is not None:
+            first, count = self._mesh['lods'][self.lod]
+            vao.render(vertices=count, first=first, instances=n)
+
+    # ---------- Picking ----------
+    pick_variant = 'pick_instanced'
+
+    def pick_vao(self, program):
+        if self._pick_vao is None:
+            self._pick_vao = self.ctx.vertex_array(
+                program,
+                [(self.vbo, '3f 2x4', 'in_position'),
+                 (self.instance_buffer, '16f 4x/i', 'in_model')],
+                index_buffer=self.ibo, index_element_size=4
+            )
+        return self._pick_vao
+
+    def pick_label(self, instance=0):
+        name = os.path.splitext(os.path.basename(self.prototype.obj_path))[0]
+        return f"{name} #{instance} ({(self.label or '').split(':')[0]})"
+
+    def instance_aabb(self, instance=0):
+        """AABB en mundo de una sola copia (para resaltarla)."""
+        local = self.prototype.aabb_local()
+        if not local or not 0 <= instance < self.instance_count():
+            return None
+        (x0, y0, z0), (x1, y1, z1) = local
+        corners = np.array([[x, y, z, 1.0] for x in (x0, x1) for y in (y0, y1) for z in (z0, z1)])
+        pts = (corners @ self._matrices[instance].reshape(4, 4))[:, :3]
+        return tuple(map(float, pts.min(axis=0))), tuple(map(float, pts.max(axis=0)))
+
+    def ray_geometry(self):
+        return self.prototype.ray_geometry()
+
+    def instance_matrices(self):
+        self._sync_with_prototype()
+        return self._matrices.reshape(-1, 4, 4)
+
+    def destroy(self):
+        # El VAO es propio (lleva el buffer de instancias); el VBO es de la caché compartida
+        self.vao.release()
+        if self._pick_vao is not None:
+            self._pick_vao.release()
+        self.instance_buffer.release()
+        release_mesh(self.ctx, self.prototype.obj_path)
+        release_program(self.shader_program)
+
+    def shader_variant(self):
+        return 'textured_array_instanced' if self.use_texture else 'color_instanced'
+
+
+register_shader_variant(
+    'textured_array_instanced',
+    vertex_shader='''
+        #version 330
+        layout (location = 0) in vec3 in_position;
+        layout (location = 1) in vec2 in_uv;
+        in mat4 in_model;
+        in float in_layer;
+        layout (std140) uniform Camera {
+            mat4 m_proj;
+            mat4 m_view;
+        };
+        out vec3 v_uv;
+        void main() {
+            v_uv = vec3(in_uv, in_layer);
+            gl_Position = m_proj * m_view * in_model * vec4(in_position, 1.0);
+        }
+    ''',
+    fragment_shader='''
+        #version 330
+        uniform sampler2DArray tex0;
+        in vec3 v_uv;
+        out vec4 fragColor;
+        void main() {
+            fragColor = texture(tex0, v_uv);
+        }
+    '''
+)
+
+register_shader_variant(
+    'color_instanced',
+    vertex_shader='''
+        #version 330
+        layout (location = 0) in vec3 in_position;
+        in mat4 in_model;
+        layout (std140) uniform Camera {
+            mat4 m_proj;
+            mat4 m_view;
+        };
+        void main() {
+            gl_Position = m_proj * m_view * in_model * vec4(in_position, 1.0);
+        }
+    ''',
+    fragment_shader='''
+        #version 330
+        uniform vec3 color;
+        out vec4 fragColor;
+        void main() {
+            fragColor = vec4(color, 1.0);
+        }
+    '''
+)
@@ -0,0 +1,42 @@
+from .base_object import BaseObject
+from src.utils.geometry import transform_points
+import numpy as np
+
+
+class StaticBatch(BaseObject):
+    """
+    Geometría inmóvil que comparte material (programa + textura/color) fundida en un
+    único VBO/IBO con las transformaciones de mundo ya aplicadas: un draw call para
+    todas las piezas. Los objetos de origen se conservan (baldas, picking...), pero
+    ya no se dibujan por separado. SceneManager la reconstruye si cambia el layout.
+    """
+
+    def __init__(self, app, sources):
+        self.sources = list(sources)
+        first = self.sources[0]
+        self.color = getattr(first, "color", None)
+        self.label = f"static:{first.material_key()}"
+        texture_path = first.texture.path if first.texture is not None else None
+        # Densidad de textura más alta del grupo (para el streaming de mips)
+        uv_scale = tuple(max(s.uv_scale[i] for s in self.sources) for i in range(2))
+        super().__init__(app, texture_path=texture_path, uv_scale=uv_scale)
+        if self.color is None:
+            del self.color
+
+    def get_vertex_data(self):
+        vertices, indices, base = [], [], 0
+        for src in self.sources:
+            v, i = src.static_geometry()
+            v = v.copy()
+            v[:, :3] = transform_points(src.get_model_matrix(), v[:, :3].astype(np.float64))
+            vertices.append(v)
+            indices.append((np.arange(len(v), dtype='u4') if i is None else i) + np.uint32(base))
+            base += len(v)
+        self._indices = np.concatenate(indices).astype('u4')
+        return np.concatenate(vertices).astype('f4').tobytes()
+
+    def get_ibo(self):
+        return self.ctx.buffer(self._indices.tobytes())
+
+    def triangle_count(self):
+        return len(self._indices) // 3
@@ -26,8 +26,3 @@ class Wall(BaseObject):
             (-0.5, 0.5, 0.5, 0.0, t),
         ]
         return np.array(vertices, dtype='f4').tobytes()
-
-    def render(self):
-        if not self.use_texture and 'color' in self.shader_program:
-            self.shader_program['color'].value = self.color
-        super().render()
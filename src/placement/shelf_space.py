@@ -1,7 +1,17 @@
 import glm
-from collections import defaultdict
+import hashlib
+import json
+import os
+import numpy as np
+from src.utils import config
 from src.utils.geometry import aabb_world_from_local
 
+# --- CACHÉ DE BALDAS DETECTADAS ---
+# clave -> lista de baldas relativas a la traslación del modelo (mismo mueble en otra
+# posición reutiliza el resultado). Se persiste opcionalmente en SHELF_CACHE_PATH.
+_LEVELS_CACHE = {}
+_DISK_CACHE_LOADED = False
+
 class ShelfSpace:
     """
     Representa el volumen útil de una estantería importada.
@@ -12,7 +22,7 @@ class ShelfSpace:
     """
     def __init__(self, model_obj, levels=5, margin_xy=0.03, back_offset=0.03,
                  y_bin=0.01, board_merge=0.03, per_level_shrink=0.01,
-                 label=None, debug=False):
+                 label=None, debug=False, use_disk_cache=None):
         self.model = model_obj
         self.levels_hint = levels
         self.margin_xy = margin_xy
@@ -22,6 +32,7 @@ class ShelfSpace:
         self.per_level_shrink = per_level_shrink
         self.label = label or "shelf"
         self.debug = debug
+        self.use_disk_cache = config.SHELF_DISK_CACHE if use_disk_cache is None else use_disk_cache
 
         local = model_obj.aabb_local()
         world_min, world_max = aabb_world_from_local(local[0], local[1], model_obj.get_model_matrix())
@@ -29,7 +40,59 @@ class ShelfSpace:
         self.world_max = glm.vec3(*world_max)
 
         self.shelves = []
-        self._build_levels_from_geometry()
+        cache_key = self._cache_key()
+        if not self._load_cached_levels(cache_key):
+            self._build_levels_from_geometry()
+            self._store_cached_levels(cache_key)
+
+    # --- caché de detección (memoria + disco) ---
+    def _cache_key(self):
+        """
+        Clave estable: malla (ruta + mtime/tamaño), parte lineal de la matriz modelo
+        (rotación/escala, sin traslación) y parámetros de detección.
+        """
+        path = getattr(self.model, 'obj_path', None)
+        if not path or not os.path.exists(path):
+            return None
+        st = os.stat(path)
+        M = np.array(self.model.get_model_matrix(), dtype=np.float64)
+        linear = [round(float(v), 6) for v in M[:3, :3].reshape(-1)]
+        params = [self.levels_hint, self.margin_xy, self.back_offset, self.y_bin,
+                  self.board_merge, self.per_level_shrink]
+        raw = json.dumps([os.path.abspath(path), st.st_mtime_ns, st.st_size, linear, params])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def _translation(self):
+        M = self.model.get_model_matrix()
+        return float(M[3].x), float(M[3].y), float(M[3].z)
+
+    def _load_cached_levels(self, key):
+        if key is None:
+            return False
+        if key not in _LEVELS_CACHE and self.use_disk_cache:
+            _load_disk_cache()
+        rel = _LEVELS_CACHE.get(key)
+        if rel is None:
+            return False
+        tx, ty, tz = self._translation()
+        self.shelves = [dict(y=l['y'] + ty, y_top=None if l['y_top'] is None else l['y_top'] + ty,
+                             x0=l['x0'] + tx, x1=l['x1'] + tx, z0=l['z0'] + tz, z1=l['z1'] + tz)
+                        for l in rel]
+        if self.debug:
+            print(f"[ShelfSpace:{self.label}] {len(self.shelves)} baldas desde caché")
+        return True
+
+    def _store_cached_levels(self, key):
+        if key is None or not self.shelves:
+            return
+        tx, ty, tz = self._translation()
+        _LEVELS_CACHE[key] = [dict(y=float(l['y']) - ty,
+                                   y_top=None if l['y_top'] is None else float(l['y_top']) - ty,
+                                   x0=float(l['x0']) - tx, x1=float(l['x1']) - tx,
+                                   z0=float(l['z0']) - tz, z1=float(l['z1']) - tz)
+                              for l in self.shelves]
+        if self.use_disk_cache:
+            _save_disk_cache()
 
     # --- utilidad: hacia dónde "mira" el +Z local del modelo en mundo ---
     def _front_axis(self):
@@ -42,28 +105,86 @@ class ShelfSpace:
 
     # --- utilidad: cuantiles robustos para recortar outliers ---
     def _quantile(self, vals, q):
-        if not vals:
+        if len(vals) == 0:
             return None
-        s = sorted(vals)
+        s = np.sort(np.asarray(vals))
         i = max(0, min(len(s) - 1, int(q * (len(s) - 1))))
-        return s[i]
+        return float(s[i])
+
+    # --- utilidad: agrupa alturas ordenadas cuando el salto entre vecinas es <= board_merge ---
+    def _merge_heights(self, ys_sorted):
+        """Devuelve el id de grupo de cada altura (ys_sorted ascendente)."""
+        if len(ys_sorted) == 0:
+            return np.zeros(0, dtype=np.int64)
+        gaps = np.diff(ys_sorted) > self.board_merge
+        return np.concatenate(([0], np.cumsum(gaps)))
+
+    # --- utilidad: recorte de candidatos a 'levels_hint' (quitar tapa/peana) ---
+    def _trim_levels(self, levels):
+        if len(levels) > self.levels_hint:
+            # quitar tapa/peana cuando hay margen
+            if len(levels) >= self.levels_hint + 2:
+                levels = levels[1:-1]
+            else:
+                levels = levels[:-1]
+        if len(levels) > self.levels_hint:
+            start = (len(levels) - self.levels_hint) // 2
+            levels = levels[start:start + self.levels_hint]
+        return levels
+
+    # --- utilidad: rectángulo útil XZ a partir de puntos de la balda + back_offset ---
+    def _level_rect(self, xs, zs, axis, quantiles=None):
+        if len(xs) == 0 or len(zs) == 0:
+            # fallback local para este nivel
+            x0 = self.world_min.x + self.margin_xy
+            x1 = self.world_max.x - self.margin_xy
+            z0 = self.world_min.z + self.margin_xy
+            z1 = self.world_max.z - self.margin_xy
+        else:
+            if quantiles is None:
+                # Como ya excluimos postes, podemos usar min/max directos
+                x_min, x_max = float(xs.min()), float(xs.max())
+                z_min, z_max = float(zs.min()), float(zs.max())
+            else:
+                (qx_lo, qx_hi), (qz_lo, qz_hi) = quantiles
+                x_min = self._quantile(xs, qx_lo); x_max = self._quantile(xs, qx_hi)
+                z_min = self._quantile(zs, qz_lo); z_max = self._quantile(zs, qz_hi)
+
+            x0 = x_min + self.margin_xy + self.per_level_shrink
+            x1 = x_max - self.margin_xy - self.per_level_shrink
+            z0 = z_min + self.margin_xy + self.per_level_shrink
+            z1 = z_max - (self.margin_xy + self.per_level_shrink)
+
+        # Aplicar fondo según orientación del mueble
+        if   axis == 'z+':
+            z0 += self.back_offset
+        elif axis == 'z-':
+            z1 -= self.back_offset
+        elif axis == 'x+':
+            x0 += self.back_offset
+        elif axis == 'x-':
+            x1 -= self.back_offset
+
+        # Normalizar
+        x0, x1 = min(x0, x1), max(x0, x1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        return x0, x1, z0, z1
 
     # --- detección por geometría + aplicación de back_offset orientado ---
     def _build_levels_from_geometry(self):
         """
-        Detección robusta usando normales:
+        Detección robusta usando normales (vectorizada con NumPy):
         - Tomamos triángulos cuya normal tenga componente Y alta (n.y >= normal_thresh).
-        - Agrupamos por altura con bins en Y para obtener cada balda.
+        - Agrupamos por altura con bins en Y (np.unique) para obtener cada balda.
         - El rectángulo útil XZ se calcula SOLO con los vértices de esos triángulos (sin postes).
         """
-        # 1) Triángulos + normales en mundo
-        tris_norms = []
+        # 1) Triángulos + normales en mundo: arrays (N,3,3) y (N,3)
         try:
-            tris_norms = self.model.get_world_triangles_and_normals()
+            tris, normals = self.model.get_world_triangle_arrays()
         except Exception:
-            tris_norms = []
+            tris, normals = np.zeros((0, 3, 3)), np.zeros((0, 3))
 
-        if not tris_norms:
+        if not len(tris):
             # Fallback: método anterior por cuantiles
             if self.debug:
                 print(f"[ShelfSpace:{self.label}] ⚠️ Sin triángulos/normales; usando fallback.")
@@ -71,118 +192,57 @@ class ShelfSpace:
 
         normal_thresh = 0.85  # cuanto más alto, más “horizontales” (superficie superior)
         # 2) Filtrar triángulos apuntando hacia +Y
-        top_tris = [tri for tri in tris_norms if tri[1].y >= normal_thresh]
-        if not top_tris:
+        top_tris = tris[normals[:, 1] >= normal_thresh]
+        if not len(top_tris):
             if self.debug:
                 print(f"[ShelfSpace:{self.label}] ⚠️ Sin triángulos con n.y>={normal_thresh}; fallback.")
             return self._build_levels_from_vertices_fallback()
-        
-        tri_infos = []
-        for (p0, p1, p2), n in top_tris:
-            y_mean = (p0.y + p1.y + p2.y) / 3.0
-            tri_infos.append((y_mean, (p0, p1, p2)))
 
-        # 4) Bins en Y para agrupar triángulos por balda
+        # 3) Bins en Y (por altura media del triángulo) para agrupar triángulos por balda
         inv = 1.0 / self.y_bin if self.y_bin > 0 else 100.0
-        buckets = {}  # key -> lista de triángulos
-        for y_mean, tri in tri_infos:
-            key = round(y_mean * inv)
-            buckets.setdefault(key, []).append(tri)
-
-        # 5) Centro/techo por balda (usando medias y merge por board_merge)
-        candidate_levels = sorted((sum(tri[j].y for tri in tris for j in range(3)) / (3 * len(tris)), tris)
-                                for _, tris in buckets.items())
-        # candidate_levels: lista de (y_media_balda, [tris...])
-        # fusionamos por proximidad vertical
-        merged = []
-        for y_mean, tris in sorted(candidate_levels, key=lambda x: x[0]):
-            if not merged:
-                merged.append([y_mean, y_mean, [tris]])
-            else:
-                y0, y1, groups = merged[-1]
-                if abs(y_mean - y1) <= self.board_merge:
-                    merged[-1][1] = max(y1, y_mean)
-                    groups.append(tris)
-                else:
-                    merged.append([y_mean, y_mean, [tris]])
-
-        # Nos quedamos con la parte superior de cada grupo + concatenamos sus tris
-        levels = []
-        for y0, y1, groups in merged:
-            tris = [t for group in groups for t in group]
-            y_top_surface = y1
-            levels.append((y_top_surface, tris))
+        y_mean = top_tris[:, :, 1].mean(axis=1)
+        _, bucket_of_tri, bucket_size = np.unique(np.round(y_mean * inv), return_inverse=True, return_counts=True)
+        bucket_y = np.bincount(bucket_of_tri, weights=y_mean) / bucket_size
+
+        # 4) Fusionamos bins por proximidad vertical (board_merge); cada grupo se queda con su altura superior
+        order = np.argsort(bucket_y, kind='stable')
+        group_sorted = self._merge_heights(bucket_y[order])
+        group_of_bucket = np.empty_like(group_sorted)
+        group_of_bucket[order] = group_sorted
+        group_top = np.full(group_sorted[-1] + 1, -np.inf)
+        np.maximum.at(group_top, group_sorted, bucket_y[order])
+        group_of_tri = group_of_bucket[bucket_of_tri]
+
+        # levels: lista de (y_superficie, id_grupo) ascendente
+        levels = [(float(y), g) for g, y in enumerate(group_top)]
 
         if not levels:
             if self.debug:
                 print(f"[ShelfSpace:{self.label}] ⚠️ No se detectaron niveles; fallback.")
             return self._build_levels_from_vertices_fallback()
 
-        # 6) Recorte a 'levels_hint'
-        if len(levels) > self.levels_hint:
-            # quitar tapa/peana cuando hay margen
-            if len(levels) >= self.levels_hint + 2:
-                levels = levels[1:-1]
-            else:
-                levels = levels[:-1]
-        if len(levels) > self.levels_hint:
-            start = (len(levels) - self.levels_hint) // 2
-            levels = levels[start:start + self.levels_hint]
+        # 5) Recorte a 'levels_hint'
+        levels = self._trim_levels(levels)
 
-        # 7) Construcción de rectángulos útiles por balda SOLO con vértices de esas superficies
+        # 6) Construcción de rectángulos útiles por balda SOLO con vértices de esas superficies
         self.shelves = []
         axis = self._front_axis()
 
-        for idx, (yb, tris) in enumerate(levels):
+        for idx, (yb, g) in enumerate(levels):
             # puntos XZ de la superficie superior filtrada
-            xs, zs = [], []
+            pts = top_tris[group_of_tri == g].reshape(-1, 3)
             band_lo = yb - self.board_merge * 1.2
             band_hi = yb + self.board_merge * 1.2
-            for (p0, p1, p2) in tris:
-                for p in (p0, p1, p2):
-                    if band_lo <= p.y <= band_hi:
-                        xs.append(p.x)
-                        zs.append(p.z)
+            pts = pts[(pts[:, 1] >= band_lo) & (pts[:, 1] <= band_hi)]
+            xs, zs = pts[:, 0], pts[:, 2]
 
             if self.debug:
                 print(f"[ShelfSpace:{self.label}] L{idx} (normals) pts: xs={len(xs)} zs={len(zs)}")
 
-            if not xs or not zs:
-                # fallback local para este nivel
-                x0 = self.world_min.x + self.margin_xy
-                x1 = self.world_max.x - self.margin_xy
-                z0 = self.world_min.z + self.margin_xy
-                z1 = self.world_max.z - self.margin_xy
-            else:
-                # Como ya excluimos postes, podemos usar min/max directos
-                x_min, x_max = min(xs), max(xs)
-                z_min, z_max = min(zs), max(zs)
-
-                x0 = x_min + self.margin_xy + self.per_level_shrink
-                x1 = x_max - self.margin_xy - self.per_level_shrink
-                z0 = z_min + self.margin_xy + self.per_level_shrink
-                z1 = z_max - (self.margin_xy + self.per_level_shrink)
-
-            # Aplicar fondo según orientación del mueble
-            if   axis == 'z+':
-                z0 += self.back_offset
-            elif axis == 'z-':
-                z1 -= self.back_offset
-            elif axis == 'x+':
-                x0 += self.back_offset
-            elif axis == 'x-':
-                x1 -= self.back_offset
-
-            # Normalizar
-            x0, x1 = min(x0, x1), max(x0, x1)
-            z0, z1 = min(z0, z1), max(z0, z1)
+            x0, x1, z0, z1 = self._level_rect(xs, zs, axis)
 
             # Buscar techo inmediato
-            y_top = None
-            for (y_next, _) in sorted(levels, key=lambda e: e[0]):
-                if y_next > yb:
-                    y_top = y_next
-                    break
+            y_top = levels[idx + 1][0] if idx + 1 < len(levels) else None
 
             width = max(0.0, x1 - x0)
             depth = max(0.0, z1 - z0)
@@ -217,95 +277,69 @@ class ShelfSpace:
         return self.shelves
     
     def _build_levels_from_vertices_fallback(self):
-        """Antiguo método (cuantiles por vértices) como fallback."""
-        verts_w = self.model.get_world_positions()
-        if not verts_w:
+        """Antiguo método (cuantiles por vértices) como fallback, vectorizado."""
+        verts_w = self.model.get_world_position_array()
+        if not len(verts_w):
             self._build_levels_uniform()
             return
 
-        bins = defaultdict(list)
         inv = 1.0 / self.y_bin if self.y_bin > 0 else 100.0
-        for v in verts_w:
-            key = round(v.y * inv)
-            bins[key].append(v.y)
-
-        ys = sorted(sum(vals) / len(vals) for vals in bins.values())
-        surfaces = []
-        for y in ys:
-            if not surfaces:
-                surfaces.append([y, y])
-            else:
-                y0, y1 = surfaces[-1]
-                if abs(y - y1) <= self.board_merge:
-                    surfaces[-1][1] = max(y1, y)
-                else:
-                    surfaces.append([y, y])
-
-        top_surfaces = [y1 for (y0, y1) in surfaces]
-        if not top_surfaces:
+        _, bin_of_vert, bin_size = np.unique(np.round(verts_w[:, 1] * inv), return_inverse=True, return_counts=True)
+        ys = np.sort(np.bincount(bin_of_vert, weights=verts_w[:, 1]) / bin_size)
+        groups = self._merge_heights(ys)
+        top_surfaces = np.full(groups[-1] + 1, -np.inf)
+        np.maximum.at(top_surfaces, groups, ys)
+
+        candidates = self._trim_levels([float(y) for y in top_surfaces])
+        if not candidates:
             self._build_levels_uniform()
             return
 
-        candidates = top_surfaces[:]
-        if len(candidates) > self.levels_hint:
-            if len(candidates) >= self.levels_hint + 2:
-                candidates = candidates[1:-1]
-            else:
-                candidates = candidates[:-1]
-        if len(candidates) > self.levels_hint:
-            start = (len(candidates) - self.levels_hint) // 2
-            candidates = candidates[start:start + self.levels_hint]
-
         self.shelves = []
         axis = self._front_axis()
 
         # cuantiles por eje (más laxo en X)
-        qx_lo, qx_hi = 0.01, 0.99
-        qz_lo, qz_hi = 0.05, 0.95
+        quantiles = ((0.01, 0.99), (0.05, 0.95))
 
-        for yb in candidates:
+        for i, yb in enumerate(candidates):
             band_lo = yb - self.board_merge * 1.2
             band_hi = yb + self.board_merge * 1.2
-            xs, zs = [], []
-            for v in verts_w:
-                if band_lo <= v.y <= band_hi:
-                    xs.append(v.x)
-                    zs.append(v.z)
-
-            if not xs or not zs:
-                x0 = self.world_min.x + self.margin_xy
-                x1 = self.world_max.x - self.margin_xy
-                z0 = self.world_min.z + self.margin_xy
-                z1 = self.world_max.z - self.margin_xy
-            else:
-                x_min = self._quantile(xs, qx_lo); x_max = self._quantile(xs, qx_hi)
-                z_min = self._quantile(zs, qz_lo); z_max = self._quantile(zs, qz_hi)
+            pts = verts_w[(verts_w[:, 1] >= band_lo) & (verts_w[:, 1] <= band_hi)]
 
-                x0 = x_min + self.margin_xy + self.per_level_shrink
-                x1 = x_max - self.margin_xy - self.per_level_shrink
-                z0 = z_min + self.margin_xy + self.per_level_shrink
-                z1 = z_max - (self.margin_xy + self.per_level_shrink)
-
-            if   axis == 'z+':
-                z0 += self.back_offset
-            elif axis == 'z-':
-                z1 -= self.back_offset
-            elif axis == 'x+':
-                x0 += self.back_offset
-            elif axis == 'x-':
-                x1 -= self.back_offset
-
-            x0, x1 = min(x0, x1), max(x0, x1)
-            z0, z1 = min(z0, z1), max(z0, z1)
-
-            y_top = None
-            for y_next in sorted(candidates):
-                if y_next > yb:
-                    y_top = y_next
-                    break
+            x0, x1, z0, z1 = self._level_rect(pts[:, 0], pts[:, 2], axis, quantiles=quantiles)
+            y_top = candidates[i + 1] if i + 1 < len(candidates) else None
 
             self.shelves.append(dict(y=yb, y_top=y_top, x0=x0, x1=x1, z0=z0, z1=z1))
 
         if not self.shelves:
             self._build_levels_uniform()
 
+
+def _load_disk_cache():
+    """Carga (una vez) las baldas persistidas; una versión distinta se ignora."""
+    global _DISK_CACHE_LOADED
+    if _DISK_CACHE_LOADED:
+        return
+    _DISK_CACHE_LOADED = True
+    try:
+        with open(config.SHELF_CACHE_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == config.SHELF_CACHE_VERSION:
+            for key, levels in data.get('entries', {}).items():
+                _LEVELS_CACHE.setdefault(key, levels)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"[ShelfSpace] ⚠️ caché de baldas ilegible: {e}")
+
+
+def _save_disk_cache():
+    _load_disk_cache()   # no pisar entradas de otras ejecuciones
+    tmp_path = config.SHELF_CACHE_PATH + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(config.SHELF_CACHE_PATH), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': config.SHELF_CACHE_VERSION, 'entries': _LEVELS_CACHE}, f)
+        os.replace(tmp_path, config.SHELF_CACHE_PATH)
+    except Exception as e:
+        print(f"[ShelfSpace] ⚠️ no se pudo guardar la caché de baldas: {e}")
@@ -0,0 +1,118 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AssetLoader:
+    """
+    Carga de assets en segundo plano.
+    - Los trabajos de CPU (decodificar imágenes, parsear OBJ, detectar baldas) corren en
+      un pool de hilos; numpy/SDL_image sueltan el GIL en la parte pesada.
+    - Lo que toca OpenGL (crear texturas/VBOs/objetos) va en el callback 'on_ready', que
+      solo se ejecuta en el hilo GL dentro de pump(), con un presupuesto de tiempo por frame.
+    - synchronous=True ejecuta los trabajos en el momento (headless, scripts, depuración).
+    """
+
+    def __init__(self, max_workers=None, synchronous=False):
+        self.synchronous = synchronous
+        self._executor = None if synchronous else ThreadPoolExecutor(
+            max_workers=max_workers or min(4, os.cpu_count() or 1),
+            thread_name_prefix="asset-loader",
+        )
+        self._ready = queue.Queue()   # callbacks listos para el hilo GL
+        self._lock = threading.Lock()  # los trabajos terminan en hilos del pool
+        self._pending = 0             # grupos enviados cuyo callback aún no se ejecutó
+        self.submitted = 0
+        self.completed = 0
+
+    def submit(self, fn, *args, on_ready=None, label=None):
+        """Ejecuta fn(*args) en el pool; on_ready(resultado) se llamará desde pump()."""
+        self.submit_group([(fn, args)], None if on_ready is None else (lambda results: on_ready(results[0])),
+                          label=label or getattr(fn, "__name__", "job"))
+
+    def submit_group(self, jobs, on_ready=None, label="group"):
+        """
+        Lanza varios trabajos [(fn, args), ...] y llama on_ready([resultados]) (mismo orden)
+        cuando terminan todos. Si alguno falla se informa y el grupo se descarta.
+        """
+        self._pending += 1
+        self.submitted += 1
+        results = [None] * len(jobs)
+        state = {"left": len(jobs), "error": None}
+
+        def finish():
+            self._ready.put((label, on_ready, results, state["error"]))
+
+        if not jobs:
+            finish()
+            return
+
+        def done(i, fn, args):
+            try:
+                results[i] = fn(*args)
+            except Exception as e:
+                state["error"] = state["error"] or e
+            with self._lock:
+                state["left"] -= 1
+                last = state["left"] == 0
+            if last:
+                finish()
+
+        for i, (fn, args) in enumerate(jobs):
+            if self.synchronous:
+                done(i, fn, args)
+            else:
+                self._executor.submit(done, i, fn, args)
+
+    def defer(self, fn, label="gl"):
+        """Encola fn() para el hilo GL sin pasar por el pool (trocea subidas grandes entre frames)."""
+        self._pending += 1
+        self.submitted += 1
+        self._ready.put((label, lambda results: fn(), [], None))
+
+    def pump(self, budget_s=0.004):
+        """
+        Ejecuta callbacks listos en el hilo GL hasta agotar 'budget_s' (None = todos).
+        Siempre ejecuta al menos uno para garantizar progreso. Devuelve cuántos ejecutó.
+        """
+        start = time.perf_counter()
+        ran = 0
+        while True:
+            try:
+                label, on_ready, results, error = self._ready.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            self.completed += 1
+            ran += 1
+            if error is not None:
+                print(f"❌ [Loader] '{label}' falló: {error}")
+            elif on_ready is not None:
+                try:
+                    on_ready(results)
+                except Exception as e:
+                    print(f"❌ [Loader] error subiendo '{label}': {e}")
+            if budget_s is not None and time.perf_counter() - start >= budget_s:
+                break
+        return ran
+
+    def is_idle(self):
+        """True si no queda ningún trabajo en curso ni callback por ejecutar."""
+        return self._pending == 0
+
+    def wait_all(self, poll_s=0.001):
+        """Bloquea ejecutando callbacks hasta vaciar la cola (incluye los que encadenan trabajos)."""
+        while not self.is_idle():
+            if not self.pump(budget_s=None):
+                time.sleep(poll_s)
+
+    def progress(self):
+        """(grupos completados, grupos enviados)."""
+        return self.completed, self.submitted
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,150 @@
+from collections import deque
+import glm
+import numpy as np
+from src.objects.base_object import register_shader_variant, acquire_program, release_program, set_uniform
+from src.utils.config import OCCLUSION_BOX_MARGIN
+
+
+class OcclusionCuller:
+    """
+    Oclusión por queries de GPU con resultados del frame anterior:
+    - Tras la pasada opaca (suelo, paredes, estanterías...) se dibuja la caja AABB de cada
+      objeto 'occludee' sin escribir color ni profundidad, dentro de una query de samples.
+    - El frame siguiente se lee el resultado: si ningún fragmento pasó el test de
+      profundidad, el objeto se da por tapado y sale de la pasada normal.
+    - Los tapados no se descartan sin más: render_hidden() los dibuja tras sus cajas con
+      render condicional sobre la query de este mismo frame. La GPU se salta el draw si la
+      caja sigue tapada y lo hace si ha vuelto a verse, sin que la CPU espere: un objeto
+      que reaparece nunca falta ni un frame.
+    - Sin resultado reciente (recién entra en el frustum, cámara dentro de la caja...) el
+      objeto se considera visible: un falso positivo solo cuesta un draw, nunca un hueco.
+    """
+    LATENCY = 1          # frames entre emitir una query y leer su resultado en la CPU
+    FORGET_FRAMES = 120  # entradas sin probar en tantos frames se descartan
+
+    def __init__(self, ctx, margin=OCCLUSION_BOX_MARGIN):
+        self.ctx = ctx
+        self.margin = margin
+        self.frame = 0
+        self.program = acquire_program(ctx, 'occlusion_box')
+        corners = np.array([(x, y, z) for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype='f4')
+        # 12 triángulos de la caja unidad (índice = x*4 + y*2 + z)
+        faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+        indices = np.array([[a, b, c, a, c, d] for a, b, c, d in faces], dtype='u4')
+        self.vbo = ctx.buffer(corners.tobytes())
+        self.ibo = ctx.buffer(indices.tobytes())
+        self.vao = ctx.vertex_array(self.program, [(self.vbo, '3f', 'in_position')],
+                                    index_buffer=self.ibo, index_element_size=4)
+        self._entries = {}        # obj -> {'visible', 'result_frame', 'tested_frame'}
+        self._pending = deque()   # (frame, obj, query)
+        self._issued = {}         # obj -> query emitida en este frame (None si no hizo falta)
+        self._free_queries = []
+        self.stats = {"occlusion_tests": 0, "occluded": 0}
+
+    def begin_frame(self):
+        """Lee las queries de hace LATENCY frames y actualiza la visibilidad de sus objetos."""
+        while self._pending and self._pending[0][0] <= self.frame - self.LATENCY:
+            frame, obj, query = self._pending.popleft()
+            entry = self._entries.get(obj)
+            # Un resultado más nuevo (p. ej. cámara dentro de la caja) no se pisa con uno viejo
+            if entry is not None and frame >= entry['result_frame']:
+                entry['visible'] = query.samples > 0
+                entry['result_frame'] = frame
+            self._free_queries.append(query)
+        self.stats = {"occlusion_tests": 0, "occluded": 0}
+
+    def is_visible(self, obj):
+        """False solo si la prueba leída del frame anterior dijo que estaba tapado."""
+        entry = self._entries.get(obj)
+        if entry is None or entry['result_frame'] < self.frame - self.LATENCY or entry['visible']:
+            return True
+        self.stats["occluded"] += 1
+        return False
+
+    def _box(self, obj):
+        box = obj.world_aabb()
+        if not box:
+            return None
+        m = glm.vec3(self.margin)
+        return glm.vec3(*box[0]) - m, glm.vec3(*box[1]) + m
+
+    def test(self, objs, camera):
+        """Emite las queries de 'objs' contra el depth buffer actual (después de la pasada opaca)."""
+        fbo = self.ctx.fbo
+        color_mask, depth_mask = fbo.color_mask, fbo.depth_mask
+        fbo.color_mask = (False, False, False, False)
+        fbo.depth_mask = False
+        # El plano near recorta la caja si la cámara está dentro o casi: entonces es visible
+        near = glm.vec3(0.1)
+        self._issued = {}
+        for obj in objs:
+            box = self._box(obj)
+            entry = self._entries.setdefault(obj, {'visible': True, 'result_frame': -1, 'tested_frame': -1})
+            entry['tested_frame'] = self.frame
+            if box is None or (glm.all(glm.greaterThanEqual(camera.position, box[0] - near))
+                               and glm.all(glm.lessThanEqual(camera.position, box[1] + near))):
+                entry['visible'], entry['result_frame'] = True, self.frame
+                self._issued[obj] = None
+                continue
+            set_uniform(self.program, 'box_min', tuple(box[0]))
+            set_uniform(self.program, 'box_max', tuple(box[1]))
+            query = self._free_queries.pop() if self._free_queries else self.ctx.query(samples=True)
+            with query:
+                self.vao.render()
+            self._pending.append((self.frame, obj, query))
+            self._issued[obj] = query
+            self.stats["occlusion_tests"] += 1
+        fbo.color_mask, fbo.depth_mask = color_mask, depth_mask
+        stale = self.frame - self.FORGET_FRAMES
+        if stale > 0:
+            for obj in [o for o, e in self._entries.items() if e['tested_frame'] < stale]:
+                del self._entries[obj]
+        self.frame += 1
+
+    def render_hidden(self, objs, draw):
+        """
+        Llama draw(obj) para los objetos tapados según el frame anterior, cada uno dentro
+        del render condicional de la query que test() acaba de emitir para su caja.
+        Sin query (cámara dentro de la caja) se dibuja directamente.
+        """
+        for obj in objs:
+            query = self._issued.get(obj)
+            if query is None:
+                draw(obj)
+                continue
+            with query.crender:
+                draw(obj)
+
+    def release(self):
+        self.vao.release()
+        self.vbo.release()
+        self.ibo.release()
+        release_program(self.program)
+        self._entries.clear()
+        self._pending.clear()
+        self._issued.clear()
+
+
+register_shader_variant(
+    'occlusion_box',
+    vertex_shader='''
+        #version 330
+        layout (location = 0) in vec3 in_position;
+        uniform vec3 box_min;
+        uniform vec3 box_max;
+        layout (std140) uniform Camera {
+            mat4 m_proj;
+            mat4 m_view;
+        };
+        void main() {
+            gl_Position = m_proj * m_view * vec4(mix(box_min, box_max, in_position), 1.0);
+        }
+    ''',
+    fragment_shader='''
+        #version 330
+        out vec4 fragColor;
+        void main() {
+            fragColor = vec4(1.0);
+        }
+    '''
+)
@@ -0,0 +1,211 @@
+from collections import deque
+import numpy as np
+import moderngl as mgl
+from src.objects.base_object import register_shader_variant, acquire_program, release_program, set_uniform
+
+
+class PickResult:
+    """Objeto (y copia, en lotes instanciados) bajo un píxel."""
+
+    def __init__(self, obj, instance=0):
+        self.obj = obj
+        self.instance = instance
+
+    @property
+    def label(self):
+        return self.obj.pick_label(self.instance)
+
+    def aabb(self):
+        return self.obj.instance_aabb(self.instance)
+
+    def __eq__(self, other):
+        return isinstance(other, PickResult) and other.obj is self.obj and other.instance == self.instance
+
+    def __repr__(self):
+        return f"PickResult({self.label})"
+
+
+class Picker:
+    """
+    Picking por ID buffer con lectura asíncrona:
+    - request(pos, tag) pide el objeto bajo un píxel (p. ej. 'hover', 'context').
+    - render() dibuja, solo en ese píxel (scissor 1x1), los IDs de objeto e instancia en
+      un framebuffer entero (RG32UI) y copia el píxel a un pixel buffer (PBO).
+    - resolve(), al frame siguiente, lee el PBO (la GPU ya terminó: no hay espera) y
+      devuelve (tag, PickResult | None, pos) de cada petición.
+    El coste no depende del número de productos más allá de sus vértices: un lote
+    instanciado es un draw y gl_InstanceID da la copia.
+    """
+
+    def __init__(self, ctx, win_size):
+        self.ctx = ctx
+        self.win_size = tuple(win_size)
+        self.ids = ctx.texture(self.win_size, 2, dtype='u4')
+        self.ids.filter = (mgl.NEAREST, mgl.NEAREST)
+        self.depth = ctx.depth_renderbuffer(self.win_size)
+        self.fbo = ctx.framebuffer(color_attachments=[self.ids], depth_attachment=self.depth)
+        self.programs = {v: acquire_program(ctx, v) for v in ('pick', 'pick_instanced')}
+        self._requests = {}        # tag -> pos (la última petición de cada tag gana)
+        self._in_flight = deque()  # (tag, pos, pbo, objetos)
+        self._free_pbos = []
+
+    def request(self, pos, tag="pick"):
+        self._requests[tag] = (int(pos[0]), int(pos[1]))
+
+    def has_requests(self):
+        return bool(self._requests)
+
+    def render(self, objects):
+        """Pasada de IDs para cada petición pendiente (tras el render normal: LOD y matrices al día)."""
+        if not self._requests:
+            return
+        previous = self.ctx.fbo
+        self.fbo.use()
+        w, h = self.win_size
+        for tag, (x, y) in self._requests.items():
+            if not (0 <= x < w and 0 <= y < h):
+                self._in_flight.append((tag, (x, y), None, objects))
+                continue
+            viewport = (x, h - 1 - y, 1, 1)   # pantalla (arriba-izquierda) -> GL (abajo-izquierda)
+            self.fbo.scissor = viewport
+            self.fbo.clear(0.0, 0.0, 0.0, 0.0, depth=1.0, viewport=viewport)
+            for index, obj in enumerate(objects):
+                program = self.programs[obj.pick_variant]
+                set_uniform(program, 'object_id', index + 1)   # 0 = nada
+                if 'm_model' in program:
+                    set_uniform(program, 'm_model', obj.get_model_matrix())
+                obj.draw(obj.pick_vao(program))
+            pbo = self._free_pbos.pop() if self._free_pbos else self.ctx.buffer(reserve=8)
+            self.fbo.read_into(pbo, viewport=viewport, components=2, dtype='u4')
+            self._in_flight.append((tag, (x, y), pbo, objects))
+        self.fbo.scissor = None
+        self._requests.clear()
+        previous.use()
+
+    def resolve(self):
+        """Resultados de las peticiones renderizadas en el frame anterior."""
+        results = []
+        while self._in_flight:
+            tag, pos, pbo, objects = self._in_flight.popleft()
+            result = None
+            if pbo is not None:
+                object_id, instance = np.frombuffer(pbo.read(), dtype='u4')
+                self._free_pbos.append(pbo)
+                if 0 < object_id <= len(objects):
+                    result = PickResult(objects[object_id - 1], int(instance))
+            results.append((tag, result, pos))
+        return results
+
+    def release(self):
+        for pbo in self._free_pbos + [entry[2] for entry in self._in_flight if entry[2] is not None]:
+            pbo.release()
+        self._free_pbos.clear()
+        self._in_flight.clear()
+        self.fbo.release()
+        self.ids.release()
+        self.depth.release()
+        for program in self.programs.values():
+            release_program(program)
+
+
+class HighlightBox:
+    """Contorno (12 aristas) de un AABB en mundo: resaltado del objeto bajo el cursor."""
+
+    def __init__(self, ctx, color=(1.0, 0.85, 0.2)):
+        self.ctx = ctx
+        self.program = acquire_program(ctx, 'highlight_box')
+        set_uniform(self.program, 'color', color)
+        corners = np.array([(x, y, z) for x in (0, 1) for y in (0, 1) for z in (0, 1)], dtype='f4')
+        # Aristas entre esquinas que difieren en un solo eje (índice = x*4 + y*2 + z)
+        edges = np.array([(a, a | bit) for a in range(8) for bit in (1, 2, 4) if not a & bit], dtype='u4')
+        self.vbo = ctx.buffer(corners.tobytes())
+        self.ibo = ctx.buffer(edges.tobytes())
+        self.vao = ctx.vertex_array(self.program, [(self.vbo, '3f', 'in_position')],
+                                    index_buffer=self.ibo, index_element_size=4)
+
+    def render(self, box, margin=0.005):
+        if not box:
+            return
+        set_uniform(self.program, 'box_min', tuple(v - margin for v in box[0]))
+        set_uniform(self.program, 'box_max', tuple(v + margin for v in box[1]))
+        self.vao.render(mgl.LINES)
+
+    def release(self):
+        self.vao.release()
+        self.vbo.release()
+        self.ibo.release()
+        release_program(self.program)
+
+
+_PICK_FRAGMENT = '''
+    #version 330
+    uniform uint object_id;
+    flat in uint v_instance;
+    out uvec2 fragId;
+    void main() {
+        fragId = uvec2(object_id, v_instance);
+    }
+'''
+
+register_shader_variant(
+    'pick',
+    vertex_shader='''
+        #version 330
+        layout (location = 0) in vec3 in_position;
+        uniform mat4 m_model;
+        layout (std140) uniform Camera {
+            mat4 m_proj;
+            mat4 m_view;
+        };
+        flat out uint v_instance;
+        void main() {
+            v_instance = 0u;
+            gl_Position = m_proj * m_view * m_model * vec4(in_position, 1.0);
+        }
+    ''',
+    fragment_shader=_PICK_FRAGMENT
+)
+
+register_shader_variant(
+    'pick_instanced',
+    vertex_shader='''
+        #version 330
+        layout (location = 0) in vec3 in_position;
+        in mat4 in_model;
+        layout (std140) uniform Camera {
+            mat4 m_proj;
+            mat4 m_view;
+        };
+        flat out uint v_instance;
+        void main() {
+            v_instance = uint(gl_InstanceID);
+            gl_Position = m_proj * m_view * in_model * vec4(in_position, 1.0);
+        }
+    ''',
+    fragment_shader=_PICK_FRAGMENT
+)
+
+register_shader_variant(
+    'highlight_box',
+    vertex_shader='''
+        #version 330
+        layout (location = 0) in vec3 in_position;
+        uniform vec3 box_min;
+        uniform vec3 box_max;
+        layout (std140) uniform Camera {
+            mat4 m_proj;
+            mat4 m_view;
+        };
+        void main() {
+            gl_Position = m_proj * m_view * vec4(mix(box_min, box_max, in_position), 1.0);
+        }
+    ''',
+    fragment_shader='''
+        #version 330
+        uniform vec3 color;
+        out vec4 fragColor;
+        void main() {
+            fragColor = vec4(color, 1.0);
+        }
+    '''
+)
@@ -0,0 +1,139 @@
+import numpy as np
+from src.scene.picking import PickResult
+from src.utils.bvh import BVH
+from src.utils.geometry import ray_vs_aabbs, ray_vs_triangles, safe_inverse
+
+_MESH_ACCEL = {}  # clave de ray_geometry() (ruta del OBJ) -> MeshAccel compartida
+
+
+class RayHit(PickResult):
+    """Impacto de un rayo: objeto, copia (lotes instanciados), distancia y punto en mundo."""
+
+    def __init__(self, obj, instance, distance, point):
+        super().__init__(obj, instance)
+        self.distance = distance
+        self.point = point
+
+    def __repr__(self):
+        return f"RayHit({self.label}, {self.distance:.3f})"
+
+
+class MeshAccel:
+    """Triángulos de una malla en espacio local (v0 y aristas) con un BVH sobre sus cajas."""
+    LEAF_SIZE = 16
+
+    def __init__(self, positions, tri_idx):
+        tris = np.asarray(positions, dtype=np.float64)[np.asarray(tri_idx, dtype=np.int64)]
+        self.v0 = tris[:, 0]
+        self.e1 = tris[:, 1] - self.v0
+        self.e2 = tris[:, 2] - self.v0
+        self.bounds = (tris.reshape(-1, 3).min(axis=0), tris.reshape(-1, 3).max(axis=0))
+        self.bvh = BVH(tris.min(axis=1), tris.max(axis=1), leaf_size=self.LEAF_SIZE)
+
+    def __len__(self):
+        return len(self.v0)
+
+    def intersect(self, origin, direction, max_t=np.inf):
+        """(t, índice de triángulo) del corte más cercano con t <= max_t, o None."""
+        cand, _ = self.bvh.query_ray(origin, direction, max_t)
+        if not len(cand):
+            return None
+        t = ray_vs_triangles(origin, direction, self.v0[cand], self.e1[cand], self.e2[cand])
+        best = int(np.argmin(t))
+        if not np.isfinite(t[best]) or t[best] > max_t:
+            return None
+        return float(t[best]), int(cand[best])
+
+
+class SceneRaycaster:
+    """
+    Raycast en CPU (sin GL: funciona en headless y en tests):
+    1) BVH de los AABB en mundo de los objetos -> candidatos por distancia de entrada.
+    2) Por candidato, slab test contra el AABB de cada copia (lotes instanciados).
+    3) Möller–Trumbore vectorizado contra los triángulos de la malla (_TRI_CACHE) en
+       espacio local: el rayo se lleva al objeto con la inversa de su matriz y t no cambia.
+    Se para en cuanto la siguiente caja empieza más lejos que el mejor impacto.
+    """
+
+    def __init__(self):
+        self._objects = []
+        self._versions = []
+        self._indexed = []
+        self._bvh = None
+        self._instances = {}   # id(obj) -> (transform_version, inversas (K,4,4), mins, maxs)
+
+    def _refresh(self, objects):
+        """Reconstruye el BVH si cambió la lista de objetos o la 'transform_version' de alguno."""
+        versions = [obj.transform_version for obj in objects]
+        if self._bvh is not None and self._objects == objects and versions == self._versions:
+            return
+        boxes = [(obj, obj.world_aabb()) for obj in objects]
+        boxes = [(obj, box) for obj, box in boxes if box]   # sin AABB no hay geometría que cortar
+        self._objects = list(objects)
+        self._versions = versions
+        self._indexed = [obj for obj, _ in boxes]
+        self._bvh = BVH(np.array([box[0] for _, box in boxes]).reshape(-1, 3),
+                        np.array([box[1] for _, box in boxes]).reshape(-1, 3))
+        self._instances.clear()
+
+    @staticmethod
+    def _accel(obj):
+        """Estructura de aceleración de la malla del objeto (compartida por clave si la hay)."""
+        accel = getattr(obj, "_ray_accel", None)
+        if accel is not None:
+            return accel
+        key, positions, tri_idx = obj.ray_geometry()
+        if key is None:
+            accel = obj._ray_accel = MeshAccel(positions, tri_idx)
+        else:
+            accel = _MESH_ACCEL.get(key)
+            if accel is None:
+                accel = _MESH_ACCEL[key] = MeshAccel(positions, tri_idx)
+        return accel
+
+    def _instance_data(self, obj, accel):
+        """Inversas de las matrices de cada copia y sus AABB en mundo (cacheado por versión)."""
+        entry = self._instances.get(id(obj))
+        if entry is None or entry[0] != obj.transform_version:
+            matrices = obj.instance_matrices().astype(np.float64)
+            (x0, y0, z0), (x1, y1, z1) = accel.bounds
+            corners = np.array([[x, y, z, 1.0] for x in (x0, x1) for y in (y0, y1) for z in (z0, z1)])
+            world = (corners @ matrices)[:, :, :3]
+            entry = (obj.transform_version, np.linalg.inv(matrices), world.min(axis=1), world.max(axis=1))
+            self._instances[id(obj)] = entry
+        return entry[1:]
+
+    def raycast(self, objects, origin, direction, max_dist=np.inf):
+        """Impacto más cercano del rayo contra 'objects' (RayHit) o None."""
+        origin = np.asarray(origin, dtype=np.float64)
+        direction = np.asarray(direction, dtype=np.float64)
+        length = np.linalg.norm(direction)
+        if length < 1e-12:
+            return None
+        direction = direction / length   # t = distancia en unidades de mundo
+        self._refresh(objects)
+        inv_dir = safe_inverse(direction)
+        origin_h, direction_h = np.append(origin, 1.0), np.append(direction, 0.0)
+        best, best_t = None, max_dist
+        cand, near = self._bvh.query_ray(origin, direction, max_dist)
+        for index, t_near in zip(cand, near):
+            if t_near > best_t:
+                break
+            obj = self._indexed[index]
+            accel = self._accel(obj)
+            if not len(accel):
+                continue
+            inverses, mins, maxs = self._instance_data(obj, accel)
+            hit, inst_near = ray_vs_aabbs(origin, inv_dir, mins, maxs, best_t)
+            copies = np.flatnonzero(hit)
+            for k in copies[np.argsort(inst_near[copies], kind='stable')]:
+                if inst_near[k] > best_t:
+                    break
+                # Punto y dirección fila @ inversa: el rayo en espacio local de la copia
+                result = accel.intersect((origin_h @ inverses[k])[:3], (direction_h @ inverses[k])[:3], best_t)
+                if result is not None:
+                    best_t, best = result[0], (obj, int(k))
+        if best is None:
+            return None
+        point = origin + direction * best_t
+        return RayHit(best[0], best[1], best_t, tuple(map(float, point)))
@@ -0,0 +1,59 @@
+from src.objects.base_object import set_uniform
+
+
+class RenderQueue:
+    """
+    Cola de dibujo por frame:
+    - submit() recoge los objetos visibles (y hace su preparación: buffers de instancias...).
+    - flush() los ordena por programa -> textura -> VAO y solo cambia el estado compartido
+      (sampler, bind de textura) cuando difiere del anterior; luego uniforms propios y draw.
+    - stats cuenta draws y cambios de estado del último flush.
+    moderngl activa programa y VAO dentro de vao.render(): los cambios de programa/VAO se
+    cuentan como cambios lógicos; lo que se ahorra de verdad son binds de textura y
+    escrituras de uniforms (set_uniform solo escribe si el valor del programa cambia).
+    """
+
+    def __init__(self):
+        self._items = []
+        self.stats = {"draws": 0, "program_binds": 0, "texture_binds": 0, "vao_binds": 0}
+
+    def __len__(self):
+        return len(self._items)
+
+    def submit(self, obj):
+        obj.prepare()
+        program, texture, vao = obj.draw_state()
+        if vao is None:
+            return
+        # id() agrupa por identidad; el orden entre grupos da igual (todo es opaco)
+        self._items.append(((id(program), id(texture), id(vao)), obj))
+
+    def flush(self):
+        """Dibuja lo encolado en orden de estado y vacía la cola."""
+        stats = {"draws": 0, "program_binds": 0, "texture_binds": 0, "vao_binds": 0}
+        # El estado GL no sobrevive entre frames (GUI, otras pasadas): se parte de cero
+        program = texture = vao = None
+        self._items.sort(key=lambda item: item[0])
+        for _, obj in self._items:
+            obj_program, obj_texture, obj_vao = obj.draw_state()
+            if obj_program is not program:
+                program = obj_program
+                if "tex0" in program:
+                    set_uniform(program, "tex0", 0)
+                stats["program_binds"] += 1
+            # La unidad 0 es estado global: la textura sigue ligada aunque cambie el programa
+            if obj_texture is not texture:
+                texture = obj_texture
+                if texture is not None:
+                    obj.bind_texture()
+                    stats["texture_binds"] += 1
+            if obj_vao is not vao:
+                vao = obj_vao
+                stats["vao_binds"] += 1
+            obj.update_matrices()
+            obj.bind_object()
+            obj.draw()
+            stats["draws"] += 1
+        self._items.clear()
+        self.stats = stats
+        return stats
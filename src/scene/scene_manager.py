@@ -1,18 +1,38 @@
 import glm
 import math
+import os
+import sqlite3
+import numpy as np
 from src.objects.floor import Floor
 from src.objects.wall import Wall
-from src.objects.model_obj import ModelOBJ
+from src.core.texture_manager import get_texture_manager, decode_texture
+from src.core.texture_array import get_product_texture_array, decode_layer
+from src.objects.model_obj import ModelOBJ, load_geometry, store_geometry, is_geometry_loaded
+from src.objects.product import ProductBatch
+from src.objects.static_batch import StaticBatch
 from src.placement.shelf_space import ShelfSpace
 from src.placement.placer import pack_grid_on_shelf
+from src.scene.asset_loader import AssetLoader
+from src.scene.render_queue import RenderQueue
+from src.scene.occlusion import OcclusionCuller
+from src.scene.picking import Picker, HighlightBox
+from src.scene.raycast import SceneRaycaster
+from src.utils.bvh import BVH
+from src.utils.geometry import frustum_planes
+from src.catalog.store import get_catalog, prepare_catalog
+from src.utils.config import OCCLUSION_CULLING, CATALOG_SCENE_PRODUCTS
 
 
 class SceneManager:
-    def __init__(self, app):
+    # Tiempo por frame (s) para subir a GPU lo que terminó de cargarse en segundo plano
+    LOAD_BUDGET_S = 0.004
+
+    def __init__(self, app, async_loading=True):
         self.app = app
         self.objects = []
         self.current_scene = "main"
-        self._prototype_cache = {}  # (obj_path, tex_path, target_longest)
+        self._prototype_cache = {}  # (obj_path, target_longest) -> ModelOBJ sin textura
+        self._product_batches = {}  # (obj_path, target_longest, shelf_label, textured) -> ProductBatch
         
         # Grupos de objetos por escena
         self.scene_objects = {
@@ -23,7 +43,37 @@ class SceneManager:
         }
         
         self.shelf_spaces = []
+
+        # Culling: BVH de AABBs en mundo + contadores del último frame
+        self._spatial_index = None
+        self._indexed_objects = []
+        self._indexed_versions = []
+        self.render_queue = RenderQueue()
+        self.occlusion = OcclusionCuller(app.ctx) if OCCLUSION_CULLING else None
+
+        # Picking por ID buffer: resultados un frame después vía on_pick(tag, PickResult | None, pos)
+        self.picker = Picker(app.ctx, app.WIN_SIZE)
+        self.highlight = HighlightBox(app.ctx)
+        self.hovered = None
+        self.on_pick = None
+        self.raycaster = SceneRaycaster()
+        self.render_stats = {"drawn": 0, "culled": 0, "occluded": 0}
+
+        # Static batching: objetos 'static' fundidos por material (se rehace si cambia el layout)
+        self._static_batches = []
+        self._static_singles = []
+        self._static_signature = None
+        self._drawables = []
+        self._drawables_count = None
+
+        # Carga en segundo plano: la escena se va poblando a medida que llegan los assets
+        self.loader = AssetLoader(synchronous=not async_loading)
+        self.textures = get_texture_manager(app.ctx)
+        self._scene_ready_reported = False
+
         self.setup_scene()
+        if not async_loading:
+            self.finish_loading()
     
     def set_scene(self, scene_name):
         """
@@ -64,23 +114,223 @@ class SceneManager:
         print("  ↳ Vista configuración")
 
     
+    # ---------- Carga progresiva ----------
+
+    def update(self, budget_s=None):
+        """
+        Llamar una vez por frame desde el hilo GL: sube a GPU los assets ya decodificados
+        y crea sus objetos, sin pasar de 'budget_s' segundos (LOAD_BUDGET_S por defecto).
+        También avanza el streaming de texturas con lo que pidió el último render.
+        """
+        self.textures.update()
+        if self.loader.is_idle():
+            return
+        self.loader.pump(self.LOAD_BUDGET_S if budget_s is None else budget_s)
+        if self.loader.is_idle():
+            self._report_scene_ready()
+
+    def finish_loading(self):
+        """Bloquea hasta terminar de construir la escena (modo headless, scripts)."""
+        self.loader.wait_all()
+        self._report_scene_ready()
+
+    def is_loading(self):
+        return not self.loader.is_idle()
+
+    def _load_assets(self, textures=(), models=(), on_ready=None, label="assets", product_textures=()):
+        """
+        Decodifica texturas y parsea OBJ en el pool; en el hilo GL sube las texturas
+        (las de 'product_textures' como capas del texture array de productos),
+        registra las mallas en la caché CPU y llama on_ready(). Lo ya cargado se omite.
+        """
+        array = get_product_texture_array(self.app.ctx)
+        textures = [p for p in dict.fromkeys(textures) if not self.textures.is_loaded(p)]
+        layers = [p for p in dict.fromkeys(product_textures) if not array.has_layer(p)]
+        models = [p for p in dict.fromkeys(models) if not is_geometry_loaded(p)]
+        jobs = ([(decode_texture, (p,)) for p in textures] + [(decode_layer, (p, array.side)) for p in layers]
+                + [(load_geometry, (p,)) for p in models])
+        n_tex, n_img = len(textures), len(textures) + len(layers)
+
+        def ready(results):
+            # Una subida por paso: el presupuesto por frame puede cortar entre texturas
+            for path, decoded in zip(textures, results[:n_tex]):
+                self.loader.defer(lambda p=path, d=decoded: self.textures.register(p, d),
+                                  label=f"textura {path}")
+            for path, data in zip(layers, results[n_tex:n_img]):
+                self.loader.defer(lambda p=path, d=data: array.add(p, d), label=f"capa {path}")
+            for path, mesh in zip(models, results[n_img:]):
+                store_geometry(path, mesh)
+            if on_ready is not None:
+                self.loader.defer(on_ready, label=label)
+
+        self.loader.submit_group(jobs, ready, label=label)
+
+    def _add_objects(self, objs, scene="main", static=False):
+        for obj in objs:
+            obj.static = static
+        self.objects.extend(objs)
+        self.scene_objects[scene].extend(objs)
+
+    def _report_scene_ready(self):
+        if self._scene_ready_reported:
+            return
+        self._scene_ready_reported = True
+        n_instances = sum(b.instance_count() for b in self._product_batches.values())
+        print(f"✅ Escena construida: {len(self.objects)} objetos totales ({n_instances} productos instanciados)")
+        print(f"   └─ Objetos principales: {len(self.scene_objects['main'])}")
+
     def get_current_scene(self):
         """Retorna la escena actual"""
         return self.current_scene
     
     def render(self):
-        """Renderiza todos los objetos de la escena"""
-        for obj in self.objects:
-            obj.update_matrices()
-            obj.render()
+        """Renderiza los objetos de la escena que caen dentro del frustum de la cámara"""
+        # Cámara: una subida de UBO por frame (y solo si se movió)
+        self.app.camera.bind_uniform_block()
+        self._dispatch_picks()
+        visible = self._visible_objects()
+        cam = self.app.camera
+        occlusion = self.occlusion
+        if occlusion is not None:
+            occlusion.begin_frame()
+        drawn, hidden = [], []
+        for obj in visible:
+            # Tapado según las queries del frame anterior: fuera de la pasada normal
+            if occlusion is not None and obj.occludee and not occlusion.is_visible(obj):
+                hidden.append(obj)
+                continue
+            obj.select_lod(cam)
+            obj.request_texture_detail(cam)
+            self.render_queue.submit(obj)
+            drawn.append(obj)
+        # Orden programa -> textura -> VAO: solo se cambia el estado que difiere
+        self.render_stats.update(self.render_queue.flush())
+        if occlusion is not None:
+            # Cajas de los candidatos contra la profundidad ya escrita (se leen el frame siguiente)
+            occlusion.test([obj for obj in visible if obj.occludee], cam)
+            # Los tapados, condicionados a su caja de este frame: si reaparecen, ya se ven
+            occlusion.render_hidden(hidden, lambda obj: self._draw_now(obj, cam))
+            self.render_stats.update(occlusion.stats)
+        if self.hovered is not None:
+            self.highlight.render(self.hovered.aabb())
+        if self.picker.has_requests():
+            self.picker.render(self._pick_targets(drawn))
+        self.render_stats["drawn"] = len(drawn)
+        self.render_stats["culled"] = len(self._drawables) - len(visible)
+
+    def _draw_now(self, obj, cam):
+        obj.select_lod(cam)
+        self.render_queue.submit(obj)
+        self.render_queue.flush()
+
+    # ---------- Picking ----------
+
+    def request_pick(self, pos, tag="pick"):
+        """Pide el objeto bajo 'pos' (píxeles de ventana); llega a on_pick en el próximo frame."""
+        self.picker.request(pos, tag)
+
+    def _pick_targets(self, drawn):
+        # Los lotes estáticos se deshacen en sus piezas: se elige la estantería, no el lote
+        targets = []
+        for obj in drawn:
+            targets.extend(obj.sources if isinstance(obj, StaticBatch) else (obj,))
+        return targets
+
+    def _dispatch_picks(self):
+        for tag, result, pos in self.picker.resolve():
+            if tag == "hover":
+                self.hovered = result
+            if self.on_pick is not None:
+                self.on_pick(tag, result, pos)
+
+    # ---------- Raycast (CPU) ----------
+
+    def raycast(self, origin, direction, max_distance=np.inf):
+        """
+        Primer objeto que corta el rayo origin + t * direction (en mundo), sin GPU.
+        Devuelve un RayHit (obj, instance, distance, point) o None. Pensado para consultas
+        masivas (mirada, hover en analítica): el BVH solo se rehace si algo se mueve.
+        """
+        return self.raycaster.raycast(self.objects, origin, direction, max_distance)
+
+    # ---------- Static batching ----------
+
+    def _refresh_static_batches(self):
+        """
+        Agrupa los objetos 'static' por material y hornea cada grupo (2+ piezas) en un
+        StaticBatch. Solo se rehace si cambian los objetos estáticos o su transformación.
+        Devuelve la lista de lo que se dibuja: lotes estáticos, estáticos sueltos y dinámicos.
+        """
+        statics = [obj for obj in self.objects if obj.static]
+        signature = [(id(obj), obj.transform_version) for obj in statics]
+        if signature != self._static_signature:
+            for batch in self._static_batches:
+                batch.destroy()
+            groups = {}
+            for obj in statics:
+                groups.setdefault(obj.material_key(), []).append(obj)
+            self._static_batches = [StaticBatch(self.app, objs) for objs in groups.values() if len(objs) > 1]
+            self._static_singles = [objs[0] for objs in groups.values() if len(objs) == 1]
+            self._static_signature = signature
+            self._drawables_count = None
+            print(f"[StaticBatch] {len(statics)} objetos estáticos -> "
+                  f"{len(self._static_batches) + len(self._static_singles)} draw calls")
+        if self._drawables_count != len(self.objects):
+            self._drawables = (self._static_batches + self._static_singles
+                               + [obj for obj in self.objects if not obj.static])
+            self._drawables_count = len(self.objects)
+        return self._drawables
+
+    # ---------- Culling ----------
+
+    def invalidate_spatial_index(self):
+        """Fuerza a reconstruir el BVH (objetos añadidos/movidos)."""
+        self._spatial_index = None
+
+    def _refresh_spatial_index(self):
+        """Reconstruye el BVH si cambió la lista de objetos o la 'transform_version' de alguno."""
+        drawables = self._refresh_static_batches()
+        versions = [obj.transform_version for obj in drawables]
+        if (self._spatial_index is not None and self._indexed_objects == drawables
+                and versions == self._indexed_versions):
+            return
+        big = 1e30  # objetos sin AABB conocido: nunca se descartan
+        mins, maxs = [], []
+        for obj in drawables:
+            box = obj.world_aabb()
+            mins.append(box[0] if box else (-big, -big, -big))
+            maxs.append(box[1] if box else (big, big, big))
+        self._indexed_objects = list(drawables)
+        self._indexed_versions = versions
+        self._spatial_index = BVH(np.array(mins).reshape(-1, 3), np.array(maxs).reshape(-1, 3))
+
+    def _visible_objects(self):
+        """Objetos (en orden de inserción) cuyo AABB interseca el frustum actual."""
+        self._refresh_spatial_index()
+        cam = self.app.camera
+        planes = frustum_planes(cam.m_proj * cam.m_view)
+        return [self._indexed_objects[i] for i in self._spatial_index.query_frustum(planes)]
 
     def cleanup(self):
         """Libera recursos de todos los objetos"""
+        # Cancelar cargas pendientes antes de liberar (sus callbacks ya no se ejecutan)
+        self.loader.shutdown()
+        if self.occlusion is not None:
+            self.occlusion.release()
+            self.occlusion = None
+        self.picker.release()
+        self.highlight.release()
+        self.hovered = None
+        for batch in self._static_batches:
+            batch.destroy()
+        self._static_batches = []
+        self._static_signature = None
         for obj in self.objects:
             try:
                 obj.destroy()
             except Exception as e:
                 print(f"Error liberando objeto {obj}: {e}")
+        self._product_batches.clear()
 
         # Liberar prototipos (si existen)
         for prot in self._prototype_cache.values():
@@ -112,7 +362,14 @@ class SceneManager:
         Crea ShelfSpace para cada ModelOBJ. Mantiene firma compatible.
         'models' es una lista de objetos ModelOBJ ya posicionados.
         """
-        self.shelf_spaces = []
+        self.shelf_spaces = self._build_shelf_spaces(
+            models, levels, margin_xy, back_offset, y_bin, board_merge, per_level_shrink, debug)
+
+    @staticmethod
+    def _build_shelf_spaces(models, levels, margin_xy, back_offset, y_bin, board_merge,
+                            per_level_shrink, debug):
+        """Detección de baldas (solo CPU, sin GL): apta para ejecutarse en el AssetLoader."""
+        spaces = []
         for idx, m in enumerate(models):
             label = f"shelf{idx}"
             sp = ShelfSpace(
@@ -126,7 +383,8 @@ class SceneManager:
                 label=label,
                 debug=debug,
             )
-            self.shelf_spaces.append(sp)
+            spaces.append(sp)
+        return spaces
 
     def _fill_shelf_with_model(
         self,
@@ -140,17 +398,20 @@ class SceneManager:
     ):
         """
         Rellena cada balda con copias de un modelo.
-        Usa un 'prototipo' cacheado para no recargar geometría/VAO/textura.
+        Usa un 'prototipo' cacheado para no recargar geometría/VAO y un ProductBatch
+        por modelo y estantería: todas las copias salen en un único draw instanciado,
+        aunque lleven texturas distintas (capas del texture array de productos).
+        Devuelve los índices de instancia añadidos al lote.
         """
         
-        # --- prototipo cacheado ---
-        key = (obj_path, tex_path, float(target_longest))
+        # --- prototipo cacheado (solo geometría y escala: la textura va por instancia) ---
+        key = (obj_path, float(target_longest))
         proto = self._prototype_cache.get(key)
         if proto is None:
             proto = ModelOBJ(
                 self.app,
                 obj_path,
-                tex_path,
+                None,
                 position=(0, 0, 0),
                 scale=(1, 1, 1),
                 rotation_deg=(0, 0, 0),
@@ -173,6 +434,18 @@ class SceneManager:
             f"min_y_local={min_y_local:.3f} gap={gap:.3f} y_clearance={y_clearance:.3f}"
         )
 
+        # --- lote instanciado (uno por prototipo y estantería) ---
+        # Sin textura el lote usa la variante de color: nunca la capa de otro producto
+        textured = bool(tex_path)
+        batch_key = key + (shelf_space.label, textured)
+        batch = self._product_batches.get(batch_key)
+        if batch is None:
+            batch = ProductBatch(self.app, proto, label=f"{shelf_space.label}:{obj_path}", textured=textured)
+            self._product_batches[batch_key] = batch
+            self.objects.append(batch)
+            # ✅ Añadir a objetos de escena "main" (productos en estantería)
+            self.scene_objects["main"].append(batch)
+
         spawned = []
 
         for i, lvl in enumerate(shelf_space.get_levels()):
@@ -211,30 +484,70 @@ class SceneManager:
                 max_items=max_items_per_level,
             )
 
-            for (x, y_level, z) in poses:
-                item = proto.clone()
-                y_item = y_level - (min_y_local * item._scale.y) + y_clearance
-                item.set_position((x, y_item, z))
-                spawned.append(item)
-                self.objects.append(item)
-                # ✅ Añadir a objetos de escena "main" (productos en estantería)
-                self.scene_objects["main"].append(item)
+            y_offset = -(min_y_local * proto._scale.y) + y_clearance
+            spawned += batch.add_instances([(x, y_level + y_offset, z) for (x, y_level, z) in poses],
+                                           texture_path=tex_path)
 
+        print(f"[Fill] {batch.label}: {batch.instance_count()} instancias en 1 draw call")
         return spawned
 
     def setup_scene(self):
-        """Configura la escena inicial de la tienda"""
+        """
+        Configura la escena inicial de la tienda.
+        Lanza la carga de assets en segundo plano y devuelve enseguida: suelo, paredes,
+        estanterías y productos aparecen (en ese orden aprox.) a medida que update()
+        sube lo que ya está listo.
+        """
         print("🏗️ Construyendo escena de la tienda 3D...")
         
         # Rutas (ajústalas a tu repo)
         floor_tex = "assets/textures/floor_diffuse.png"
         wall_tex  = "assets/textures/wall_diffuse.png"
+        shelf_model = "assets/models/shelf01.obj"
+        shelf_tex   = "assets/textures/shelf01_diffuse.jpg"
+
+        self._load_assets(textures=[floor_tex], on_ready=lambda: self._build_floor(floor_tex), label="suelo")
+        self._load_assets(textures=[wall_tex], on_ready=lambda: self._build_walls(wall_tex), label="paredes")
+        # Si el CSV del catálogo cambió, la base se regenera en el pool (no en el hilo principal)
+        self.loader.submit(self._prepare_catalog, on_ready=lambda _: self._load_shelves(shelf_model, shelf_tex),
+                           label="catálogo")
+
+    @staticmethod
+    def _prepare_catalog():
+        """prepare_catalog para el pool: si falla, las estanterías se montan igual."""
+        try:
+            return prepare_catalog()
+        except (ValueError, OSError, sqlite3.Error):
+            return None   # get_catalog() lo avisa y abre la base anterior si la hay
 
+    def _load_shelves(self, shelf_model, shelf_tex):
+        # Productos del catálogo que tienen malla: se reparten por las estanterías
+        try:
+            products = get_catalog().placeable(limit=CATALOG_SCENE_PRODUCTS)
+        except (ValueError, OSError, sqlite3.Error) as e:
+            print(f"⚠️ [Catálogo] no disponible ({e}): estanterías sin productos")
+            products = []
+        # Un fallo en el grupo de carga descartaría también las estanterías
+        missing = [p for p in products if not os.path.exists(p["mesh"])
+                   or (p["texture"] and not os.path.exists(p["texture"]))]
+        for p in missing:
+            print(f"⚠️ [Catálogo] {p['sku']}: falta su malla o textura, no se coloca")
+        products = [p for p in products if p not in missing]
+        # Los productos se cargan a la vez que las estanterías; se colocan tras detectar baldas
+        self._load_assets(
+            textures=[shelf_tex],
+            product_textures=[p["texture"] for p in products if p["texture"]],
+            models=[shelf_model] + [p["mesh"] for p in products],
+            on_ready=lambda: self._build_shelves(shelf_model, shelf_tex, products),
+            label="estanterías",
+        )
+
+    def _build_floor(self, floor_tex):
         # ===== SUELO =====
         self.floor = Floor(self.app, texture_path=floor_tex, uv_scale=(4.0, 4.0))
-        self.objects.append(self.floor)
-        self.scene_objects["main"].append(self.floor)
+        self._add_objects([self.floor], static=True)
 
+    def _build_walls(self, wall_tex):
         # ===== PAREDES =====
         self.walls = [
             Wall(
@@ -262,13 +575,10 @@ class SceneManager:
                 uv_scale=(2.0, 1.0),
             ),
         ]
-        self.objects.extend(self.walls)
-        self.scene_objects["main"].extend(self.walls)
+        self._add_objects(self.walls, static=True)
 
+    def _build_shelves(self, shelf_model, shelf_tex, products):
         # ===== ESTANTERÍAS =====
-        shelf_model = "assets/models/shelf01.obj"
-        shelf_tex   = "assets/textures/shelf01_diffuse.jpg"
-
         shelf_left = ModelOBJ(
             self.app, shelf_model, shelf_tex,
             position=(-3.5, 0.0, -3.0),
@@ -289,37 +599,42 @@ class SceneManager:
             sh.set_position((x, 0.0, z))
             sh.align_to_floor()
 
-        self.objects += [shelf_left, shelf_right]
-        self.scene_objects["main"] += [shelf_left, shelf_right]
+        self._add_objects([shelf_left, shelf_right], static=True)
 
-        # ===== ESPACIOS DE ESTANTERÍA =====
+        # ===== ESPACIOS DE ESTANTERÍA (en segundo plano) =====
         print("📐 Detectando baldas en estanterías...")
-        self._register_shelves_from_models(
+        self.loader.submit(
+            self._build_shelf_spaces,
             [shelf_left, shelf_right],
-            levels=5,
-            margin_xy=0.03,
-            back_offset=0.03,
-            y_bin=0.005,
-            board_merge=0.045,
-            per_level_shrink=0.01,
-            debug=True
+            5,      # levels
+            0.03,   # margin_xy
+            0.03,   # back_offset
+            0.005,  # y_bin
+            0.045,  # board_merge
+            0.01,   # per_level_shrink
+            True,   # debug
+            on_ready=lambda spaces: self._fill_shelves(spaces, products),
+            label="baldas",
         )
 
-        # ===== RELLENAR CON PRODUCTOS (MANZANAS) =====
-        apple_model = "assets/models/apple01.obj"
-        apple_tex   = "assets/textures/apple_diffuse.jpg"
+    def _fill_shelves(self, spaces, products):
+        self.shelf_spaces = spaces
+        if not products:
+            print("⚠️ [Catálogo] ningún producto colocable: estanterías vacías")
+            return
 
+        # ===== RELLENAR CON PRODUCTOS DEL CATÁLOGO (uno por estantería, en rotación) =====
         print("🍎 Llenando estanterías con productos...")
-        for shelf_space in self.shelf_spaces:
+        for i, shelf_space in enumerate(self.shelf_spaces):
+            product = products[i % len(products)]
+            print(f"[Fill] {shelf_space.label}: {product['sku']} {product['name']}")
             self._fill_shelf_with_model(
                 shelf_space,
-                obj_path=apple_model,
-                tex_path=apple_tex,
-                target_longest=0.22,
+                obj_path=product["mesh"],
+                tex_path=product["texture"] or None,
+                # El modelo se escala para que su lado mayor mida lo que dice el catálogo
+                target_longest=max(product["width"], product["depth"], product["height"]),
                 gap=0.04,
                 max_items_per_level=None,
                 y_clearance=0.004,
             )
-        
-        print(f"✅ Escena construida: {len(self.objects)} objetos totales")
-        print(f"   └─ Objetos principales: {len(self.scene_objects['main'])}")
\ No newline at end of file
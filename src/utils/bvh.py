@@ -0,0 +1,110 @@
+# src/utils/bvh.py
+import numpy as np
+from src.utils.geometry import aabbs_vs_frustum, ray_vs_aabbs, safe_inverse
+
+
+class BVH:
+    """
+    Jerarquía de volúmenes (AABB) sobre N cajas en mundo, en arrays NumPy.
+    - Construcción top-down partiendo por la mediana del eje más largo de los centroides.
+    - Las consultas recorren el árbol por niveles: cada nivel es una única operación
+      vectorizada sobre todos los nodos de la frontera.
+    """
+    def __init__(self, mins, maxs, leaf_size=4):
+        self.mins = np.asarray(mins, dtype=np.float64).reshape(-1, 3)
+        self.maxs = np.asarray(maxs, dtype=np.float64).reshape(-1, 3)
+        self.leaf_size = max(1, leaf_size)
+        self.order = np.arange(len(self.mins))
+
+        self._node_min, self._node_max = [], []
+        self._left, self._right = [], []
+        self._start, self._count = [], []
+        if len(self.mins):
+            self._build(0, len(self.mins))
+
+        self.node_min = np.array(self._node_min).reshape(-1, 3)
+        self.node_max = np.array(self._node_max).reshape(-1, 3)
+        self.left = np.array(self._left, dtype=np.int64)
+        self.right = np.array(self._right, dtype=np.int64)
+        self.start = np.array(self._start, dtype=np.int64)
+        self.count = np.array(self._count, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.mins)
+
+    def _build(self, lo, hi):
+        idx = self.order[lo:hi]
+        node = len(self._left)
+        self._node_min.append(self.mins[idx].min(axis=0))
+        self._node_max.append(self.maxs[idx].max(axis=0))
+        self._left.append(-1)
+        self._right.append(-1)
+        self._start.append(lo)
+        self._count.append(hi - lo)
+        if hi - lo <= self.leaf_size:
+            return node
+
+        centers = (self.mins[idx] + self.maxs[idx]) * 0.5
+        axis = int(np.argmax(centers.max(axis=0) - centers.min(axis=0)))
+        mid = (hi - lo) // 2
+        part = np.argpartition(centers[:, axis], mid)
+        self.order[lo:hi] = idx[part]
+
+        self._left[node] = self._build(lo, lo + mid)
+        self._right[node] = self._build(lo + mid, hi)
+        return node
+
+    def _items(self, nodes):
+        """Índices de todas las cajas que cuelgan de 'nodes'."""
+        if not len(nodes):
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([self.order[s:s + c] for s, c in zip(self.start[nodes], self.count[nodes])])
+
+    def query_frustum(self, planes):
+        """Índices (ordenados) de las cajas que intersecan o están dentro del frustum."""
+        if not len(self.mins):
+            return np.zeros(0, dtype=np.int64)
+        hits = []
+        frontier = np.array([0], dtype=np.int64)
+        while len(frontier):
+            outside, inside = aabbs_vs_frustum(self.node_min[frontier], self.node_max[frontier], planes)
+            # Nodos dentro del todo: todas sus cajas sin más pruebas
+            hits.append(self._items(frontier[inside]))
+            partial = frontier[~outside & ~inside]
+            leaves = partial[self.left[partial] < 0]
+            if len(leaves):
+                cand = self._items(leaves)
+                out_c, _ = aabbs_vs_frustum(self.mins[cand], self.maxs[cand], planes)
+                hits.append(cand[~out_c])
+            inner = partial[self.left[partial] >= 0]
+            frontier = np.concatenate((self.left[inner], self.right[inner]))
+        return np.sort(np.concatenate(hits)) if hits else np.zeros(0, dtype=np.int64)
+
+    def query_ray(self, origin, direction, max_t=np.inf):
+        """
+        Cajas que corta el rayo origin + t * direction con 0 <= t <= max_t.
+        Devuelve (índices, t_entrada) ordenados por t_entrada (de la más cercana a la más lejana).
+        """
+        empty = np.zeros(0, dtype=np.int64), np.zeros(0)
+        if not len(self.mins):
+            return empty
+        origin = np.asarray(origin, dtype=np.float64)
+        inv_dir = safe_inverse(direction)
+        hits, near = [], []
+        frontier = np.array([0], dtype=np.int64)
+        while len(frontier):
+            hit, _ = ray_vs_aabbs(origin, inv_dir, self.node_min[frontier], self.node_max[frontier], max_t)
+            frontier = frontier[hit]
+            leaves = frontier[self.left[frontier] < 0]
+            if len(leaves):
+                cand = self._items(leaves)
+                hit_c, t_c = ray_vs_aabbs(origin, inv_dir, self.mins[cand], self.maxs[cand], max_t)
+                hits.append(cand[hit_c])
+                near.append(t_c[hit_c])
+            inner = frontier[self.left[frontier] >= 0]
+            frontier = np.concatenate((self.left[inner], self.right[inner]))
+        if not hits:
+            return empty
+        hits, near = np.concatenate(hits), np.concatenate(near)
+        order = np.argsort(near, kind='stable')
+        return hits[order], near[order]
@@ -0,0 +1,61 @@
+# src/utils/config.py
+import os
+
+# Raíz del proyecto (src/utils/config.py -> ../../)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# --- Cachés en disco (regenerables, fuera de git) ---
+CACHE_DIR = os.path.join(PROJECT_ROOT, ".cache")
+MESH_CACHE_DIR = os.path.join(CACHE_DIR, "meshes")
+MESH_CACHE_VERSION = 3   # subir si cambia el formato de los .npz de mallas
+
+# Baldas detectadas por ShelfSpace (clave: malla + matriz sin traslación + parámetros)
+SHELF_CACHE_PATH = os.path.join(CACHE_DIR, "shelf_levels.json")
+SHELF_CACHE_VERSION = 1
+SHELF_DISK_CACHE = True
+
+# --- Streaming de texturas (TextureManager) ---
+TEXTURE_VRAM_BUDGET_MB = 256   # presupuesto de VRAM para texturas (incluye mipmaps)
+TEXTURE_INITIAL_SIDE = 128     # lado máximo del primer nivel que se sube (luego se hace streaming)
+TEXTURE_QUALITY_CAPS = {"Baja": 512, "Media": 1024, "Alta": None}   # None = resolución original
+TEXTURE_QUALITY = "Alta"
+
+# Cadenas de mips RGBA ya decodificadas (.npy mapeado en memoria + .json de metadatos)
+TEXTURE_CACHE_DIR = os.path.join(CACHE_DIR, "textures")
+TEXTURE_CACHE_VERSION = 1
+TEXTURE_DISK_CACHE = True
+
+# --- LODs de mallas (se generan al importar y viajan en la caché de mallas) ---
+MESH_LOD_GRID = (128, 64, 32, 16, 8)   # celdas a lo largo del lado mayor de cada LOD candidato
+MESH_LOD_MIN_AREA = 0.9                # fracción mínima de superficie que debe conservar un LOD
+MESH_LOD_MAX_ERROR_PX = 2.0            # tamaño máximo en pantalla (px) de una celda del LOD usado
+
+# --- Texture array de productos (una capa por textura de producto) ---
+PRODUCT_TEXTURE_LAYER_SIDE = 512   # los productos ocupan poco en pantalla: 512 basta
+PRODUCT_TEXTURE_ARRAY_LAYERS = 8   # capas iniciales (se duplica al llenarse)
+
+# --- Modo headless / benchmark ---
+HEADLESS_GL_BACKEND = None   # None = el de la plataforma y, si falla, 'egl'
+BENCHMARK_FRAMES = 600
+BENCHMARK_WARMUP_FRAMES = 60   # frames sin medir (streaming de texturas, LODs, cachés)
+
+# --- Oclusión por GPU (cajas de los lotes de productos contra la profundidad) ---
+OCCLUSION_CULLING = True
+OCCLUSION_BOX_MARGIN = 0.02   # holgura (m) de la caja probada: evita descartes por precisión
+
+# --- Perfilador de frames (F3 panel, F4 traza Chrome) ---
+PROFILER_HISTORY = 300    # frames en el historial rodante / traza
+PROFILER_HITCH_MS = 50.0  # frames más lentos se avisan por consola (None = nunca)
+PROFILER_TRACE_DIR = os.path.join(PROJECT_ROOT, "profiles")
+
+# --- Catálogo de productos (CSV versionado -> SQLite regenerable en la caché) ---
+CATALOG_CSV_PATH = os.path.join(PROJECT_ROOT, "assets", "catalog", "products.csv")
+CATALOG_DB_PATH = os.path.join(CACHE_DIR, "catalog.sqlite3")
+CATALOG_DB_VERSION = 1      # subir si cambia el esquema de la tabla
+CATALOG_SCENE_PRODUCTS = 8  # productos con malla que se reparten por las estanterías
+CATALOG_BENCH_PRODUCTS = 100_000   # tamaño del catálogo sintético de src.catalog.benchmark
+CATALOG_LOAD_BUDGET_MS = 1000      # carga en frío (CSV -> base) que debe cumplir
+
+# --- Lista de productos del menú (virtualizada: solo existen los botones visibles) ---
+PRODUCT_LIST_PAGE_SIZE = 50     # filas por consulta al catálogo
+PRODUCT_LIST_CACHE_PAGES = 20   # páginas recientes que se guardan en memoria
@@ -1,5 +1,6 @@
 # src/utils/geometry.py
 import glm
+import numpy as np
 
 def aabb_world_from_local(local_min, local_max, model_matrix):
     """
@@ -23,3 +24,111 @@ def aabb_world_from_local(local_min, local_max, model_matrix):
     max_w = glm.vec3(max(p.x for p in world), max(p.y for p in world), max(p.z for p in world))
     return (min_w.x, min_w.y, min_w.z), (max_w.x, max_w.y, max_w.z)
 
+
+
+def compose_model_matrix(position, rotation_deg, scale):
+    """
+    Construye la matriz modelo T * Rz * Ry * Rx * S.
+    'rotation_deg' es (pitch, yaw, roll) en grados, igual que en ModelOBJ.
+    """
+    M = glm.mat4()
+    M = glm.translate(M, glm.vec3(*position))
+    M = glm.rotate(M, glm.radians(rotation_deg[2]), glm.vec3(0, 0, 1))
+    M = glm.rotate(M, glm.radians(rotation_deg[1]), glm.vec3(0, 1, 0))
+    M = glm.rotate(M, glm.radians(rotation_deg[0]), glm.vec3(1, 0, 0))
+    M = glm.scale(M, glm.vec3(*scale))
+    return M
+
+
+def transform_points(model_matrix, points):
+    """
+    Aplica una matriz glm.mat4 a un array (..., 3) de puntos con un único producto matricial.
+    Devuelve un array float64 con la misma forma.
+    """
+    M = np.array(model_matrix, dtype=np.float64)  # fila-mayor: M[fila][columna]
+    pts = np.asarray(points, dtype=np.float64)
+    return pts @ M[:3, :3].T + M[:3, 3]
+
+
+def triangle_normals(tris):
+    """
+    Normales unitarias (N, 3) de un array de triángulos (N, 3, 3), orientadas por producto cruzado.
+    Los triángulos degenerados reciben (0, 1, 0), como en el cálculo con glm.
+    """
+    n = np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0])
+    length = np.linalg.norm(n, axis=1)
+    ok = length > 1e-9
+    out = np.tile(np.array([0.0, 1.0, 0.0]), (len(tris), 1))
+    out[ok] = n[ok] / length[ok, None]
+    return out
+
+
+def frustum_planes(view_proj):
+    """
+    Extrae los 6 planos del frustum (Gribb-Hartmann) de una matriz proj * view (glm.mat4).
+    Devuelve un array (6, 4) [a, b, c, d] normalizado; un punto p está dentro si a*x+b*y+c*z+d >= 0
+    para todos los planos.
+    """
+    m = np.array(view_proj, dtype=np.float64)  # fila-mayor
+    planes = np.array([
+        m[3] + m[0],   # izquierda
+        m[3] - m[0],   # derecha
+        m[3] + m[1],   # abajo
+        m[3] - m[1],   # arriba
+        m[3] + m[2],   # cerca
+        m[3] - m[2],   # lejos
+    ])
+    return planes / np.linalg.norm(planes[:, :3], axis=1, keepdims=True)
+
+
+def aabbs_vs_frustum(mins, maxs, planes):
+    """
+    Clasifica AABBs (N, 3) contra los planos del frustum.
+    Devuelve (outside, inside) como arrays bool (N,): fuera del todo / dentro del todo.
+    """
+    n = planes[:, :3]
+    d = planes[:, 3]
+    pos = n >= 0.0
+    # vértice más avanzado (p) y más retrasado (n) de cada caja respecto a cada plano
+    p_vert = np.where(pos[None, :, :], maxs[:, None, :], mins[:, None, :])
+    n_vert = np.where(pos[None, :, :], mins[:, None, :], maxs[:, None, :])
+    outside = ((p_vert * n).sum(axis=2) + d < 0.0).any(axis=1)
+    inside = ((n_vert * n).sum(axis=2) + d >= 0.0).all(axis=1)
+    return outside, inside
+
+
+def safe_inverse(direction, eps=1e-12):
+    """1/d por componente sin infinitos: las componentes ~0 se sustituyen por ±eps."""
+    d = np.asarray(direction, dtype=np.float64)
+    return 1.0 / np.where(np.abs(d) < eps, np.copysign(eps, d), d)
+
+
+def ray_vs_aabbs(origin, inv_dir, mins, maxs, max_t=np.inf):
+    """
+    Slab test de un rayo contra N AABBs (N, 3). 'inv_dir' es safe_inverse(dirección).
+    Devuelve (hit, t_entrada) como arrays (N,); t_entrada es 0 si el origen está dentro.
+    """
+    t0 = (mins - origin) * inv_dir
+    t1 = (maxs - origin) * inv_dir
+    t_near = np.maximum(np.minimum(t0, t1).max(axis=1), 0.0)
+    t_far = np.maximum(t0, t1).min(axis=1)
+    return t_near <= np.minimum(t_far, max_t), t_near
+
+
+def ray_vs_triangles(origin, direction, v0, e1, e2, eps=1e-9):
+    """
+    Möller–Trumbore vectorizado (a doble cara) de un rayo contra N triángulos dados por
+    su vértice v0 y aristas e1 = v1 - v0, e2 = v2 - v0 (arrays (N, 3)).
+    Devuelve la distancia paramétrica t (N,): np.inf donde no hay corte.
+    """
+    p = np.cross(direction, e2)
+    det = np.einsum('ij,ij->i', e1, p)
+    ok = np.abs(det) > eps
+    inv_det = np.divide(1.0, det, out=np.zeros_like(det), where=ok)
+    s = origin - v0
+    u = np.einsum('ij,ij->i', s, p) * inv_det
+    q = np.cross(s, e1)
+    v = (q @ direction) * inv_det
+    t = np.einsum('ij,ij->i', e2, q) * inv_det
+    hit = ok & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t > eps)
+    return np.where(hit, t, np.inf)
@@ -0,0 +1,88 @@
+# src/utils/mesh_lod.py
+import numpy as np
+from src.utils import config
+
+
+def cluster_simplify(vertices, indices, cell_size):
+    """
+    Simplificación por agrupación de vértices (vertex clustering) sobre una rejilla de
+    lado 'cell_size': todos los vértices de una celda se funden en su posición media
+    (el uv es el del primer vértice de la celda, para no mezclar uvs a ambos lados de
+    una costura). Se descartan triángulos degenerados o repetidos y vértices sin uso.
+    'vertices' (K, 5) f4 pos+uv, 'indices' (3M,) u4 -> mismo formato.
+    """
+    pos = vertices[:, :3].astype(np.float64)
+    cells = np.floor((pos - pos.min(axis=0)) / cell_size).astype(np.int64)
+    _, first, inverse = np.unique(cells, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    counts = np.bincount(inverse).astype(np.float64)
+    merged = np.empty((len(first), 5), dtype='f4')
+    for axis in range(3):
+        merged[:, axis] = np.bincount(inverse, weights=pos[:, axis]) / counts
+    merged[:, 3:] = vertices[first, 3:]
+
+    tris = inverse[indices.reshape(-1, 3).astype(np.int64)]
+    keep = (tris[:, 0] != tris[:, 1]) & (tris[:, 1] != tris[:, 2]) & (tris[:, 0] != tris[:, 2])
+    tris = tris[keep]
+    if not len(tris):
+        return merged[:0], np.zeros(0, dtype='u4')
+    # Misma terna de vértices (en cualquier orden) -> un solo triángulo, en orden original
+    _, uniq = np.unique(np.sort(tris, axis=1), axis=0, return_index=True)
+    tris = tris[np.sort(uniq)]
+
+    used = np.unique(tris)
+    remap = np.full(len(merged), -1, dtype=np.int64)
+    remap[used] = np.arange(len(used))
+    return merged[used], remap[tris].reshape(-1).astype('u4')
+
+
+def _surface_area(vertices, indices):
+    tris = vertices[:, :3].astype(np.float64)[indices.reshape(-1, 3).astype(np.int64)]
+    return 0.5 * np.linalg.norm(np.cross(tris[:, 1] - tris[:, 0], tris[:, 2] - tris[:, 0]), axis=1).sum()
+
+
+def generate_lods(vertices, indices, aabb_min, aabb_max, grids=None, min_reduction=0.8, min_area=None):
+    """
+    LODs 1..n de una malla: una simplificación por cada resolución de 'grids'
+    (nº de celdas a lo largo del lado mayor del AABB; MESH_LOD_GRID por defecto).
+    Un nivel se guarda solo si deja como mucho 'min_reduction' de los triángulos del
+    anterior y conserva al menos 'min_area' de la superficie original (el clustering
+    hace desaparecer piezas finas, p. ej. los postes de una estantería).
+    Devuelve [(vertices, indices, celdas), ...] de más a menos detalle.
+    """
+    grids = config.MESH_LOD_GRID if grids is None else grids
+    min_area = config.MESH_LOD_MIN_AREA if min_area is None else min_area
+    longest = float(np.max(np.asarray(aabb_max) - np.asarray(aabb_min)))
+    if longest <= 0:
+        return []
+    area = _surface_area(vertices, indices)
+    lods = []
+    prev_count = len(indices)
+    for cells in grids:
+        v, i = cluster_simplify(vertices, indices, longest / cells)
+        if not len(i) or len(i) > prev_count * min_reduction:
+            continue
+        if area > 0 and _surface_area(v, i) < area * min_area:
+            break   # las rejillas siguientes son más gruesas: solo pierden más
+        lods.append((v, i, cells))
+        prev_count = len(i)
+    return lods
+
+
+def select_lod(pixels, lod_cells, current=0, hysteresis=0.15):
+    """
+    Nivel de detalle para un objeto que ocupa 'pixels' en pantalla.
+    'lod_cells' son las celdas de cada LOD (1..n): se usa el más simple cuya celda
+    (el error máximo del clustering) mide como mucho MESH_LOD_MAX_ERROR_PX en pantalla.
+    Con 'hysteresis' hace falta pasar el umbral por un margen para volver a un nivel
+    más simple que el actual (evita parpadeo en el borde).
+    """
+    lod = 0
+    for k, cells in enumerate(lod_cells, start=1):
+        limit = config.MESH_LOD_MAX_ERROR_PX
+        if k > current:
+            limit /= 1.0 + hysteresis
+        if pixels / cells > limit:
+            break
+        lod = k
+    return lod
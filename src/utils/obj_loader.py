@@ -0,0 +1,211 @@
+# src/utils/obj_loader.py
+import hashlib
+import os
+import numpy as np
+from src.utils import config
+from src.utils.mesh_lod import generate_lods
+
+
+def load_obj(path, invert_v=False, use_cache=True):
+    """
+    Carga un OBJ con NumPy y devuelve un dict de arrays:
+      - 'vertices':  (K, 5) f4, vértices únicos intercalados pos+uv
+      - 'indices':   (3M,) u4, índices en 'vertices' (triangulación por fan)
+      - 'positions': (N, 3) f8, posiciones locales tal cual vienen en el OBJ
+      - 'tri_idx':   (M, 3) i4, triángulos en índices de 'positions'
+      - 'aabb_min' / 'aabb_max': (3,) f8
+      - 'lods': [(vertices, indices, celdas), ...] versiones simplificadas (LOD1..n), mismo formato
+    Con 'use_cache' se lee/escribe un .npz versionado en MESH_CACHE_DIR,
+    invalidado por mtime/tamaño del OBJ: las siguientes ejecuciones no parsean nada.
+    """
+    cache_path = _cache_path(path, invert_v)
+    stat = os.stat(path)
+    if use_cache:
+        mesh = _read_cache(cache_path, stat)
+        if mesh is not None:
+            mesh['from_cache'] = True
+            return mesh
+
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        mesh = parse_obj_text(f.read(), invert_v=invert_v)
+    mesh['lods'] = generate_lods(mesh['vertices'], mesh['indices'], mesh['aabb_min'], mesh['aabb_max'])
+
+    if use_cache:
+        _write_cache(cache_path, stat, mesh)
+    mesh['from_cache'] = False
+    return mesh
+
+
+def parse_obj_text(text, invert_v=False):
+    """Parser vectorizado de 'v', 'vt' y 'f' (v, v/vt, v//vn, v/vt/vn; índices negativos)."""
+    lines = text.splitlines()
+    v_rows = [l[2:] for l in lines if l.startswith('v ')]
+    vt_rows = [l[3:] for l in lines if l.startswith('vt ')]
+    f_rows = [l[2:] for l in lines if l.startswith('f ')]
+
+    positions = _bulk_floats(v_rows, 3)
+    texcoords = _bulk_floats(vt_rows, 2)
+    if invert_v and len(texcoords):
+        texcoords[:, 1] = 1.0 - texcoords[:, 1]
+
+    corner_v, corner_t, counts = _parse_faces(f_rows)
+
+    # Índices 1-based -> 0-based. Los negativos son relativos a lo leído antes de cada cara.
+    if (corner_v < 0).any() or (corner_t < 0).any():
+        nv_before, nt_before = _counts_before_faces(lines)
+        nv_before = np.repeat(nv_before, counts)
+        nt_before = np.repeat(nt_before, counts)
+        corner_v = np.where(corner_v < 0, nv_before + corner_v + 1, corner_v)
+        corner_t = np.where(corner_t < 0, nt_before + corner_t + 1, corner_t)
+    corner_v = corner_v - 1
+    corner_t = corner_t - 1
+
+    # Triangulación tipo fan: (s, s+i, s+i+1) para i = 1..k-2 en cada cara
+    ntri = np.maximum(counts - 2, 0)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])) if len(counts) else np.zeros(0, dtype=np.int64)
+    face_of_tri = np.repeat(np.arange(len(counts)), ntri)
+    first_tri = np.concatenate(([0], np.cumsum(ntri)[:-1])) if len(ntri) else np.zeros(0, dtype=np.int64)
+    i = np.arange(len(face_of_tri)) - first_tri[face_of_tri] + 1
+    s = starts[face_of_tri]
+    tri_corners = np.stack((s, s + i, s + i + 1), axis=1)
+
+    if not len(tri_corners) or not len(positions):
+        raise RuntimeError("sin datos de geometría")
+
+    tri_idx = corner_v[tri_corners].astype('i4')
+    vi = tri_idx.reshape(-1).astype(np.int64)
+    ti = corner_t[tri_corners].reshape(-1)
+    ti = np.where((ti >= 0) & (ti < len(texcoords)), ti, -1)   # sin uv válido -> (0, 0)
+
+    # Deduplicación de pares (posición, uv): vértices únicos + índices,
+    # en orden de primera aparición para conservar la localidad del stream
+    keys = vi * (len(texcoords) + 1) + (ti + 1)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    indices = rank[inverse].astype('u4')
+
+    uvi = ti[first[order]]
+    uv = np.zeros((len(uvi), 2), dtype=np.float64)
+    uv[uvi >= 0] = texcoords[uvi[uvi >= 0]]
+    vertices = np.hstack((positions[vi[first[order]]], uv)).astype('f4')
+
+    return {
+        'vertices': vertices,
+        'indices': indices,
+        'positions': positions,
+        'tri_idx': tri_idx,
+        'aabb_min': positions.min(axis=0),
+        'aabb_max': positions.max(axis=0),
+    }
+
+
+def _bulk_floats(rows, n):
+    """Convierte filas de texto a un array (len(rows), n) en una sola pasada."""
+    if not rows:
+        return np.zeros((0, n), dtype=np.float64)
+    flat = np.fromstring(' '.join(rows), dtype=np.float64, sep=' ')
+    if flat.size == n * len(rows):
+        return flat.reshape(-1, n)
+    # Filas con componentes extra (w, colores por vértice...): nos quedamos con las n primeras
+    return np.array([r.split()[:n] for r in rows], dtype=np.float64)
+
+
+def _parse_faces(rows):
+    """Devuelve (índice v por esquina, índice vt por esquina, nº de esquinas por cara)."""
+    tokens = ' '.join(rows).split()
+    if len(tokens) == 3 * len(rows):
+        counts = np.full(len(rows), 3, dtype=np.int64)   # todo triángulos (caso habitual)
+    else:
+        counts = np.fromiter((len(r.split()) for r in rows), dtype=np.int64, count=len(rows))
+    if not tokens:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), counts
+
+    # Todas las esquinas con el mismo formato -> conversión en bloque
+    joined = ' '.join(tokens)
+    slashes = tokens[0].count('/')
+    if (_slashes_per_token(joined) == slashes).all():
+        comps = slashes + 1
+        flat = np.fromstring(joined.replace('//', '/0/').replace('/', ' '), dtype=np.int64, sep=' ')
+        if flat.size == comps * len(tokens):
+            table = flat.reshape(-1, comps)
+            corner_t = table[:, 1] if comps > 1 else np.zeros(len(table), dtype=np.int64)
+            return table[:, 0], corner_t, counts
+
+    # Formatos mezclados: esquina a esquina
+    corner_v = np.empty(len(tokens), dtype=np.int64)
+    corner_t = np.zeros(len(tokens), dtype=np.int64)
+    for k, tok in enumerate(tokens):
+        a = tok.split('/')
+        corner_v[k] = int(a[0])
+        if len(a) > 1 and a[1] != '':
+            corner_t[k] = int(a[1])
+    return corner_v, corner_t, counts
+
+
+def _slashes_per_token(joined):
+    """Nº de '/' de cada esquina de 'joined' (esquinas separadas por un único espacio)."""
+    b = np.frombuffer(joined.encode('ascii', errors='replace'), dtype=np.uint8)
+    cum = np.cumsum(b == ord('/'))
+    ends = np.append(np.flatnonzero(b == ord(' ')) - 1, len(b) - 1)
+    return np.diff(np.concatenate(([0], cum[ends])))
+
+
+def _counts_before_faces(lines):
+    """Nº de 'v' y 'vt' leídos antes de cada cara (solo para índices negativos)."""
+    nv = nt = 0
+    nv_before, nt_before = [], []
+    for l in lines:
+        if l.startswith('v '):
+            nv += 1
+        elif l.startswith('vt '):
+            nt += 1
+        elif l.startswith('f '):
+            nv_before.append(nv)
+            nt_before.append(nt)
+    return np.array(nv_before, dtype=np.int64), np.array(nt_before, dtype=np.int64)
+
+
+# ---------- Caché binaria en disco ----------
+
+def _cache_path(path, invert_v):
+    abs_path = os.path.abspath(path)
+    digest = hashlib.sha1(f"{abs_path}|{int(invert_v)}".encode('utf-8')).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(config.MESH_CACHE_DIR, f"{name}-{digest}.npz")
+
+
+def _read_cache(cache_path, stat):
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with np.load(cache_path) as data:
+            header = data['header']
+            if (int(header[0]) != config.MESH_CACHE_VERSION or
+                    int(header[1]) != stat.st_mtime_ns or int(header[2]) != stat.st_size):
+                return None
+            mesh = {k: data[k] for k in ('vertices', 'indices', 'positions', 'tri_idx', 'aabb_min', 'aabb_max')}
+            mesh['lods'] = [(data[f'lod{k}_vertices'], data[f'lod{k}_indices'], int(cells))
+                            for k, cells in enumerate(data['lod_cells'], start=1)]
+            return mesh
+    except Exception as e:
+        print(f"[OBJLoader] ⚠️ caché ilegible '{cache_path}': {e}")
+        return None
+
+
+def _write_cache(cache_path, stat, mesh):
+    lods = mesh.get('lods', [])
+    header = np.array([config.MESH_CACHE_VERSION, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+    arrays = {k: v for k, v in mesh.items() if k != 'lods'}
+    arrays['lod_cells'] = np.array([cells for _, _, cells in lods], dtype=np.int64)
+    for k, (v, i, _) in enumerate(lods, start=1):
+        arrays[f'lod{k}_vertices'] = v
+        arrays[f'lod{k}_indices'] = i
+    tmp_path = cache_path + ".tmp.npz"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        np.savez(tmp_path, header=header, **arrays)
+        os.replace(tmp_path, cache_path)   # escritura atómica
+    except Exception as e:
+        print(f"[OBJLoader] ⚠️ no se pudo escribir la caché '{cache_path}': {e}")
@@ -0,0 +1,112 @@
+# src/utils/texture_cache.py
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pygame as pg
+from src.utils import config
+
+
+def mip_size(full_size, level):
+    """Tamaño del nivel 'level' de la cadena de mips (0 = original)."""
+    return max(1, full_size[0] >> level), max(1, full_size[1] >> level)
+
+
+def mip_count(full_size):
+    level = 0
+    while mip_size(full_size, level) != (1, 1):
+        level += 1
+    return level + 1
+
+
+def load_mip_chain(path):
+    """
+    Cadena de mips RGBA (filas de abajo a arriba, como espera OpenGL) de la imagen 'path'.
+    La primera vez se decodifica, se reduce nivel a nivel y se guarda en TEXTURE_CACHE_DIR;
+    las siguientes se mapea el .npy en memoria (sin decodificar JPEG/PNG).
+    Devuelve {'full_size', 'data': array uint8 con todos los niveles seguidos, 'from_cache'}.
+    No toca el contexto GL: apta para hilos de carga.
+    """
+    stat = os.stat(path)
+    data_path, meta_path = _cache_paths(path)
+    cached = _read_cache(data_path, meta_path, stat)
+    if cached is not None:
+        return cached
+    full_size, levels = _build_mip_chain(path)
+    chain = {'full_size': full_size, 'data': np.frombuffer(b''.join(levels), dtype=np.uint8), 'from_cache': False}
+    _write_cache(data_path, meta_path, stat, chain)
+    return chain
+
+
+def mip_level(chain, level):
+    """Vista (sin copia) de los bytes del nivel 'level' de la cadena."""
+    full = chain['full_size']
+    offset = sum(w * h * 4 for w, h in (mip_size(full, k) for k in range(level)))
+    w, h = mip_size(full, level)
+    return chain['data'][offset:offset + w * h * 4]
+
+
+def _build_mip_chain(path):
+    surf = pg.image.load(path)
+    if surf.get_bitsize() not in (24, 32):
+        rgba = pg.Surface(surf.get_size(), pg.SRCALPHA, 32)
+        rgba.blit(surf, (0, 0))
+        surf = rgba
+    full = surf.get_size()
+    levels = []
+    for level in range(mip_count(full)):
+        if level:
+            # Cada nivel sale del anterior (filtro de caja progresivo, como un mipmap)
+            surf = pg.transform.smoothscale(surf, mip_size(full, level))
+        levels.append(pg.image.tobytes(surf, "RGBA", True))
+    return full, levels
+
+
+def _cache_paths(path):
+    abs_path = os.path.abspath(path)
+    digest = hashlib.sha1(abs_path.encode('utf-8')).hexdigest()[:16]
+    name = os.path.splitext(os.path.basename(path))[0]
+    base = os.path.join(config.TEXTURE_CACHE_DIR, f"{name}-{digest}")
+    return base + ".npy", base + ".json"
+
+
+def _read_cache(data_path, meta_path, stat):
+    if not (os.path.exists(data_path) and os.path.exists(meta_path)):
+        return None
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if (meta.get("version") != config.TEXTURE_CACHE_VERSION or
+                meta.get("mtime_ns") != stat.st_mtime_ns or meta.get("size") != stat.st_size):
+            return None
+        full = tuple(meta["full_size"])
+        data = np.load(data_path, mmap_mode='r')
+        expected = sum(w * h * 4 for w, h in (mip_size(full, k) for k in range(mip_count(full))))
+        if data.dtype != np.uint8 or data.shape != (expected,):
+            return None
+        return {'full_size': full, 'data': data, 'from_cache': True}
+    except Exception as e:
+        print(f"[TextureCache] ⚠️ caché ilegible '{data_path}': {e}")
+        return None
+
+
+def _write_cache(data_path, meta_path, stat, chain):
+    meta = {
+        "version": config.TEXTURE_CACHE_VERSION,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "full_size": list(chain['full_size']),
+    }
+    # Sufijo por hilo: dos workers pueden generar la misma textura a la vez
+    tmp = f".tmp{os.getpid()}-{threading.get_ident()}"
+    try:
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        with open(data_path + tmp, "wb") as f:
+            np.save(f, chain['data'])
+        os.replace(data_path + tmp, data_path)   # escritura atómica
+        with open(meta_path + tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + tmp, meta_path)
+    except Exception as e:
+        print(f"[TextureCache] ⚠️ no se pudo escribir la caché '{data_path}': {e}")
@@ -0,0 +1,179 @@
+# Raycast en CPU sin contexto GL: Möller–Trumbore, BVH.query_ray y SceneRaycaster
+import numpy as np
+import pytest
+from src.utils.bvh import BVH
+from src.utils.geometry import (aabb_world_from_local, compose_model_matrix, ray_vs_aabbs,
+                                ray_vs_triangles, safe_inverse)
+from src.scene.raycast import SceneRaycaster
+
+# Triángulo en el plano z = 0: (0,0,0) (1,0,0) (0,1,0)
+V0 = np.array([[0.0, 0.0, 0.0]])
+E1 = np.array([[1.0, 0.0, 0.0]])
+E2 = np.array([[0.0, 1.0, 0.0]])
+
+
+def _tri_t(origin, direction):
+    return ray_vs_triangles(np.asarray(origin, dtype=np.float64), np.asarray(direction, dtype=np.float64),
+                            V0, E1, E2)[0]
+
+
+# ---------- Möller–Trumbore ----------
+@pytest.mark.parametrize("origin, direction, expected", [
+    ((0.25, 0.25, 2.0), (0, 0, -1), 2.0),      # interior, desde delante
+    ((0.25, 0.25, -3.0), (0, 0, 1), 3.0),      # doble cara: desde detrás
+    ((0.5, 0.0, 1.0), (0, 0, -1), 1.0),        # sobre la arista v0-v1
+    ((0.5, 0.5, 1.0), (0, 0, -1), 1.0),        # sobre la hipotenusa (u + v = 1)
+    ((0.0, 0.0, 1.0), (0, 0, -1), 1.0),        # sobre un vértice
+    ((1.0, 1.0, 1.0), (-0.5, -0.5, -1), 1.0),  # oblicuo
+])
+def test_triangle_hits(origin, direction, expected):
+    assert _tri_t(origin, direction) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("origin, direction", [
+    ((0.6, 0.6, 1.0), (0, 0, -1)),     # fuera, junto a la hipotenusa
+    ((-0.01, 0.5, 1.0), (0, 0, -1)),   # fuera, junto a la arista x = 0
+    ((0.25, 0.25, 1.0), (0, 0, 1)),    # el triángulo queda detrás del origen
+    ((0.25, 0.25, 1.0), (1, 0, 0)),    # paralelo al plano
+    ((0.25, 0.25, 0.0), (1, 0, 0)),    # paralelo y contenido en el plano
+])
+def test_triangle_misses(origin, direction):
+    assert _tri_t(origin, direction) == np.inf
+
+
+def test_triangles_vectorized_matches_single():
+    rng = np.random.default_rng(1)
+    v0, e1, e2 = (rng.uniform(-1, 1, (64, 3)) for _ in range(3))
+    origin, direction = np.array([0.0, 0.0, -5.0]), np.array([0.05, -0.02, 1.0])
+    t = ray_vs_triangles(origin, direction, v0, e1, e2)
+    for i in range(len(v0)):
+        single = ray_vs_triangles(origin, direction, v0[i:i + 1], e1[i:i + 1], e2[i:i + 1])[0]
+        assert t[i] == single
+    assert np.isfinite(t).any()
+
+
+# ---------- BVH.query_ray ----------
+def _random_boxes(rng, n):
+    mins = rng.uniform(-20, 20, (n, 3))
+    return mins, mins + rng.uniform(0.1, 3.0, (n, 3))
+
+
+@pytest.mark.parametrize("leaf_size", [1, 4, 16])
+def test_bvh_query_ray_matches_brute_force(leaf_size):
+    rng = np.random.default_rng(leaf_size)
+    mins, maxs = _random_boxes(rng, 500)
+    bvh = BVH(mins, maxs, leaf_size=leaf_size)
+    for _ in range(200):
+        origin = rng.uniform(-25, 25, 3)
+        direction = rng.normal(size=3)
+        if rng.random() < 0.2:
+            direction[rng.integers(3)] = 0.0   # rayos alineados con los planos de las cajas
+        max_t = np.inf if rng.random() < 0.5 else rng.uniform(1, 30)
+        hit, t_near = ray_vs_aabbs(origin, safe_inverse(direction), mins, maxs, max_t)
+
+        indices, t_entry = bvh.query_ray(origin, direction, max_t)
+        assert sorted(indices.tolist()) == np.flatnonzero(hit).tolist()
+        assert np.all(np.diff(t_entry) >= 0.0)
+        np.testing.assert_allclose(t_entry, t_near[indices])
+
+
+def test_bvh_query_ray_empty():
+    indices, t_entry = BVH(np.zeros((0, 3)), np.zeros((0, 3))).query_ray(np.zeros(3), np.array([1.0, 0, 0]))
+    assert len(indices) == 0 and len(t_entry) == 0
+
+
+# ---------- SceneRaycaster ----------
+# Cubo unidad centrado en el origen (12 triángulos)
+CUBE_POSITIONS = np.array([[x, y, z] for x in (-0.5, 0.5) for y in (-0.5, 0.5) for z in (-0.5, 0.5)])
+CUBE_TRIS = np.array([
+    [0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5],   # x = -0.5 / x = +0.5
+    [0, 4, 5], [0, 5, 1], [2, 3, 7], [2, 7, 6],   # y = -0.5 / y = +0.5
+    [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3],   # z = -0.5 / z = +0.5
+])
+
+
+class FakeBatch:
+    """Lote instanciado mínimo: lo que SceneRaycaster pide a un objeto, sin GL."""
+
+    def __init__(self, transforms, key=None):
+        self.transforms = transforms   # [(posición, rotación (pitch, yaw, roll), escala), ...]
+        self.key = key
+        self.transform_version = 0
+
+    def ray_geometry(self):
+        return self.key, CUBE_POSITIONS, CUBE_TRIS
+
+    def instance_matrices(self):
+        # Mismos bytes que las matrices de instancia en GPU (columna-mayor) -> punto_fila @ M
+        return np.array([np.frombuffer(compose_model_matrix(*tr).to_bytes(), dtype='f4').reshape(4, 4)
+                         for tr in self.transforms])
+
+    def world_aabb(self):
+        boxes = [aabb_world_from_local((-0.5,) * 3, (0.5,) * 3, compose_model_matrix(*tr))
+                 for tr in self.transforms]
+        return tuple(np.min([b[0] for b in boxes], axis=0)), tuple(np.max([b[1] for b in boxes], axis=0))
+
+    def pick_label(self, instance):
+        return f"fake #{instance}"
+
+
+def _row_batch():
+    # Cinco copias en fila sobre x, con escalas y rotaciones distintas
+    return FakeBatch([
+        ((0.0, 0.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0)),
+        ((3.0, 0.0, 0.0), (0.0, 45.0, 0.0), (0.5, 2.0, 0.5)),
+        ((6.0, 0.0, 0.0), (30.0, 0.0, 60.0), (1.0, 1.0, 1.0)),
+        ((9.0, 1.0, 0.0), (0.0, 90.0, 0.0), (2.0, 0.25, 0.5)),
+        ((12.0, 0.0, 0.0), (10.0, 20.0, 30.0), (0.2, 0.2, 0.2)),
+    ])
+
+
+@pytest.mark.parametrize("instance", range(5))
+def test_raycast_hits_the_right_instance(instance):
+    batch = _row_batch()
+    position, _, _ = batch.transforms[instance]
+    origin = np.array([position[0], position[1], 10.0])
+    hit = SceneRaycaster().raycast([batch], origin, (0.0, 0.0, -1.0))
+    assert hit is not None
+    assert hit.obj is batch and hit.instance == instance
+    assert hit.label == f"fake #{instance}"
+
+
+def test_raycast_distance_on_scaled_and_rotated_copies():
+    batch = _row_batch()
+    raycaster = SceneRaycaster()
+    # Copia 1: base de 0.5 x 0.5 girada 45° en yaw -> el rayo da en el canto, a media
+    # diagonal (0.25·√2) del centro
+    hit = raycaster.raycast([batch], (3.0, 0.0, 10.0), (0.0, 0.0, -1.0))
+    assert hit.distance == pytest.approx(10.0 - 0.5 * np.sin(np.radians(45.0)))
+    # Copia 3: yaw 90° intercambia x y z -> la escala x = 2 queda en profundidad
+    hit = raycaster.raycast([batch], (9.0, 1.0, 10.0), (0.0, 0.0, -1.0))
+    assert hit.distance == pytest.approx(9.0)
+    assert hit.point == pytest.approx((9.0, 1.0, 1.0))
+
+
+def test_raycast_nearest_instance_along_the_ray():
+    batch = _row_batch()
+    hit = SceneRaycaster().raycast([batch], (-5.0, 0.0, 0.0), (1.0, 0.0, 0.0))
+    assert hit.instance == 0 and hit.distance == pytest.approx(4.5)
+    hit = SceneRaycaster().raycast([batch], (20.0, 0.0, 0.0), (-1.0, 0.0, 0.0))
+    assert hit.instance == 4
+
+
+def test_raycast_misses_and_max_distance():
+    batch = _row_batch()
+    raycaster = SceneRaycaster()
+    assert raycaster.raycast([batch], (1.5, 0.0, 10.0), (0.0, 0.0, -1.0)) is None   # hueco entre copias
+    assert raycaster.raycast([batch], (0.0, 0.0, 10.0), (0.0, 0.0, 1.0)) is None    # mira hacia fuera
+    assert raycaster.raycast([batch], (0.0, 0.0, 10.0), (0.0, 0.0, -1.0), max_dist=5.0) is None
+    assert raycaster.raycast([batch], (0.0, 0.0, 10.0), (0.0, 0.0, 0.0)) is None    # sin dirección
+
+
+def test_raycast_follows_transform_version():
+    batch = _row_batch()
+    raycaster = SceneRaycaster()
+    assert raycaster.raycast([batch], (0.0, 0.0, 10.0), (0.0, 0.0, -1.0)).instance == 0
+    batch.transforms[0] = ((0.0, 5.0, 0.0), (0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+    batch.transform_version += 1
+    assert raycaster.raycast([batch], (0.0, 0.0, 10.0), (0.0, 0.0, -1.0)) is None
+    assert raycaster.raycast([batch], (0.0, 5.0, 10.0), (0.0, 0.0, -1.0)).instance == 0